@@ -1,4 +1,5 @@
-from database import SessionLocal, Stock
+from database import SessionLocal, create_tables_and_seed
+import universe
 
 def add_stocks():
     session = SessionLocal()
@@ -42,19 +43,16 @@ def add_stocks():
             ("TATAGOLD.NS", "Tata Gold ETF")
         ]
         
-        for symbol, name in stocks_to_add:
-            existing = session.query(Stock).filter(Stock.symbol == symbol).first()
-            if not existing:
-                new_stock = Stock(symbol=symbol, name=name)
-                session.add(new_stock)
-                print(f"Added {name} ({symbol})")
-        
-        session.commit()
-        print("Bulk addition complete.")
+        result = universe.add(session, stocks_to_add)
+        for symbol in result["added"]:
+            print(f"Added {symbol}")
+        print(f"Bulk addition complete, {result['existing']} already tracked.")
+        universe.backfill(result["added"])
     except Exception as e:
         print(f"Error: {e}")
     finally:
         session.close()
 
 if __name__ == "__main__":
+    create_tables_and_seed()
     add_stocks()
@@ -0,0 +1,276 @@
+"""Rule based alerts, evaluated against every tick.
+
+A rule is a small expression over the quote fields written to stock_prices:
+
+    price <= two_fifty_day_low            threshold against another field
+    price <= two_fifty_day_low * 1.02     ... scaled
+    change_percent < -3                   threshold against a number
+    change_percent crosses_below -3       crossing, needs the previous tick
+    status -> CRITICAL DIP                transition into a value
+
+Rules only fire on edges: a threshold when it becomes true (or is already true
+the first time a symbol is seen), a crossing when the previous tick was on the
+other side, a transition when the field changes into the target value. Once a
+rule fired for a symbol it stays quiet for that symbol for its cooldown.
+
+Field kinds are checked when a rule is loaded: text fields (TEXT_FIELDS) only
+take transitions and ==/!= against a literal, numeric fields only compare
+with numbers or other numeric fields. Invalid rules are rejected with the
+reason instead of failing on every tick.
+
+Rules of the same shape are evaluated together as one rules x symbols matrix,
+so a tick costs a few numpy operations per group of rules and no queries.
+"""
+from datetime import timedelta
+import json
+import os
+import re
+
+import numpy as np
+
+from database import QUOTE_FIELDS
+
+ALERT_RULES_FILE = os.getenv("ALERT_RULES_FILE", "alert_rules.json")
+ALERT_COOLDOWN_MINUTES = int(os.getenv("ALERT_COOLDOWN_MINUTES", "60"))
+
+GOLDEN_MESSAGE = (
+    "🔥 <b>GOLDEN OPPORTUNITY: {name} ({symbol})</b>\n\n"
+    "Current Price: ₹{price:.2f}\n"
+    "<b>250-Day Lowest: ₹{two_fifty_day_low:.2f}</b>\n"
+    "Action: Price has hit a 1-YEAR (250-day) LOW!\n\n"
+    "<a href='{base_url}/static/details.html?symbol={symbol}'>Investigate Now</a>"
+)
+
+DEFAULT_MESSAGE = (
+    "🔔 <b>{rule}: {name} ({symbol})</b>\n\n"
+    "Current Price: ₹{price:.2f}\n"
+    "Condition: {when}\n\n"
+    "<a href='{base_url}/static/details.html?symbol={symbol}'>Open Dashboard</a>"
+)
+
+# Used when there is no rules file
+DEFAULT_RULES = [
+    {"name": "Golden Opportunity", "when": "price <= two_fifty_day_low", "message": GOLDEN_MESSAGE},
+]
+
+COMPARISONS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+CROSSINGS = ("crosses_above", "crosses_below")
+
+TEXT_FIELDS = ("symbol", "status", "details")
+# Quote fields a rule can test; the row timestamp is neither a number nor a label
+RULE_FIELDS = [field for field in QUOTE_FIELDS if field != "timestamp"]
+
+RULE_RE = re.compile(r"^\s*(\w+)\s+(crosses_above|crosses_below|->|<=|>=|==|!=|<|>)\s+(.+?)\s*$")
+OPERAND_RE = re.compile(r"^(\w+)(?:\s*\*\s*([-+]?[\d.]+))?$")
+
+class Rule:
+    def __init__(self, name, when, symbols=None, cooldown=None, message=None):
+        self.name = name
+        self.when = when
+        self.symbols = set(symbols) if symbols else None
+        minutes = ALERT_COOLDOWN_MINUTES if cooldown is None else cooldown
+        self.cooldown = timedelta(minutes=minutes)
+        self.message = message or DEFAULT_MESSAGE
+        self.field, self.op, self.operand_field, self.value = parse(when)
+
+    @property
+    def kind(self):
+        if self.op == "->":
+            return "transition"
+        if self.op in CROSSINGS:
+            return "crossing"
+        return "threshold"
+
+    @property
+    def shape(self):
+        """Rules with the same shape are evaluated in one matrix operation."""
+        return (self.kind, self.field, self.op, self.operand_field, isinstance(self.value, str))
+
+    def format(self, row, name=None, base_url=""):
+        values = dict(row, name=name or row["symbol"], rule=self.name, when=self.when, base_url=base_url)
+        try:
+            return self.message.format(**values)
+        except (KeyError, TypeError, ValueError):
+            # e.g. a None field in a numeric format spec
+            return DEFAULT_MESSAGE.format(**{**values, "price": row.get("price") or 0.0})
+
+def parse(when, fields=RULE_FIELDS, text_fields=TEXT_FIELDS):
+    """Splits a rule expression into (field, op, operand_field, value).
+
+    Raises ValueError for unknown fields and for operands or operators that
+    don't fit the kind (text or numeric) of the field.
+    """
+    match = RULE_RE.match(when)
+    if not match:
+        raise ValueError(f"Cannot parse rule: {when!r}")
+    field, op, operand = match.groups()
+    if field not in fields:
+        raise ValueError(f"Unknown field {field!r} in rule: {when!r}")
+    textual = field in text_fields
+
+    if op == "->":
+        if not textual:
+            raise ValueError(f"Transitions (->) need a text field, {field!r} is numeric: {when!r}")
+        return field, op, None, operand
+    if textual and op not in ("==", "!="):
+        raise ValueError(f"Text field {field!r} supports ==, != and -> only: {when!r}")
+    try:
+        value = float(operand)
+    except ValueError:
+        value = None
+    if value is not None:
+        if textual:
+            raise ValueError(f"Text field {field!r} compared with a number: {when!r}")
+        return field, op, None, value
+    match = OPERAND_RE.match(operand)
+    if match and match.group(1) in fields:
+        operand_field = match.group(1)
+        if textual or operand_field in text_fields:
+            raise ValueError(f"Only numeric fields can be compared with each other: {when!r}")
+        return field, op, operand_field, float(match.group(2) or 1.0)
+    if op in ("==", "!=") and textual:
+        return field, op, None, operand
+    raise ValueError(f"Numeric field {field!r} needs a number or a numeric field, not {operand!r}: {when!r}")
+
+def load_rules(path=ALERT_RULES_FILE):
+    """Rules from a JSON list of {"name", "when", "symbols"?, "cooldown"?, "message"?}."""
+    if path and os.path.exists(path):
+        with open(path) as f:
+            specs = json.load(f)
+    else:
+        specs = DEFAULT_RULES
+    rules = []
+    for spec in specs:
+        try:
+            rules.append(Rule(**spec))
+        except (TypeError, ValueError) as e:
+            # One broken entry must not take the other rules (or the ticks) down
+            print(f"Rejected alert rule {spec.get('name')!r} from {path}: {e}")
+    return rules
+
+def _column(rows, field, numeric):
+    if numeric:
+        return np.array([np.nan if row.get(field) is None else row[field] for row in rows], dtype=float)
+    return np.array([row.get(field) for row in rows], dtype=object)
+
+def _allowed(rules, column_of):
+    """rules x symbols mask of the rules limited to some symbols, None when none is."""
+    if all(rule.symbols is None for rule in rules):
+        return None
+    allowed = np.ones((len(rules), len(column_of)), dtype=bool)
+    for r, rule in enumerate(rules):
+        if rule.symbols is not None:
+            allowed[r] = False
+            allowed[r, [column_of[s] for s in rule.symbols if s in column_of]] = True
+    return allowed
+
+class AlertEngine:
+    def __init__(self, rules=None):
+        self.rules = load_rules() if rules is None else list(rules)
+        self._groups = {}
+        for rule in self.rules:
+            self._groups.setdefault(rule.shape, []).append(rule)
+        self._previous = {}     # symbol -> previous tick row
+        self._last_fired = {}   # (rule index, symbol) -> time
+        self._index = {id(rule): i for i, rule in enumerate(self.rules)}
+        self.primed = False
+
+    def prime(self, rows):
+        """Seeds the previous tick, e.g. from latest_prices, so a restart doesn't re-fire."""
+        for row in rows:
+            self._previous[row["symbol"]] = row
+        self.primed = True
+
+    def previous_rows(self):
+        """{symbol: row} of the last tick each symbol was seen in."""
+        return dict(self._previous)
+
+    def proximity(self, rows):
+        """{symbol: smallest relative distance to the threshold of a numeric rule}.
+
+        Transitions and text comparisons have no distance and are ignored;
+        symbols without any numeric rule get infinity.
+        """
+        rows = [row for row in rows if row.get("symbol")]
+        column_of = {row["symbol"]: i for i, row in enumerate(rows)}
+        best = np.full(len(rows), np.inf)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for (kind, field, op, operand_field, textual), rules in self._groups.items():
+                if kind == "transition" or textual or not rows:
+                    continue
+                lhs = _column(rows, field, True)[None, :]
+                values = np.array([rule.value for rule in rules], dtype=float)[:, None]
+                rhs = _column(rows, operand_field, True)[None, :] * values if operand_field else values
+                distance = np.abs(lhs - rhs) / np.abs(rhs)
+                distance = np.where(np.isnan(distance), np.inf, distance)
+                allowed = _allowed(rules, column_of)
+                if allowed is not None:
+                    distance = np.where(allowed, distance, np.inf)
+                best = np.minimum(best, distance.min(axis=0))
+        return dict(zip(column_of, best.tolist()))
+
+    def evaluate(self, rows, now):
+        """Returns [(rule, row)] for every rule that fires on this tick."""
+        rows = [row for row in rows if row.get("symbol")]
+        if not rows:
+            return []
+        symbols = [row["symbol"] for row in rows]
+        column_of = {symbol: i for i, symbol in enumerate(symbols)}
+        previous = [self._previous.get(symbol, {}) for symbol in symbols]
+        current_cols, previous_cols = {}, {}
+
+        def columns(field, numeric):
+            key = (field, numeric)
+            if key not in current_cols:
+                current_cols[key] = _column(rows, field, numeric)
+                previous_cols[key] = _column(previous, field, numeric)
+            return current_cols[key], previous_cols[key]
+
+        fired = []
+        with np.errstate(invalid="ignore"):
+            for (kind, field, op, operand_field, textual), rules in self._groups.items():
+                now_lhs, prev_lhs = columns(field, not textual)
+                values = np.array([rule.value for rule in rules], dtype=object if textual else float)[:, None]
+                if operand_field:
+                    now_rhs, prev_rhs = columns(operand_field, True)
+                    now_rhs, prev_rhs = now_rhs[None, :] * values, prev_rhs[None, :] * values
+                else:
+                    now_rhs = prev_rhs = values
+
+                if kind == "transition":
+                    seen = np.array([value is not None for value in prev_lhs])[None, :]
+                    edges = (now_lhs[None, :] == now_rhs) & (prev_lhs[None, :] != prev_rhs) & seen
+                elif kind == "crossing":
+                    if op == "crosses_below":
+                        edges = (prev_lhs[None, :] >= prev_rhs) & (now_lhs[None, :] < now_rhs)
+                    else:
+                        edges = (prev_lhs[None, :] <= prev_rhs) & (now_lhs[None, :] > now_rhs)
+                else:
+                    compare = COMPARISONS[op]
+                    edges = compare(now_lhs[None, :], now_rhs) & ~compare(prev_lhs[None, :], prev_rhs)
+                edges = np.asarray(edges, dtype=bool)
+
+                allowed = _allowed(rules, column_of)
+                if allowed is not None:
+                    edges &= allowed
+
+                for r, col in zip(*np.nonzero(edges)):
+                    rule = rules[r]
+                    key = (self._index[id(rule)], symbols[col])
+                    last = self._last_fired.get(key)
+                    if last is not None and now - last < rule.cooldown:
+                        continue
+                    self._last_fired[key] = now
+                    fired.append((rule, rows[col]))
+
+        for row in rows:
+            self._previous[row["symbol"]] = row
+        self.primed = True
+        return fired
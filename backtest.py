@@ -0,0 +1,236 @@
+"""Backtests the low-price signals on the stored daily bars.
+
+Every symbol and every day of the columnar snapshot (see columnar.py) goes
+through the same rules as the live ticks: classifier.rolling_stats computes
+the indicators of each day as SymbolIndicators would after that close, and
+classifier.classify turns them into LOW / CRITICAL DIP / HIGH. GOLDEN
+OPPORTUNITY is the default alert rule, price at the 1-year low.
+
+For every signal it reports how often it was entered (the day a symbol moves
+into it, which is when an alert fires), the forward returns after those
+entries and the hit rate: the share of entries followed by a move in the
+signal's direction (up for the dips, down for HIGH). The baseline is the
+average forward return over all evaluated days. Counts of the configured
+alert rules (ALERT_RULES_FILE) are replayed through AlertEngine.
+
+    python backtest.py --horizons 5 20 60
+    python backtest.py --sweep --range-band 0.1 0.2 0.3 --low-band 0.01 0.02 \\
+        --critical-band 0.03 0.05 0.08 --high-band 0.02 0.05 --objective "CRITICAL DIP:20"
+
+Indicators are computed once; a sweep only reclassifies, in a process pool.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as dt_time
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import classifier
+import columnar
+
+HORIZONS = (5, 20, 60)  # trading days
+WARMUP_BARS = 250  # a symbol needs a year of bars before its 250-day low means anything
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", str(os.cpu_count() or 1)))
+
+GOLDEN = "GOLDEN OPPORTUNITY"
+# Signal -> expected direction of the following move
+SIGNALS = {"CRITICAL DIP": 1, "LOW": 1, "HIGH": -1, GOLDEN: 1}
+
+THRESHOLDS = {
+    "range_band": classifier.RANGE_BAND,
+    "low_band": classifier.LOW_BAND,
+    "critical_band": classifier.CRITICAL_BAND,
+    "high_band": classifier.HIGH_BAND,
+}
+
+def load(snapshot=None, symbols=None, start=None, end=None):
+    """(closes, dates, symbols) from the snapshot, optionally limited to symbols and a date range."""
+    snapshot = snapshot or columnar.load()
+    if snapshot is None:
+        raise FileNotFoundError("No columnar snapshot yet, run: python columnar.py")
+    lo = snapshot.index(start, side="left") if start else 0
+    hi = snapshot.index(end) if end else len(snapshot.dates)
+    names = list(snapshot.symbols)
+    closes = snapshot.column("close", lo, hi)
+    if symbols:
+        position = {symbol: i for i, symbol in enumerate(names)}
+        rows = [position[symbol] for symbol in symbols if symbol in position]
+        names = [names[i] for i in rows]
+        closes = closes[rows]
+    return np.array(closes, dtype=float), snapshot.dates[lo:hi], names
+
+def forward_returns(closes, horizons):
+    """{h: symbols x days} return in % from each close to the close h columns later."""
+    result = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for h in horizons:
+            ahead = np.full(closes.shape, np.nan)
+            if h < closes.shape[1]:
+                ahead[:, :-h] = closes[:, h:]
+            result[h] = (ahead / closes - 1) * 100
+    return result
+
+def entries(state):
+    """Days a symbol moves into a state; the first evaluated day counts when it starts there."""
+    previous = np.zeros_like(state)
+    previous[:, 1:] = state[:, :-1]
+    return state & ~previous
+
+def signal_masks(stats, thresholds):
+    flags = classifier.classify(
+        stats["price"], stats["ma_20"], stats["min_30"], stats["max_30"],
+        stats["two_fifty_day_low"], **thresholds,
+    )
+    masks = {name: flags["status"] == name for name in SIGNALS if name != GOLDEN}
+    with np.errstate(invalid="ignore"):
+        masks[GOLDEN] = stats["price"] <= stats["two_fifty_day_low"]
+    return masks
+
+def evaluate(stats, forward, thresholds=None, warmup=WARMUP_BARS):
+    """Entries, forward returns and hit rates of every signal for one set of thresholds."""
+    thresholds = {**THRESHOLDS, **(thresholds or {})}
+    evaluated = (stats["bars"] >= warmup) & ~np.isnan(stats["price"])
+    report = {
+        "thresholds": thresholds,
+        "evaluated_days": int(evaluated.sum()),
+        "baseline": {str(h): _round(np.nanmean(np.where(evaluated, fwd, np.nan))) for h, fwd in forward.items()},
+        "signals": {},
+    }
+    for name, state in signal_masks(stats, thresholds).items():
+        state = state & evaluated
+        entered = entries(state)
+        result = {"days": int(state.sum()), "entries": int(entered.sum()), "forward": {}}
+        for h, fwd in forward.items():
+            values = fwd[entered]
+            values = values[~np.isnan(values)]
+            result["forward"][str(h)] = {
+                "samples": len(values),
+                "mean_pct": _round(values.mean()) if len(values) else None,
+                "median_pct": _round(np.median(values)) if len(values) else None,
+                "hit_rate": _round((np.sign(values) == SIGNALS[name]).mean()) if len(values) else None,
+            }
+        report["signals"][name] = result
+    return report
+
+def _round(value):
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+def alert_counts(stats, dates, symbols, warmup=WARMUP_BARS):
+    """Replays the days through AlertEngine with the configured rules. Returns {rule: fires}."""
+    from alerts import AlertEngine
+    engine = AlertEngine()
+    flags = classifier.classify(
+        stats["price"], stats["ma_20"], stats["min_30"], stats["max_30"], stats["two_fifty_day_low"],
+    )
+    closes = stats["price"]
+    counts = {rule.name: 0 for rule in engine.rules}
+    last_close = np.full(len(symbols), np.nan)
+    for d, day in enumerate(pd.DatetimeIndex(dates)):
+        rows = []
+        for s in np.nonzero(~np.isnan(closes[:, d]) & (stats["bars"][:, d] >= warmup))[0]:
+            price = closes[s, d]
+            rows.append({
+                "symbol": symbols[s],
+                "price": price,
+                "change_percent": (price / last_close[s] - 1) * 100 if not np.isnan(last_close[s]) else 0.0,
+                "status": str(flags["status"][s, d]),
+                "is_low": bool(flags["is_low"][s, d]),
+                "two_fifty_day_low": stats["two_fifty_day_low"][s, d],
+            })
+        present = ~np.isnan(closes[:, d])
+        last_close[present] = closes[present, d]
+        # After the close: cooldowns count in real days, as they would live
+        for rule, row in engine.evaluate(rows, datetime.combine(day.date(), dt_time(15, 30))):
+            counts[rule.name] += 1
+    return counts
+
+_shared = {}
+
+def _init_worker(stats, forward, warmup):
+    _shared.update(stats=stats, forward=forward, warmup=warmup)
+
+def _evaluate_shared(thresholds):
+    return evaluate(_shared["stats"], _shared["forward"], thresholds, _shared["warmup"])
+
+def sweep(stats, forward, grid, warmup=WARMUP_BARS, workers=BACKTEST_WORKERS):
+    """Evaluates every combination of `grid` ({threshold: [values]}). Returns the reports."""
+    names = list(grid)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    if workers <= 1 or len(combinations) == 1:
+        return [evaluate(stats, forward, thresholds, warmup) for thresholds in combinations]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stats, forward, warmup)) as pool:
+        return list(pool.map(_evaluate_shared, combinations, chunksize=max(1, len(combinations) // (workers * 4))))
+
+def objective_value(report, objective):
+    """Mean forward return minus the baseline for "SIGNAL:horizon", signed by the signal's direction."""
+    signal, horizon = objective.rsplit(":", 1)
+    mean = report["signals"][signal]["forward"][horizon]["mean_pct"]
+    if mean is None:
+        return -np.inf
+    return (mean - (report["baseline"][horizon] or 0.0)) * SIGNALS[signal]
+
+def print_report(report):
+    print(f"Thresholds: {report['thresholds']}")
+    print(f"Evaluated symbol-days: {report['evaluated_days']}, baseline returns: {report['baseline']}")
+    for name, result in report["signals"].items():
+        forward = ", ".join(
+            f"{h}d {f['mean_pct']}% (hit {f['hit_rate']})" for h, f in result["forward"].items()
+        )
+        print(f"  {name:<20} {result['entries']:>7} entries {result['days']:>8} days  {forward}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", nargs="*", help="default: every symbol in the snapshot")
+    parser.add_argument("--start", help="first date (YYYY-MM-DD), default: the whole snapshot")
+    parser.add_argument("--end")
+    parser.add_argument("--horizons", type=int, nargs="+", default=list(HORIZONS))
+    parser.add_argument("--warmup", type=int, default=WARMUP_BARS)
+    parser.add_argument("--export", action="store_true", help="rebuild the columnar snapshot first")
+    parser.add_argument("--sweep", action="store_true")
+    for name, default in THRESHOLDS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, nargs="+", default=[default])
+    parser.add_argument("--objective", default="CRITICAL DIP:20", help='"SIGNAL:horizon" to rank a sweep by')
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=BACKTEST_WORKERS)
+    parser.add_argument("--out", help="write the full results as JSON")
+    args = parser.parse_args()
+
+    if args.export:
+        columnar.export()
+    started = time.perf_counter()
+    closes, dates, symbols = load(symbols=args.symbols, start=args.start, end=args.end)
+    stats = classifier.rolling_stats(closes, dates)
+    forward = forward_returns(closes, args.horizons)
+    print(f"{len(symbols)} symbols x {len(dates)} days, indicators in {time.perf_counter() - started:.2f}s")
+
+    grid = {name: getattr(args, name) for name in THRESHOLDS}
+    if args.sweep:
+        started = time.perf_counter()
+        reports = sweep(stats, forward, grid, args.warmup, args.workers)
+        reports.sort(key=lambda report: objective_value(report, args.objective), reverse=True)
+        print(f"{len(reports)} combinations in {time.perf_counter() - started:.2f}s, best by {args.objective}:")
+        for report in reports[:args.top]:
+            print(f"  {objective_value(report, args.objective):+8.3f}  {report['thresholds']}  "
+                  f"{report['signals'][args.objective.rsplit(':', 1)[0]]['entries']} entries")
+        result = {"objective": args.objective, "reports": reports}
+    else:
+        report = evaluate(stats, forward, {name: values[0] for name, values in grid.items()}, args.warmup)
+        print_report(report)
+        started = time.perf_counter()
+        report["alerts"] = alert_counts(stats, dates, symbols, args.warmup)
+        print(f"Alert rule fires: {report['alerts']} ({time.perf_counter() - started:.2f}s)")
+        result = report
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=1)
+        print(f"Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Local store of daily OHLCV bars.
+
+Each symbol is backfilled once with BACKFILL_PERIOD of history. After that a
+tick only downloads the newest bars and upserts them, so the 250-day stats
+no longer cost a full year of data per symbol per minute.
+"""
+import os
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import func
+from database import DailyBar, upsert
+from market_calendar import ist_now
+from providers import PERIOD_OFFSETS, slice_period
+
+# Deep enough for the 250-day stats and the 2Y chart
+BACKFILL_PERIOD = os.getenv("BAR_BACKFILL_PERIOD", "2y")
+
+# A symbol whose backfill came back empty (delisted, misspelled) is retried
+# after BAR_BACKFILL_RETRY_S, doubling per failure up to a day
+BACKFILL_RETRY_S = float(os.getenv("BAR_BACKFILL_RETRY_S", "900"))
+BACKFILL_RETRY_MAX_S = 86400
+
+# Bars up to this many days old are rewritten by the incremental downloads;
+# older gaps take a full BACKFILL_PERIOD download
+INCREMENTAL_DAYS = 28
+
+# Stored periods that /api/history can serve without going upstream
+LOCAL_PERIODS = ("1d", "5d", "7d", "1mo", "3mo", "6mo", "1y", "2y")
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+def ist_today():
+    return ist_now().date()
+
+def latest_bar_dates(session, symbols):
+    """Returns {symbol: date of newest stored bar} in one query."""
+    rows = (
+        session.query(DailyBar.symbol, func.max(DailyBar.date))
+        .filter(DailyBar.symbol.in_(list(symbols)))
+        .group_by(DailyBar.symbol)
+        .all()
+    )
+    return {symbol: last for symbol, last in rows}
+
+_backfill_failures = {}  # symbol -> (failures, monotonic time of the next attempt)
+_failures_lock = threading.Lock()
+
+def backfill_due(symbols, now=None):
+    """The symbols that are not backing off from a failed backfill."""
+    now = time.monotonic() if now is None else now
+    with _failures_lock:
+        return [s for s in symbols if s not in _backfill_failures or _backfill_failures[s][1] <= now]
+
+def record_backfill(requested, frames, now=None):
+    """Starts or extends the backoff of the requested symbols that got no bars, clears the rest."""
+    now = time.monotonic() if now is None else now
+    with _failures_lock:
+        for symbol in requested:
+            df = frames.get(symbol)
+            if df is not None and not df.empty:
+                _backfill_failures.pop(symbol, None)
+                continue
+            failures = _backfill_failures.get(symbol, (0, 0))[0] + 1
+            delay = min(BACKFILL_RETRY_S * 2 ** (failures - 1), BACKFILL_RETRY_MAX_S)
+            _backfill_failures[symbol] = (failures, now + delay)
+            if failures == 1:
+                print(f"No bars for {symbol}, retrying its backfill in {delay:.0f}s")
+
+def refresh_period(last_date, today=None):
+    """Picks the smallest download that brings a symbol up to date."""
+    today = today or ist_today()
+    if last_date is None:
+        return BACKFILL_PERIOD
+    gap = (today - last_date).days
+    if gap <= 0:
+        # Today's bar is stored already, only its latest values are needed
+        return "1d"
+    if gap <= 4:
+        # First tick of the day also re-reads yesterday's final close
+        return "5d"
+    if gap <= INCREMENTAL_DAYS:
+        return "1mo"
+    return BACKFILL_PERIOD
+
+def upsert_bars(session, frames):
+    """Inserts or overwrites the bars in {symbol: DataFrame}. Returns the row count."""
+    rows = []
+    for symbol, df in frames.items():
+        if df is None or df.empty:
+            continue
+        volumes = df["Volume"] if "Volume" in df else pd.Series(None, index=df.index)
+        for ts, o, h, l, c, v in zip(df.index, df["Open"], df["High"], df["Low"], df["Close"], volumes):
+            rows.append({
+                "symbol": symbol,
+                "date": ts.date(),
+                "open": float(o),
+                "high": float(h),
+                "low": float(l),
+                "close": float(c),
+                "volume": int(v) if pd.notna(v) else None,
+            })
+    if not rows:
+        return 0
+
+    upsert(session, DailyBar, rows, ["symbol", "date"], ["open", "high", "low", "close", "volume"])
+    return len(rows)
+
+def sync_bars(session, symbols, source, today=None):
+    """Downloads only the missing bars for `symbols` and upserts them.
+
+    Symbols are grouped by how far behind they are, so a normal tick is a
+    single batched "1d" download for the whole watchlist.
+    """
+    last_dates = latest_bar_dates(session, symbols)
+    # Symbols whose backfill keeps failing stay out of the batch until their retry is due
+    retrying = set(backfill_due([s for s in symbols if last_dates.get(s) is None]))
+    groups = {}
+    for symbol in symbols:
+        if last_dates.get(symbol) is None and symbol not in retrying:
+            continue
+        groups.setdefault(refresh_period(last_dates.get(symbol), today), []).append(symbol)
+
+    written = 0
+    for period, group in groups.items():
+        if period == BACKFILL_PERIOD:
+            print(f"Backfilling {BACKFILL_PERIOD} of daily bars for {len(group)} symbols...")
+        frames = source.history(group, period, "1d")
+        if period == BACKFILL_PERIOD:
+            record_backfill([s for s in group if s in retrying], frames)
+        written += upsert_bars(session, frames)
+    session.commit()
+    return written
+
+def load_bars(session, symbols, period="1y", since=None):
+    """Reads stored bars as {symbol: DataFrame} with the usual OHLCV columns.
+
+    `period` is counted back from each symbol's newest bar, like yfinance does.
+    With `since`, every bar from that date on is returned instead.
+    """
+    symbols = list(symbols)
+    query = session.query(
+        DailyBar.symbol, DailyBar.date, DailyBar.open, DailyBar.high,
+        DailyBar.low, DailyBar.close, DailyBar.volume,
+    ).filter(DailyBar.symbol.in_(symbols))
+
+    if since is not None:
+        query = query.filter(DailyBar.date >= since)
+        period = None
+    elif period in PERIOD_OFFSETS:
+        # Cheap lower bound with a week of slack; the exact cut is made per symbol below
+        cutoff = (pd.Timestamp(ist_today()) - PERIOD_OFFSETS[period] - pd.DateOffset(days=7)).date()
+        query = query.filter(DailyBar.date >= cutoff)
+
+    rows = query.order_by(DailyBar.symbol, DailyBar.date).all()
+    if not rows:
+        return {}
+
+    df = pd.DataFrame(rows, columns=["Symbol", "Date"] + BAR_COLUMNS)
+    df["Date"] = pd.to_datetime(df["Date"])
+    frames = {}
+    for symbol, group in df.groupby("Symbol", sort=False):
+        bars = group.set_index("Date")[BAR_COLUMNS]
+        frames[symbol] = slice_period(bars, period) if period else bars
+    return frames
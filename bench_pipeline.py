@@ -0,0 +1,393 @@
+"""End-to-end benchmark of the tick pipeline and the API, fully offline.
+
+Every universe size runs in its own process on a throwaway database. It gets
+synthetic random-walk data: a year of daily bars plus --days trading days of
+minute bars per symbol, served by the replay provider on a frozen clock that
+moves one minute per tick. The run measures:
+
+- update_all_stocks throughput: the cold first tick, then warm ticks
+- analyze_batch, analyze_history and analyze_stock CPU time
+- rows/s written by save_prices
+- /api/stocks and /api/stocks/{symbol} latency percentiles under concurrent clients
+- stocks.db size and growth per tick
+
+Results are written as JSON together with the git commit, so regressions
+show up between commits:
+
+    python bench_pipeline.py --symbols 10 100 1000 --out bench.json
+    python bench_pipeline.py --compare before.json bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Last simulated trading day; a fixed date keeps runs comparable
+END_DAY = date(2026, 3, 13)
+DAILY_BARS = 260  # enough for the 250-day stats
+MINUTES_PER_DAY = 375  # 09:15 - 15:30 IST
+
+# (section, metric, higher is better) compared by --compare
+COMPARED = [
+    ("ticks", "cold_s", False),
+    ("ticks", "warm_p50_s", False),
+    ("ticks", "symbols_per_s", True),
+    ("analyze", "batch_us_per_symbol", False),
+    ("analyze", "history_ms_per_symbol", False),
+    ("analyze", "stock_ms", False),
+    ("db", "rows_per_s", True),
+    ("db", "bytes_per_row", False),
+    ("api", "stocks_p50_ms", False),
+    ("api", "stocks_p95_ms", False),
+    ("api", "stock_detail_p50_ms", False),
+    ("api", "stock_detail_p95_ms", False),
+]
+
+def trading_days(end, count):
+    from market_calendar import calendar
+    days, day = [], end
+    while len(days) < count:
+        if calendar.is_trading_day(day):
+            days.append(day)
+        day -= timedelta(days=1)
+    return days[::-1]
+
+def random_walk(rng, start, steps, volatility):
+    returns = rng.normal(0, volatility, steps)
+    return start * np.exp(np.cumsum(returns))
+
+def make_bars(rng, index, closes, volatility):
+    opens = np.concatenate([[closes[0]], closes[:-1]])
+    spread = np.abs(rng.normal(0, volatility, len(closes))) * closes
+    return pd.DataFrame({
+        "Open": opens,
+        "High": np.maximum(opens, closes) + spread,
+        "Low": np.minimum(opens, closes) - spread,
+        "Close": closes,
+        "Volume": rng.integers(1_000, 1_000_000, len(closes)),
+    }, index=pd.DatetimeIndex(index, name="Date")).round(2)
+
+def generate_universe(directory, symbols, days, seed=0):
+    """Writes replay recordings for `symbols` and returns the first minute of the last day."""
+    rng = np.random.default_rng(seed)
+    sessions = trading_days(END_DAY, DAILY_BARS + days)
+    daily_days, minute_days = sessions[:DAILY_BARS], sessions[DAILY_BARS:]
+    minute_index = pd.DatetimeIndex([
+        datetime.combine(day, datetime.min.time()) + timedelta(hours=9, minutes=15 + m)
+        for day in minute_days
+        for m in range(MINUTES_PER_DAY)
+    ])
+    daily_index = pd.DatetimeIndex([datetime.combine(day, datetime.min.time()) for day in daily_days])
+
+    infos = {}
+    os.makedirs(directory, exist_ok=True)
+    for symbol in symbols:
+        start_price = rng.uniform(50, 5000)
+        daily = random_walk(rng, start_price, len(daily_index), 0.015)
+        minutes = random_walk(rng, daily[-1], len(minute_index), 0.0008)
+        bars = pd.concat([
+            make_bars(rng, daily_index, daily, 0.005),
+            make_bars(rng, minute_index, minutes, 0.0003),
+        ])
+        bars.to_csv(os.path.join(directory, f"{symbol}.csv"), date_format="%Y-%m-%d %H:%M:%S")
+        infos[symbol] = {
+            "marketCap": float(rng.uniform(1e10, 1e13)),
+            "trailingPE": float(rng.uniform(5, 80)),
+            "fiftyTwoWeekHigh": float(daily.max()),
+            "fiftyTwoWeekLow": float(daily.min()),
+        }
+    with open(os.path.join(directory, "info.json"), "w") as f:
+        json.dump(infos, f)
+    return minute_index[-MINUTES_PER_DAY]
+
+def percentiles(values, scale=1000.0):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    values = np.asarray(values) * scale
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+def db_size(engine, path):
+    # Move the WAL into the main file first, the WAL itself never shrinks
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def bench_api(symbols, clients, requests_per_client):
+    """Latency of the dashboard endpoints on an in-process uvicorn server."""
+    import requests
+    import uvicorn
+    from main import app
+
+    port = free_port()
+    # No lifespan: the app's startup would start the scheduler next to the benchmark
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    base = f"http://127.0.0.1:{port}"
+
+    def client(paths):
+        latencies = []
+        with requests.Session() as session:
+            for path in paths:
+                started = time.perf_counter()
+                session.get(base + path).raise_for_status()
+                latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def run(make_paths):
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = pool.map(client, [make_paths(c) for c in range(clients)])
+            return [latency for latencies in results for latency in latencies]
+
+    rng = random.Random(0)
+    try:
+        client(["/api/stocks", f"/api/stocks/{symbols[0]}"])  # warm up
+        stocks = run(lambda c: ["/api/stocks"] * requests_per_client)
+        detail = run(lambda c: [f"/api/stocks/{rng.choice(symbols)}" for _ in range(requests_per_client)])
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    result = {"clients": clients, "requests_per_client": requests_per_client}
+    for name, latencies in (("stocks", stocks), ("stock_detail", detail)):
+        for key, value in percentiles(latencies).items():
+            result[f"{name}_{key}_ms"] = value
+    return result
+
+def run_universe(size, days, ticks, clients, requests_per_client, workdir):
+    """Benchmarks one universe. Must run in a fresh process: it configures the app by env."""
+    db_path = os.path.join(workdir, "stocks.db")
+    replay_dir = os.path.join(workdir, "replay")
+    symbols = [f"SYN{i:04d}.NS" for i in range(size)]
+
+    started = time.perf_counter()
+    first_minute = generate_universe(replay_dir, symbols, days)
+    generate_s = time.perf_counter() - started
+
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "QUOTE_SNAPSHOT_FILE": os.path.join(workdir, "quotes.json"),
+        "MARKET_DATA_PROVIDER": "replay",
+        "REPLAY_DIR": replay_dir,
+        "REPLAY_SPEED": "0",
+        # A few minutes after the open so the day's first bars exist
+        "REPLAY_START": (first_minute + pd.Timedelta(minutes=5)).isoformat(),
+        # Alerts are evaluated as usual but never leave the machine
+        "TELEGRAM_BOT_TOKEN": "",
+        "FETCH_TIMEOUT": "600",
+    })
+    from sqlalchemy import insert
+    from database import Base, SessionLocal, Stock, engine
+    import bar_store
+    import fetcher
+    import fundamentals
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    session.execute(insert(Stock), [{"symbol": s, "name": f"Synthetic {s}"} for s in symbols])
+    session.commit()
+    session.close()
+
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        started = time.perf_counter()
+        fundamentals.refresh(symbols, source=fetcher.provider)
+        fundamentals_s = time.perf_counter() - started
+
+    # Ticks: the first one backfills a year of bars and restores the indicators
+    durations, db_times, rows_written = [], [], 0
+    size_before = None
+    for tick in range(ticks + 1):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fetcher.update_all_stocks()
+        durations.append(time.perf_counter() - started)
+        if "skipped" in result:
+            raise RuntimeError(f"Tick skipped: {result['skipped']}")
+        if tick == 0:
+            size_before = db_size(engine, db_path)
+        else:
+            db_times.append(result["db_s"])
+            rows_written += result["fetched"]
+        fetcher.provider.advance(60)
+    size_after = db_size(engine, db_path)
+    warm = durations[1:]
+
+    # Analysis CPU time, on the indicator state the ticks left behind
+    stats = {s: fetcher.indicator_engine.stats(s) for s in symbols}
+    repeats = 5
+    cpu = time.process_time()
+    for _ in range(repeats):
+        fetcher.analyze_batch(stats)
+    batch_s = (time.process_time() - cpu) / repeats
+
+    sample = symbols[:min(size, 50)]
+    session = SessionLocal()
+    try:
+        hists = bar_store.load_bars(session, sample, "1y")
+    finally:
+        session.close()
+    cpu = time.process_time()
+    for symbol, hist in hists.items():
+        fetcher.analyze_history(symbol, hist)
+    history_s = (time.process_time() - cpu) / max(len(hists), 1)
+
+    cpu = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for symbol in symbols[:10]:
+            fetcher.analyze_stock(symbol)
+    stock_s = (time.process_time() - cpu) / min(size, 10)
+
+    api = bench_api(symbols, clients, requests_per_client)
+
+    return {
+        "symbols": size,
+        "days": days,
+        "generate_s": round(generate_s, 3),
+        "fundamentals_s": round(fundamentals_s, 3),
+        "ticks": {
+            "count": len(warm),
+            "cold_s": round(durations[0], 3),
+            "warm_mean_s": round(float(np.mean(warm)), 4) if warm else None,
+            "warm_p50_s": round(float(np.median(warm)), 4) if warm else None,
+            "warm_max_s": round(float(np.max(warm)), 4) if warm else None,
+            "symbols_per_s": round(size / float(np.median(warm)), 1) if warm else None,
+        },
+        "analyze": {
+            "batch_ms": round(batch_s * 1000, 3),
+            "batch_us_per_symbol": round(batch_s / size * 1e6, 3),
+            "history_ms_per_symbol": round(history_s * 1000, 3),
+            "stock_ms": round(stock_s * 1000, 3),
+        },
+        "db": {
+            "rows": rows_written,
+            "write_s": round(sum(db_times), 4),
+            "rows_per_s": round(rows_written / sum(db_times), 1) if sum(db_times) else None,
+            "size_mb": round(size_after / 1e6, 3),
+            "growth_mb_per_tick": round((size_after - size_before) / 1e6 / max(len(warm), 1), 4),
+            "bytes_per_row": round((size_after - size_before) / rows_written, 1) if rows_written else None,
+        },
+        "api": api,
+    }
+
+def git_info():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+def run_all(args):
+    report = {
+        **git_info(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("compare", "single")},
+        "runs": [],
+    }
+    for size in args.symbols:
+        print(f"Universe of {size} symbols, {args.days} days of minute bars, {args.ticks} ticks...")
+        with tempfile.TemporaryDirectory() as workdir:
+            result_path = os.path.join(workdir, "result.json")
+            command = [
+                sys.executable, os.path.abspath(__file__), "--single", result_path,
+                "--symbols", str(size), "--days", str(args.days), "--ticks", str(args.ticks),
+                "--clients", str(args.clients), "--requests", str(args.requests),
+            ]
+            subprocess.run(command, cwd=HERE, check=True)
+            with open(result_path) as f:
+                run = json.load(f)
+        report["runs"].append(run)
+        print(
+            f"  tick {run['ticks']['warm_p50_s']}s ({run['ticks']['symbols_per_s']} symbols/s), "
+            f"db {run['db']['rows_per_s']} rows/s, /api/stocks p95 {run['api']['stocks_p95_ms']}ms, "
+            f"/api/stocks/{{symbol}} p95 {run['api']['stock_detail_p95_ms']}ms, db {run['db']['size_mb']}MB"
+        )
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {args.out}")
+    return report
+
+def compare(before_path, after_path, threshold):
+    """Prints the change of every metric; returns the number of regressions beyond `threshold` %."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{(before.get('commit') or '?')[:10]} -> {(after.get('commit') or '?')[:10]}")
+
+    previous = {run["symbols"]: run for run in before["runs"]}
+    regressions = 0
+    for run in after["runs"]:
+        old = previous.get(run["symbols"])
+        if old is None:
+            continue
+        print(f"\n{run['symbols']} symbols")
+        for section, metric, higher_is_better in COMPARED:
+            a, b = old[section].get(metric), run[section].get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a * 100
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"  {section + '.' + metric:<28} {a:>12.3f} {b:>12.3f} {change:>+8.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--days", type=int, default=5, help="trading days of minute bars per symbol")
+    parser.add_argument("--ticks", type=int, default=10, help="warm ticks after the first one")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent API clients")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client and endpoint")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--threshold", type=float, default=10.0, help="%% change reported as regression")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    if args.single:
+        result = run_universe(args.symbols[0], args.days, args.ticks, args.clients, args.requests, os.path.dirname(args.single))
+        with open(args.single, "w") as f:
+            json.dump(result, f)
+        return
+    run_all(args)
+
+if __name__ == "__main__":
+    main()
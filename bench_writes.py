@@ -0,0 +1,94 @@
+"""Benchmarks the tick write path on a throwaway database.
+
+Compares the old one-ORM-object-per-symbol inserts with the bulk writer in
+database.save_prices, with and without WAL.
+
+    python bench_writes.py --symbols 500 --ticks 375
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, StockPrice, make_engine, save_prices, upsert_latest_prices
+
+def make_ticks(symbols, ticks):
+    start = datetime(2026, 1, 5, 3, 45)
+    for t in range(ticks):
+        timestamp = start + timedelta(minutes=t)
+        rows = []
+        for s in range(symbols):
+            price = 100 + random.random() * 10
+            rows.append({
+                "symbol": f"SYM{s}.NS",
+                "price": price,
+                "change_percent": random.uniform(-3, 3),
+                "status": "NORMAL",
+                "is_low": False,
+                "details": "Normal price action",
+                "timestamp": timestamp,
+                "market_cap": 1e12,
+                "volume": 1000000,
+                "open_price": price,
+                "day_high": price * 1.01,
+                "day_low": price * 0.99,
+                "fifty_two_week_high": price * 1.3,
+                "fifty_two_week_low": price * 0.7,
+                "pe_ratio": 25.0,
+                "seven_day_avg": price,
+                "seven_day_low": price * 0.98,
+                "two_fifty_day_low": price * 0.8,
+                "two_fifty_day_avg": price,
+            })
+        yield rows
+
+def orm_path(session, rows):
+    # What update_all_stocks used to do: one StockPrice object per symbol
+    for row in rows:
+        session.add(StockPrice(**row))
+    upsert_latest_prices(session, rows)
+    session.commit()
+
+def bulk_path(session, rows):
+    save_prices(session, rows)
+
+def run(name, writer, wal, symbols, ticks):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = make_engine(f"sqlite:///{path}", wal=wal)
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+
+        random.seed(0)
+        total = 0
+        elapsed = 0.0
+        for rows in make_ticks(symbols, ticks):
+            started = time.perf_counter()
+            writer(session, rows)
+            elapsed += time.perf_counter() - started
+            total += len(rows)
+
+        session.close()
+        engine.dispose()
+        size_mb = os.path.getsize(path) / 1e6
+    print(f"{name:<16} {total:>9} rows  {elapsed:8.2f}s  {total / elapsed:>10.0f} rows/s  {elapsed / ticks * 1000:7.1f} ms/tick  {size_mb:7.1f} MB")
+    return total / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--ticks", type=int, default=375, help="one trading day of minute ticks")
+    args = parser.parse_args()
+
+    print(f"Writing {args.ticks} ticks x {args.symbols} symbols")
+    orm = run("orm (no WAL)", orm_path, False, args.symbols, args.ticks)
+    run("bulk (no WAL)", bulk_path, False, args.symbols, args.ticks)
+    bulk = run("bulk + WAL", bulk_path, True, args.symbols, args.ticks)
+    print(f"Speedup: {bulk / orm:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""In-process TTL cache with LRU eviction and request coalescing.
+
+Concurrent misses for the same key share a single load: the first caller runs
+the loader, everyone else waits for its result instead of going upstream too.
+Every lookup counts once as a hit or a miss; `coalesced` counts the misses
+that waited for another caller's load instead of running their own.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class TTLCache:
+    """Size-bounded cache. `ttl` is a number of seconds or a callable(key) -> seconds."""
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _ttl_for(self, key):
+        return self.ttl(key) if callable(self.ttl) else self.ttl
+
+    def _lookup(self, keys):
+        # Caller holds the lock
+        now = time.monotonic()
+        for key in keys:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                return True, entry[1]
+        return False, None
+
+    def get_or_load(self, key, loader):
+        """Returns the cached value for `key`, calling `loader()` at most once per miss."""
+        with self._lock:
+            found, value = self._lookup([key])
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+        return self.load(key, loader)
+
+    def load(self, key, loader):
+        """Runs `loader()` and caches its result, sharing a load that is already running for `key`.
+
+        Doesn't count a lookup: callers check the cache first (get, get_any).
+        None results are handed out but not cached, so a symbol that is missing
+        now is asked for again on the next lookup.
+        """
+        with self._lock:
+            # Another caller may have finished loading since our lookup
+            found, value = self._lookup([key])
+            if found:
+                return value
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = self._inflight[key] = _Flight()
+                leader = True
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = loader()
+            flight.value = value
+            if value is not None:
+                self.set(key, value)
+            return value
+        except Exception as e:
+            # Errors are handed to the waiters but never cached
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def get(self, key, default=None):
+        """Returns the cached value without loading it on a miss."""
+        return self.get_any([key], default)
+
+    def get_any(self, keys, default=None):
+        """The value of the first of `keys` that is cached. Counts one hit or miss for all of them."""
+        with self._lock:
+            found, value = self._lookup(keys)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self._ttl_for(key)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
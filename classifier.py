@@ -0,0 +1,221 @@
+"""Vectorized LOW / CRITICAL DIP / HIGH classification.
+
+`classify` works on arrays of per-symbol indicators, so a whole universe is
+classified in one pass. `classify_matrix` starts one step earlier, from a
+symbols x days matrix of daily closes, and computes the indicators with the
+same windows as indicators.SymbolIndicators.
+"""
+import numpy as np
+import pandas as pd
+
+from providers import PERIOD_OFFSETS
+
+# Thresholds of the "relatively low" rules
+RANGE_BAND = 0.20      # bottom 20% of the 30-day range
+LOW_BAND = 0.01        # within 1% of the 250-day low
+CRITICAL_BAND = 0.05   # within 5% of the 250-day low
+HIGH_BAND = 0.02       # within 2% of the 30-day high
+
+def classify(price, ma_20, min_30, max_30, two_fifty_day_low,
+             range_band=RANGE_BAND, low_band=LOW_BAND,
+             critical_band=CRITICAL_BAND, high_band=HIGH_BAND):
+    """Classifies arrays of symbols. Returns a dict of equally shaped arrays."""
+    price = np.asarray(price, dtype=float)
+    ma_20 = np.asarray(ma_20, dtype=float)
+    min_30 = np.asarray(min_30, dtype=float)
+    max_30 = np.asarray(max_30, dtype=float)
+    two_fifty_day_low = np.asarray(two_fifty_day_low, dtype=float)
+
+    # Condition A: Price <= 20-day MA
+    below_ma = price <= ma_20
+
+    # Condition B: Price within bottom 20% of 30-day range
+    range_30 = max_30 - min_30
+    threshold = np.where(range_30 > 0, min_30 + range_30 * range_band, min_30)
+    in_bottom_range = price <= threshold
+
+    # Special Condition: Near 250-day low
+    near_low = price <= two_fifty_day_low * (1 + low_band)
+
+    critical = price <= two_fifty_day_low * (1 + critical_band)
+    is_low = below_ma | in_bottom_range | near_low | critical
+    near_high = price >= max_30 * (1 - high_band)
+
+    status = np.select(
+        [critical, is_low, near_high],
+        ["CRITICAL DIP", "LOW", "HIGH"],
+        default="NORMAL",
+    )
+    return {
+        "status": status,
+        "is_low": is_low,
+        "below_ma": below_ma,
+        "in_bottom_range": in_bottom_range,
+        "near_low": near_low,
+    }
+
+def reasons(flags, ma_20):
+    """Builds the human readable `details` string for every row of a classify() result."""
+    ma_20 = np.asarray(ma_20, dtype=float)
+    below_ma = flags["below_ma"]
+    in_bottom_range = flags["in_bottom_range"]
+    near_low = flags["near_low"]
+
+    details = []
+    for i in range(len(below_ma)):
+        parts = []
+        if below_ma[i]:
+            parts.append(f"Below 20-day MA ({ma_20[i]:.2f})")
+        if in_bottom_range[i]:
+            parts.append("In bottom 20% of 30-day range")
+        if near_low[i]:
+            parts.append("Near 250-day low")
+        details.append(", ".join(parts) if parts else "Normal price action")
+    return details
+
+def window_stats(closes, dates):
+    """Computes the rolling indicators for every row of a symbols x days close matrix.
+
+    `closes` holds NaN where a symbol has no bar, `dates` is the matching
+    array of trading dates. Each row is evaluated at its own newest bar, using
+    the same windows as the incremental engine. Returns a dict of arrays plus
+    `valid`, the rows that have at least one bar.
+    """
+    closes = np.asarray(closes, dtype=float)
+    dates = pd.DatetimeIndex(dates).values.astype("datetime64[D]")
+    n_symbols, n_days = closes.shape
+
+    # Right-align every row so its newest bar sits in the last column
+    present = ~np.isnan(closes)
+    order = np.argsort(present, axis=1, kind="stable")
+    aligned = np.take_along_axis(closes, order, axis=1)
+    aligned_dates = dates[order]
+    present = np.take_along_axis(present, order, axis=1)
+    counts = present.sum(axis=1)
+    valid = counts > 0
+
+    price = aligned[:, -1]
+    newest = pd.DatetimeIndex(aligned_dates[:, -1])
+
+    def span_mask(period):
+        start = (newest - PERIOD_OFFSETS[period]).values.astype("datetime64[D]")
+        return present & (aligned_dates > start[:, None])
+
+    month = span_mask("1mo")
+    year = span_mask("1y")
+    month_count = month.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        month_mean = np.where(month, aligned, 0.0).sum(axis=1) / month_count
+        min_30 = np.where(month, aligned, np.inf).min(axis=1)
+        max_30 = np.where(month, aligned, -np.inf).max(axis=1)
+        two_fifty_day_low = np.where(year, aligned, np.inf).min(axis=1)
+        two_fifty_day_avg = np.where(year, aligned, 0.0).sum(axis=1) / year.sum(axis=1)
+
+        # 20-bar MA and 7-bar stats fall back to the whole month when it is shorter
+        last_20 = aligned[:, -20:] if n_days >= 20 else aligned
+        ma_20 = np.where(month_count >= 20, last_20.mean(axis=1), month_mean)
+
+        last_7 = aligned[:, -7:] if n_days >= 7 else aligned
+        month_min = np.where(month, aligned, np.inf).min(axis=1)
+        seven_day_avg = np.where(month_count >= 7, last_7.mean(axis=1), month_mean)
+        seven_day_low = np.where(month_count >= 7, last_7.min(axis=1), month_min)
+
+        prev_close = aligned[:, -2] if n_days >= 2 else np.full(n_symbols, np.nan)
+        change_percent = np.where(month_count >= 2, (price - prev_close) / prev_close * 100, 0.0)
+
+    return {
+        "valid": valid,
+        "price": price,
+        "change_percent": change_percent,
+        "ma_20": ma_20,
+        "seven_day_avg": seven_day_avg,
+        "seven_day_low": seven_day_low,
+        "min_30": min_30,
+        "max_30": max_30,
+        "two_fifty_day_low": two_fifty_day_low,
+        "two_fifty_day_avg": two_fifty_day_avg,
+    }
+
+def classify_matrix(closes, dates, **thresholds):
+    """Indicators, status, is_low and reasons for a whole close matrix in one pass."""
+    stats = window_stats(closes, dates)
+    flags = classify(
+        stats["price"], stats["ma_20"], stats["min_30"], stats["max_30"],
+        stats["two_fifty_day_low"], **thresholds,
+    )
+    stats["status"] = flags["status"]
+    stats["is_low"] = flags["is_low"]
+    stats["details"] = reasons(flags, stats["ma_20"])
+    return stats
+
+def _range_reduce(values, starts, ufunc):
+    """ufunc.reduce over the columns [starts[d], d] of every column d, as a sparse table."""
+    n_days = values.shape[1]
+    result = np.full(values.shape, np.nan)
+    lengths = np.arange(n_days) - starts + 1
+    levels = np.floor(np.log2(np.maximum(lengths, 1))).astype(int)
+    table = values
+    for level in range(levels.max() + 1 if n_days else 0):
+        if level:
+            # table[:, i] now covers columns [i, i + 2**level)
+            half = 2 ** (level - 1)
+            table = ufunc(table[:, :-half], table[:, half:])
+        days = np.nonzero(levels == level)[0]
+        if len(days):
+            width = 2 ** level
+            result[:, days] = ufunc(table[:, starts[days]], table[:, days - width + 1])
+    return result
+
+def rolling_stats(closes, dates):
+    """Indicators of every symbol on every day of a symbols x days close matrix.
+
+    Day d is evaluated like SymbolIndicators after the close of d: the 20-bar
+    MA over the symbol's last 20 bars (the month's mean while it holds fewer),
+    the 30-day range over the bars after d - 1mo and the 250-day low over the
+    bars after d - 1y. NaN marks days without a bar; their indicators are NaN.
+    `bars` counts the bars of each symbol up to and including d.
+    """
+    closes = np.asarray(closes, dtype=float)
+    dates = pd.DatetimeIndex(dates)
+    n_symbols, n_days = closes.shape
+    present = ~np.isnan(closes)
+    counts = np.cumsum(present, axis=1)
+    sums = np.cumsum(np.where(present, closes, 0.0), axis=1)
+
+    def window_start(period):
+        # First column inside (d - period, d]
+        return np.searchsorted(dates.values, (dates - PERIOD_OFFSETS[period]).values, side="right")
+
+    def before(matrix, starts):
+        # Cumulative value just before each window
+        padded = np.concatenate([np.zeros((n_symbols, 1)), matrix], axis=1)
+        return padded[:, starts]
+
+    month_start = window_start("1mo")
+    month_count = counts - before(counts, month_start)
+    month_sum = sums - before(sums, month_start)
+
+    # Sum of the last 20 bars from cumulative sums indexed by bar number, so gaps don't count
+    by_bar = np.zeros((n_symbols, n_days + 1))
+    rows, cols = np.nonzero(present)
+    by_bar[rows, counts[rows, cols]] = sums[rows, cols]
+    last_20 = sums - np.take_along_axis(by_bar, np.maximum(counts - 20, 0), axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ma_20 = np.where(month_count >= 20, last_20 / 20, month_sum / month_count)
+        min_30 = _range_reduce(closes, month_start, np.fmin)
+        max_30 = _range_reduce(closes, month_start, np.fmax)
+        two_fifty_day_low = _range_reduce(closes, window_start("1y"), np.fmin)
+
+    def on_bars(values):
+        return np.where(present, values, np.nan)
+
+    return {
+        "price": closes,
+        "ma_20": on_bars(ma_20),
+        "min_30": on_bars(min_30),
+        "max_30": on_bars(max_30),
+        "two_fifty_day_low": on_bars(two_fifty_day_low),
+        "bars": counts,
+    }
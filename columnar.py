@@ -0,0 +1,156 @@
+"""Columnar snapshot of the daily bars for analytics.
+
+`export()` writes daily_bars as dense symbols x days matrices, one .npy file
+per column and calendar year:
+
+    columnar/manifest.json       symbols, columns and partitions
+    columnar/2025/dates.npy      datetime64[D] trading dates of the year
+    columnar/2025/close.npy      float64, symbols x dates, NaN where no bar
+
+Snapshot reads them with np.load(mmap_mode="r"): a window inside one year is
+a view on the mapped file, nothing is parsed or copied. The snapshot is
+rebuilt daily after compaction and swapped in with a directory rename, so
+readers never see a half written one. With pyarrow installed, export(...,
+parquet=True) also writes one long-format Parquet file per year for tools
+outside the app.
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from database import DailyBar, engine
+
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "columnar")
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+def _pivot(codes, date_codes, values, shape):
+    matrix = np.full(shape, np.nan)
+    matrix[codes, date_codes] = values
+    return matrix
+
+def export(directory=COLUMNAR_DIR, parquet=False):
+    """Rebuilds the snapshot from daily_bars. Returns the manifest."""
+    # Plain SQL: the ORM's per-row date conversion costs more than the query
+    query = f"SELECT symbol, date, {', '.join(COLUMNS)} FROM {DailyBar.__tablename__}"
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(query).fetchall()
+    bars = pd.DataFrame.from_records(rows, columns=["symbol", "date", *COLUMNS])
+    days = pd.to_datetime(bars["date"]).values.astype("datetime64[D]")
+
+    symbols = sorted(bars["symbol"].unique())
+    symbol_codes = pd.Categorical(bars["symbol"], categories=symbols).codes
+    manifest = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "symbols": symbols,
+        "columns": list(COLUMNS),
+        "partitions": [],
+    }
+
+    staging = f"{directory}.new"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    years = days.astype("datetime64[Y]").astype(int) + 1970
+    for year in np.unique(years):
+        in_year = years == year
+        dates = np.unique(days[in_year])
+        date_codes = np.searchsorted(dates, days[in_year])
+        path = os.path.join(staging, str(year))
+        os.makedirs(path)
+        np.save(os.path.join(path, "dates.npy"), dates)
+        for column in COLUMNS:
+            values = bars[column].to_numpy(dtype=float, na_value=np.nan)[in_year]
+            np.save(os.path.join(path, f"{column}.npy"), _pivot(symbol_codes[in_year], date_codes, values, (len(symbols), len(dates))))
+        if parquet:
+            _write_parquet(bars[in_year].assign(date=days[in_year]), os.path.join(staging, f"{year}.parquet"))
+        manifest["partitions"].append({
+            "name": str(year), "start": str(dates[0]), "end": str(dates[-1]), "days": len(dates),
+        })
+
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+    # Swap in the new snapshot; open memory maps of the old one stay valid
+    previous = f"{directory}.old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, previous)
+    os.rename(staging, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+    print(f"Columnar snapshot: {len(symbols)} symbols, {len(bars)} bars in {len(manifest['partitions'])} partitions")
+    return manifest
+
+def _write_parquet(bars, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow is not installed, skipping the Parquet export")
+        return
+    pq.write_table(pa.Table.from_pandas(bars, preserve_index=False), path)
+
+class Snapshot:
+    """Memory-mapped view of an exported snapshot."""
+
+    def __init__(self, directory=COLUMNAR_DIR):
+        self.directory = directory
+        manifest_path = os.path.join(directory, "manifest.json")
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        self.mtime = os.path.getmtime(manifest_path)
+        self.symbols = self.manifest["symbols"]
+        self.partitions = [p["name"] for p in self.manifest["partitions"]]
+        self._maps = {}
+        self._dates = [self._load(name, "dates") for name in self.partitions]
+        # Global column index where each partition starts
+        self._offsets = np.cumsum([0] + [len(d) for d in self._dates])
+        self.dates = np.concatenate(self._dates) if self._dates else np.array([], dtype="datetime64[D]")
+
+    def _load(self, partition, column):
+        key = (partition, column)
+        if key not in self._maps:
+            self._maps[key] = np.load(os.path.join(self.directory, partition, f"{column}.npy"), mmap_mode="r")
+        return self._maps[key]
+
+    def index(self, when, side="right"):
+        """Column position of a date: the first column after it (side="right") or at it."""
+        return int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(when).date(), "D"), side=side))
+
+    def column(self, name, start=0, stop=None):
+        """symbols x days matrix of columns [start, stop). A view when it lies in one partition."""
+        stop = len(self.dates) if stop is None else stop
+        pieces = []
+        for p, partition in enumerate(self.partitions):
+            lo, hi = self._offsets[p], self._offsets[p + 1]
+            if hi <= start or lo >= stop:
+                continue
+            pieces.append(self._load(partition, name)[:, max(start, lo) - lo:min(stop, hi) - lo])
+        if not pieces:
+            return np.empty((len(self.symbols), 0))
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces, axis=1)
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def load(directory=COLUMNAR_DIR):
+    """The current snapshot, reopened when a newer export replaced it. None if there is none."""
+    global _snapshot
+    manifest_path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.directory != directory or os.path.getmtime(manifest_path) != _snapshot.mtime:
+            _snapshot = Snapshot(directory)
+        return _snapshot
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export daily bars into the columnar snapshot.")
+    parser.add_argument("--out", default=COLUMNAR_DIR)
+    parser.add_argument("--parquet", action="store_true", help="also write Parquet files (needs pyarrow)")
+    args = parser.parse_args()
+    export(args.out, args.parquet)
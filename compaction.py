@@ -0,0 +1,163 @@
+"""Retention and downsampling for stock_prices.
+
+The scheduler appends one row per symbol per minute. Rows older than
+RAW_RETENTION_DAYS are rolled up into 5-minute, hourly and daily OHLC buckets
+in price_rollups and then deleted. Rollups are kept for their own retention
+window, after which the file is vacuumed to give the space back.
+"""
+from datetime import datetime, timedelta
+import os
+
+import pandas as pd
+from sqlalchemy import text
+from database import SessionLocal, StockPrice, PriceRollup, engine, upsert
+
+RAW_RETENTION_DAYS = int(os.getenv("RAW_RETENTION_DAYS", "7"))
+
+# Rollup resolution -> (pandas frequency, days kept; None keeps forever)
+ROLLUPS = {
+    "5m": ("5min", int(os.getenv("ROLLUP_5M_RETENTION_DAYS", "60"))),
+    "1h": ("1h", int(os.getenv("ROLLUP_1H_RETENTION_DAYS", "730"))),
+    "1d": ("1D", None),
+}
+
+COMPACT_VACUUM = os.getenv("COMPACT_VACUUM", "1") == "1"
+
+def bucket_offset(freq):
+    """Hourly buckets start at the 09:15 IST open (03:45 UTC), like Yahoo's."""
+    step = pd.Timedelta(freq)
+    if pd.Timedelta("1h") <= step < pd.Timedelta("1D"):
+        return pd.Timedelta("45min")
+    return None
+
+def raw_cutoff(now=None):
+    """Start of the raw window, floored to midnight UTC.
+
+    5-minute and daily buckets end there; the hourly ones start at :45, so
+    one of them straddles it and is completed by the next compaction (see
+    merge_stored).
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=RAW_RETENTION_DAYS)
+    return datetime(cutoff.year, cutoff.month, cutoff.day)
+
+def rollup_cutoff(resolution, now=None):
+    days = ROLLUPS[resolution][1]
+    if days is None:
+        return None
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+def rollup(prices, resolution):
+    """Turns a (symbol, timestamp, price) frame into rollup rows for one resolution."""
+    freq = ROLLUPS[resolution][0]
+    grouper = pd.Grouper(key="timestamp", freq=freq, offset=bucket_offset(freq))
+    grouped = prices.groupby(["symbol", grouper])["price"]
+    bars = grouped.agg(["first", "max", "min", "last", "count"]).dropna()
+    return [
+        {
+            "symbol": symbol,
+            "resolution": resolution,
+            "bucket": bucket.to_pydatetime(),
+            "open": float(o),
+            "high": float(h),
+            "low": float(l),
+            "close": float(c),
+            "samples": int(n),
+        }
+        for (symbol, bucket), (o, h, l, c, n) in zip(bars.index, bars.itertuples(index=False))
+    ]
+
+def merge_stored(session, rows):
+    """Folds the rollups already stored for the buckets of `rows` into them.
+
+    Compaction moves forward in time, so a stored bucket only ever gets
+    later rows: it keeps its open, widens its range and takes the new close.
+    """
+    if not rows:
+        return rows
+    # Only the first bucket of a symbol can be stored already
+    first = {}
+    for row in rows:
+        if row["symbol"] not in first or row["bucket"] < first[row["symbol"]]:
+            first[row["symbol"]] = row["bucket"]
+    stored = {
+        (r.symbol, r.bucket): r
+        for r in session.query(PriceRollup).filter(
+            PriceRollup.resolution == rows[0]["resolution"],
+            PriceRollup.symbol.in_(list(first)),
+            PriceRollup.bucket.in_(set(first.values())),
+        )
+        if first.get(r.symbol) == r.bucket
+    }
+    for row in rows:
+        old = stored.get((row["symbol"], row["bucket"]))
+        if old is not None:
+            row["open"] = old.open
+            row["high"] = max(old.high, row["high"])
+            row["low"] = min(old.low, row["low"])
+            row["samples"] += old.samples
+    return rows
+
+def upsert_rollups(session, rows):
+    upsert(session, PriceRollup, rows, ["symbol", "resolution", "bucket"], ["open", "high", "low", "close", "samples"])
+
+def compact(now=None):
+    """Rolls up and deletes raw rows older than the raw window, then trims old rollups."""
+    now = now or datetime.utcnow()
+    cutoff = raw_cutoff(now)
+    summary = {"cutoff": cutoff, "raw_rows": 0, "rollups": {}, "expired_rollups": 0}
+
+    session = SessionLocal()
+    try:
+        rows = (
+            session.query(StockPrice.symbol, StockPrice.timestamp, StockPrice.price)
+            .filter(StockPrice.timestamp < cutoff)
+            .all()
+        )
+        if rows:
+            prices = pd.DataFrame(rows, columns=["symbol", "timestamp", "price"]).dropna()
+            for resolution in ROLLUPS:
+                bars = merge_stored(session, rollup(prices, resolution))
+                upsert_rollups(session, bars)
+                summary["rollups"][resolution] = len(bars)
+
+            summary["raw_rows"] = (
+                session.query(StockPrice)
+                .filter(StockPrice.timestamp < cutoff)
+                .delete(synchronize_session=False)
+            )
+
+        for resolution in ROLLUPS:
+            expires = rollup_cutoff(resolution, now)
+            if expires is not None:
+                summary["expired_rollups"] += (
+                    session.query(PriceRollup)
+                    .filter(PriceRollup.resolution == resolution, PriceRollup.bucket < expires)
+                    .delete(synchronize_session=False)
+                )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"Compaction failed: {e}")
+        raise
+    finally:
+        session.close()
+
+    if COMPACT_VACUUM and (summary["raw_rows"] or summary["expired_rollups"]):
+        vacuum()
+
+    print(
+        f"Compaction: rolled up {summary['raw_rows']} raw rows older than {cutoff:%Y-%m-%d} "
+        f"into {summary['rollups']}, expired {summary['expired_rollups']} rollups."
+    )
+    return summary
+
+def vacuum():
+    """Returns the space freed by deleted rows to the OS."""
+    if not str(engine.url).startswith("sqlite"):
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+if __name__ == "__main__":
+    compact()
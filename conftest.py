@@ -0,0 +1,12 @@
+"""Runs the tests on a throwaway database, without Telegram or upstream calls."""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="stocks_tracker_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'stocks.db')}"
+os.environ["QUOTE_SNAPSHOT_FILE"] = os.path.join(_workdir, "quotes.json")
+os.environ["TELEGRAM_BOT_TOKEN"] = ""
+os.environ["METRICS_ENABLED"] = "0"
+
+# Sends a real Telegram message; run it by hand with python test_tg.py
+collect_ignore = ["test_tg.py"]
@@ -0,0 +1,39 @@
+"""Shape-preserving downsampling for chart series.
+
+Largest-Triangle-Three-Buckets (Steinarsson, 2013) keeps the first and last
+points and, from every bucket in between, the point that forms the largest
+triangle with the previously kept point and the average of the next bucket.
+Peaks and dips survive, unlike plain decimation or averaging.
+"""
+import numpy as np
+
+def lttb(x, y, threshold):
+    """Returns the indices of the points to keep, at most `threshold` of them."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        # No bucket in between: the first point, plus the last one if there is room
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=int)
+
+    # Bucket edges for the n - 2 inner points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0] = 0
+    keep[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the following bucket (or the last point for the final bucket)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        ax, ay = x[a], y[a]
+        areas = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        a = start + int(areas.argmax())
+        keep[i + 1] = a
+    return keep
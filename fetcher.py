@@ -1,202 +1,317 @@
-import yfinance as yf
-import pandas as pd
-from database import SessionLocal, Stock, StockPrice
-import json
-from datetime import datetime, timedelta
+from database import SessionLocal, Stock, QUOTE_FIELDS, save_prices, latest_quotes
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 import os
+import threading
+import time
 
-from notifier import send_telegram_message
+from notifier import send_digest
+from providers import get_provider
+from indicators import IndicatorEngine
+import classifier
+import numpy as np
+import bar_store
+import live
+import market_calendar
+import metrics
+import quote_snapshot
+from alerts import AlertEngine
+
+# Fetch engine tuning
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "15"))
+
+# MARKET_DATA_PROVIDER picks the source (yfinance, or replay for offline runs)
+provider = get_provider(timeout=FETCH_TIMEOUT)
+if provider.now() is not None:
+    # Replays run on their own clock: market hours, bar dates and row timestamps follow it
+    market_calendar.set_clock(provider.now)
+
+# Rolling indicator state per symbol, restored from the bar store on first use
+indicator_engine = IndicatorEngine()
+alert_engine = AlertEngine()
+
+# Timing breakdown of the most recent tick
+last_tick = {}
+
+# Bar syncs run one at a time on this worker; one that outlives its tick's
+# FETCH_TIMEOUT keeps running and the next tick waits for it
+_sync_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bar-sync")
+_sync_future = None
+_sync_lock = threading.Lock()
+
+TICK = metrics.timer("tick", "Whole update_all_stocks runs")
+TICK_STAGE = metrics.timer("tick_stage", "Time spent in each stage of a tick")
+TICK_SYMBOLS = metrics.counter("tick_symbols_total", "Symbols per tick that produced a quote (fetched) or not (missing)")
 
 def is_market_open():
-    """Checks if the Indian Stock Market is open (9:00 AM to 3:30 PM IST, Mon-Fri)"""
-    # Get current time in UTC (Standard for most servers like Render)
-    utc_now = datetime.utcnow()
-    # Convert to IST (UTC + 5:30)
-    ist_now = utc_now + timedelta(hours=5, minutes=30)
-    
-    # Monday = 0, Sunday = 6
-    weekday = ist_now.weekday()
-    current_time = ist_now.time()
-    
-    market_start = datetime.strptime("09:00", "%H:%M").time()
-    market_end = datetime.strptime("15:30", "%H:%M").time()
-    
-    is_weekday = weekday < 5
-    is_during_hours = market_start <= current_time <= market_end
-    
-    return is_weekday and is_during_hours
+    """Checks if the Indian Stock Market is open, using the NSE calendar (holidays, special sessions)"""
+    return market_calendar.is_market_open()
 
-def analyze_stock(symbol):
-    print(f"Fetching data for {symbol}...")
+def analyze_history(symbol, hist_1y):
+    """Runs the low-price analysis on one year of daily bars."""
+    if hist_1y is None or hist_1y.empty:
+        print(f"No data found for {symbol} (History Empty)")
+        return None
+    state = IndicatorEngine().restore(symbol, hist_1y)
+    return analyze_stats(symbol, state.stats(), hist_1y.iloc[-1])
+
+def analyze_stats(symbol, stats, day_bar=None):
+    """Classifies a symbol from its rolling indicators (see indicators.SymbolIndicators.stats)."""
+    return analyze_batch({symbol: stats}, {symbol: day_bar})[symbol]
+
+def _bar_value(bar, column):
+    if bar is None:
+        return None
+    value = bar.get(column)
+    return None if value is None or value != value else float(value)
+
+def analyze_batch(stats_by_symbol, day_bars=None):
+    """Classifies every symbol of a tick in one vectorized pass. Returns {symbol: analysis}.
+
+    `day_bars` maps symbols to their newest daily bar, which supplies open,
+    day high/low and volume. Market cap, PE and the 52-week range are not
+    part of the minute rows; they live in the fundamentals table.
+    """
+    day_bars = day_bars or {}
+    symbols = list(stats_by_symbol)
+    if not symbols:
+        return {}
+
+    columns = {
+        key: np.array([stats_by_symbol[s][key] for s in symbols], dtype=float)
+        for key in ("price", "ma_20", "min_30", "max_30", "two_fifty_day_low")
+    }
+    flags = classifier.classify(**columns)
+    details = classifier.reasons(flags, columns["ma_20"])
+
+    results = {}
+    for i, symbol in enumerate(symbols):
+        stats = stats_by_symbol[symbol]
+        bar = day_bars.get(symbol)
+        results[symbol] = {
+            "symbol": symbol,
+            "price": stats["price"],
+            "change_percent": stats["change_percent"],
+            "status": str(flags["status"][i]),
+            "is_low": bool(flags["is_low"][i]),
+            "details": details[i],
+            "volume": _bar_value(bar, "Volume"),
+            "open_price": _bar_value(bar, "Open"),
+            "day_high": _bar_value(bar, "High"),
+            "day_low": _bar_value(bar, "Low"),
+            "seven_day_avg": stats["seven_day_avg"],
+            "seven_day_low": stats["seven_day_low"],
+            "two_fifty_day_low": stats["two_fifty_day_low"],
+            "two_fifty_day_avg": stats["two_fifty_day_avg"]
+        }
+    return results
+
+def _sync_bars(symbols, source):
+    session = SessionLocal()
     try:
-        ticker = yf.Ticker(symbol)
-        
-        # Optimization: Fetch 1mo for daily/weekly stats, 2y only if needed for yearly stats
-        # For real-time updates, 1d or 5d is enough for price and change
-        hist = ticker.history(period="1mo")
-        
-        if hist.empty:
-            print(f"No data found for {symbol} (History Empty)")
-            return None
-
-        print(f"Fetched {len(hist)} rows for {symbol}")
-        current_price = hist['Close'].iloc[-1]
-        
-        # Calculate moving averages and stats
-        ma_20 = hist['Close'].rolling(window=20).mean().iloc[-1] if len(hist) >= 20 else hist['Close'].mean()
-        
-        # 2. 7-day Average & Low
-        seven_day_avg = hist['Close'].tail(7).mean()
-        seven_day_low = hist['Close'].tail(7).min()
-        
-        # For 250-day stats, we might need a longer history
-        # To save time, we can fetch 2y only if strictly necessary or once an hour
-        # But for now, let's just fetch 1y which is usually enough for "250 days"
-        # Actually, let's stick to 1mo for fast updates and fetch 2y separately if needed
-        # OR just fetch 1y once. 1y is 252 trading days.
-        hist_1y = ticker.history(period="1y")
-        if not hist_1y.empty:
-            two_fifty_day_low = hist_1y['Close'].min()
-            two_fifty_day_avg = hist_1y['Close'].mean()
+        return bar_store.sync_bars(session, symbols, source)
+    finally:
+        session.close()
+
+def _start_sync(symbols, source):
+    """Submits a bar sync, or returns the one that is still running."""
+    global _sync_future
+    with _sync_lock:
+        if _sync_future is None or _sync_future.done():
+            _sync_future = _sync_pool.submit(_sync_bars, symbols, source)
         else:
-            two_fifty_day_low = seven_day_low
-            two_fifty_day_avg = seven_day_avg
-
-        # 4. 30-day Range
-        last_30_days = hist['Close'].tail(30)
-        min_30 = last_30_days.min()
-        max_30 = last_30_days.max()
-        
-        # 5. Percent Change from previous day
-        if len(hist) >= 2:
-            prev_close = hist['Close'].iloc[-2]
-            change_percent = ((current_price - prev_close) / prev_close) * 100
+            print("Previous bar sync still running, waiting for it instead of starting another")
+        return _sync_future
+
+def _update_indicators(symbols):
+    """Feeds the newest stored bars into the indicator engine.
+
+    Symbols seen for the first time are restored from a year of bars; the
+    rest only read the bars since their own current date, one query per
+    date (normally a single one for the whole universe). Symbols that fell
+    further behind than INCREMENTAL_DAYS (delisted, backing off) are left
+    alone until new bars show up for them, then restored. Returns the
+    newest bar of every symbol that was read.
+    """
+    latest = {}
+    session = SessionLocal()
+    try:
+        missing = [s for s in symbols if s not in indicator_engine]
+        if missing:
+            for symbol, bars in bar_store.load_bars(session, missing, "1y").items():
+                indicator_engine.restore(symbol, bars)
+                latest[symbol] = bars.iloc[-1]
+
+        horizon = bar_store.ist_today() - timedelta(days=bar_store.INCREMENTAL_DAYS)
+        by_date, stale = {}, []
+        for symbol in symbols:
+            current = indicator_engine.current_date(symbol)
+            if current is None or symbol in latest:
+                continue
+            if current < horizon:
+                stale.append(symbol)
+            else:
+                by_date.setdefault(current, []).append(symbol)
+
+        for since, group in by_date.items():
+            for symbol, bars in bar_store.load_bars(session, group, since=since).items():
+                for ts, close in zip(bars.index, bars["Close"]):
+                    indicator_engine.update(symbol, ts.date(), close)
+                latest[symbol] = bars.iloc[-1]
+
+        if stale:
+            newest = bar_store.latest_bar_dates(session, stale)
+            revived = [s for s in stale if newest.get(s) and newest[s] > indicator_engine.current_date(s)]
+            if revived:
+                for symbol, bars in bar_store.load_bars(session, revived, "1y").items():
+                    indicator_engine.restore(symbol, bars)
+                    latest[symbol] = bars.iloc[-1]
+    finally:
+        session.close()
+    return latest
+
+def fetch_all(symbols, source=None):
+    """Fetches and analyzes every symbol in one batch.
+
+    The local bar store is topped up with one batched download of the newest
+    bars (given up after FETCH_TIMEOUT seconds, the analysis then runs on what
+    is stored). Only price data is fetched here; ticker.info is refreshed on
+    its own schedule by fundamentals.py. Returns {symbol: analysis} for the
+    symbols that produced data.
+    """
+    global last_tick
+    source = source or provider
+    symbols = list(symbols)
+    started = time.perf_counter()
+
+    try:
+        # A download that times out keeps going, its bars arrive next tick
+        _start_sync(symbols, source).result(timeout=FETCH_TIMEOUT)
+    except Exception as e:
+        # Analysis still runs on whatever is already stored
+        print(f"Bar sync failed: {e}")
+    download_s = time.perf_counter() - started
+    TICK_STAGE.observe(download_s, stage="download")
+
+    analyze_started = time.perf_counter()
+    with TICK_STAGE.time(stage="indicators"):
+        day_bars = _update_indicators(symbols)
+    stats_by_symbol = {}
+    for symbol in symbols:
+        stats = indicator_engine.stats(symbol)
+        if stats:
+            stats_by_symbol[symbol] = stats
         else:
-            change_percent = 0.0
-
-        # "Relatively Low" Logic
-        reasons = []
-        is_low = False
-        
-        # Condition A: Price <= 20-day MA
-        if current_price <= ma_20:
-            reasons.append(f"Below 20-day MA ({ma_20:.2f})")
-            is_low = True
-            
-        # Condition B: Price within bottom 20% of 30-day range
-        range_30 = max_30 - min_30
-        threshold_20_percent = min_30 + (range_30 * 0.20) if range_30 > 0 else min_30
-        if current_price <= threshold_20_percent:
-            reasons.append(f"In bottom 20% of 30-day range")
-            is_low = True
-            
-        # Special Condition: Near 250-day low
-        if current_price <= two_fifty_day_low * 1.01:
-            reasons.append(f"Near 250-day low")
-            is_low = True
-
-        # Logic to fetch extended info
-        try:
-            info = ticker.info
-            market_cap = info.get('marketCap')
-            volume = info.get('volume')
-            open_price = info.get('open')
-            day_high = info.get('dayHigh')
-            day_low = info.get('dayLow')
-            fifty_two_week_high = info.get('fiftyTwoWeekHigh')
-            fifty_two_week_low = info.get('fiftyTwoWeekLow')
-            pe_ratio = info.get('trailingPE')
-        except:
-             # Fallback if info fetch fails or is throttled
-            market_cap, volume, open_price, day_high, day_low, fifty_two_week_high, fifty_two_week_low, pe_ratio = (None,) * 8
-
-        status = "NORMAL"
-        if current_price <= two_fifty_day_low * 1.05: # Within 5% of yearly low
-             status = "CRITICAL DIP"
-             is_low = True
-        elif is_low:
-            status = "LOW"
-        elif current_price >= max_30 * 0.98: # Near high
-            status = "HIGH"
-
-        return {
-            "symbol": symbol,
-            "price": current_price,
-            "change_percent": change_percent,
-            "status": status,
-            "is_low": is_low,
-            "details": ", ".join(reasons) if reasons else "Normal price action",
-            "market_cap": market_cap,
-            "volume": volume,
-            "open_price": open_price,
-            "day_high": day_high,
-            "day_low": day_low,
-            "fifty_two_week_high": fifty_two_week_high,
-            "fifty_two_week_low": fifty_two_week_low,
-            "pe_ratio": pe_ratio,
-            "seven_day_avg": seven_day_avg,
-            "seven_day_low": seven_day_low,
-            "two_fifty_day_low": two_fifty_day_low,
-            "two_fifty_day_avg": two_fifty_day_avg
-        }
+            print(f"No data found for {symbol} (History Empty)")
+    try:
+        with TICK_STAGE.time(stage="classify"):
+            results = analyze_batch(stats_by_symbol, day_bars)
+    except Exception as e:
+        print(f"Error analyzing batch: {e}")
+        results = {}
+    analyze_s = time.perf_counter() - analyze_started
+
+    last_tick = {
+        "symbols": len(symbols),
+        "fetched": len(results),
+        "download_s": round(download_s, 3),
+        "analyze_s": round(analyze_s, 3),
+        "total_s": round(time.perf_counter() - started, 3),
+    }
+    return results
 
+def analyze_stock(symbol):
+    print(f"Fetching data for {symbol}...")
+    try:
+        return fetch_all([symbol]).get(symbol)
     except Exception as e:
         print(f"Error fetching {symbol}: {e}")
         return None
 
-def update_all_stocks():
+def price_row(data, timestamp):
+    """Maps an analysis dict onto the StockPrice / LatestPrice columns."""
+    row = {field: data.get(field) for field in QUOTE_FIELDS}
+    row["timestamp"] = timestamp
+    return row
+
+def latest_rows(session):
+    """The last written quote of every symbol, as save_prices() rows."""
+    return [
+        {field: getattr(latest, field) for field in QUOTE_FIELDS}
+        for _, latest in latest_quotes(session)
+        if latest is not None
+    ]
+
+def update_all_stocks(symbols=None):
+    """Fetches, analyzes and saves one tick for all stocks, or only for `symbols`."""
     if not is_market_open():
         print("Market is closed. Skipping update.")
-        return
+        return {"skipped": "Market is closed"}
+    with TICK.time():
+        return _run_tick(symbols)
 
+def _run_tick(symbols):
     session = SessionLocal()
-    stocks = session.query(Stock).all()
-    base_url = os.getenv("BASE_URL", "http://localhost:8000")
-    
-    for stock in stocks:
-        print(f"Analyzing {stock.symbol}...")
-        data = analyze_stock(stock.symbol)
-        if data:
-            print(f" > Got data for {stock.symbol}: {data['price']}")
-            
-            # Automated Alert Logic: BELOW 250-DAY LOW (Golden Opportunity)
-            if data["price"] <= data["two_fifty_day_low"]:
-                msg = (
-                    f"\ud83d\udd25 <b>GOLDEN OPPORTUNITY: {stock.name} ({stock.symbol})</b>\n\n"
-                    f"Current Price: \u20b9{data['price']:.2f}\n"
-                    f"<b>250-Day Lowest: \u20b9{data['two_fifty_day_low']:.2f}</b>\n"
-                    f"Action: Price has hit a 1-YEAR (250-day) LOW!\n\n"
-                    f"<a href='{base_url}/static/details.html?symbol={stock.symbol}'>Investigate Now</a>"
-                )
-                send_telegram_message(msg)
-
-            # Save to DB
-            new_price = StockPrice(
-                symbol=data["symbol"],
-                price=data["price"],
-                change_percent=data["change_percent"],
-                status=data["status"],
-                is_low=data["is_low"],
-                details=data["details"],
-                timestamp=datetime.utcnow(),
-                market_cap=data.get("market_cap"),
-                volume=data.get("volume"),
-                open_price=data.get("open_price"),
-                day_high=data.get("day_high"),
-                day_low=data.get("day_low"),
-                fifty_two_week_high=data.get("fifty_two_week_high"),
-                fifty_two_week_low=data.get("fifty_two_week_low"),
-                pe_ratio=data.get("pe_ratio"),
-                seven_day_avg=data.get("seven_day_avg"),
-                seven_day_low=data.get("seven_day_low"),
-                two_fifty_day_low=data.get("two_fifty_day_low"),
-                two_fifty_day_avg=data.get("two_fifty_day_avg")
-            )
-            session.add(new_price)
-            
-    session.commit()
-    session.close()
-    print("All stocks updated.")
+    try:
+        query = session.query(Stock)
+        if symbols is not None:
+            query = query.filter(Stock.symbol.in_(list(symbols)))
+        stocks = query.all()
+        base_url = os.getenv("BASE_URL", "http://localhost:8000")
+
+        print(f"Analyzing {len(stocks)} stocks...")
+        results = fetch_all([stock.symbol for stock in stocks])
+        last_tick["missing"] = [stock.symbol for stock in stocks if not results.get(stock.symbol)]
+        TICK_SYMBOLS.inc(len(results), result="fetched")
+        TICK_SYMBOLS.inc(len(last_tick["missing"]), result="missing")
+        now = market_calendar.utc_now()
+        rows = []
+
+        for stock in stocks:
+            data = results.get(stock.symbol)
+            if data:
+                print(f" > Got data for {stock.symbol}: {data['price']}")
+                rows.append(price_row(data, now))
+
+        # Automated alerts: configurable rules, fired on edges with a cooldown
+        try:
+            with TICK_STAGE.time(stage="alerts"):
+                if not alert_engine.primed:
+                    alert_engine.prime(latest_rows(session))
+                names = {stock.symbol: stock.name for stock in stocks}
+                messages = []
+                for rule, row in alert_engine.evaluate(rows, now):
+                    print(f"Alert {rule.name!r} fired for {row['symbol']}")
+                    messages.append(rule.format(row, names.get(row["symbol"]), base_url))
+                # One digest per tick, delivered in the background
+                send_digest(messages)
+        except Exception as e:
+            # The prices are written either way
+            print(f"Error evaluating alerts: {e}")
+
+        # Save to DB: the whole tick in one transaction
+        db_started = time.perf_counter()
+        with TICK_STAGE.time(stage="db"):
+            save_prices(session, rows)
+        # For the API workers of other processes (see quote_snapshot.py)
+        try:
+            with TICK_STAGE.time(stage="snapshot"):
+                quote_snapshot.write(session)
+        except OSError as e:
+            print(f"Quote snapshot not written: {e}")
+        last_tick["db_s"] = round(time.perf_counter() - db_started, 3)
+    finally:
+        session.close()
+
+    # Push what changed to the connected dashboards
+    with TICK_STAGE.time(stage="publish"):
+        live.hub.publish(rows)
+    print(
+        f"All stocks updated: {last_tick['fetched']}/{last_tick['symbols']} in {last_tick['total_s'] + last_tick['db_s']:.2f}s "
+        f"(download {last_tick['download_s']:.2f}s, "
+        f"analyze {last_tick['analyze_s']:.2f}s, db {last_tick['db_s']:.2f}s)"
+    )
+    return last_tick
 
 if __name__ == "__main__":
     update_all_stocks()
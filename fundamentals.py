@@ -0,0 +1,122 @@
+"""Market cap, PE and 52-week range, kept out of the per-minute path.
+
+ticker.info is the slowest and most throttled yfinance call, and these
+fields barely move during a day. They live in the fundamentals table, are
+refreshed once they are older than FUNDAMENTALS_MAX_AGE_HOURS by an hourly
+scheduler job, and are read through an in-process cache.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+import os
+
+from sqlalchemy import or_
+
+from cache import TTLCache
+from database import SessionLocal, Stock, Fundamental, upsert as upsert_rows
+
+FUNDAMENTALS_MAX_AGE_HOURS = int(os.getenv("FUNDAMENTALS_MAX_AGE_HOURS", "24"))
+FUNDAMENTALS_CACHE_TTL = int(os.getenv("FUNDAMENTALS_CACHE_TTL", "3600"))
+FUNDAMENTALS_WORKERS = int(os.getenv("FUNDAMENTALS_WORKERS", "4"))
+FUNDAMENTALS_TIMEOUT = int(os.getenv("FUNDAMENTALS_TIMEOUT", "60"))
+
+FIELDS = ("market_cap", "pe_ratio", "fifty_two_week_high", "fifty_two_week_low")
+
+# ticker.info key -> column
+INFO_KEYS = {
+    "marketCap": "market_cap",
+    "trailingPE": "pe_ratio",
+    "fiftyTwoWeekHigh": "fifty_two_week_high",
+    "fiftyTwoWeekLow": "fifty_two_week_low",
+}
+
+cache = TTLCache(maxsize=4096, ttl=FUNDAMENTALS_CACHE_TTL)
+
+def from_info(symbol, info, now=None):
+    row = {column: info.get(key) for key, column in INFO_KEYS.items()}
+    row["symbol"] = symbol
+    row["updated_at"] = now or datetime.utcnow()
+    return row
+
+def upsert(session, rows):
+    if not rows:
+        return
+    upsert_rows(session, Fundamental, rows, ["symbol"], FIELDS + ("updated_at",))
+    session.commit()
+
+def _as_dict(fundamental):
+    return {field: getattr(fundamental, field) for field in FIELDS + ("updated_at",)}
+
+def get(symbol):
+    """Fundamentals of one symbol as a dict, or None if never fetched. Cached."""
+    return get_many([symbol]).get(symbol)
+
+def get_many(symbols):
+    result, missing = {}, []
+    for symbol in symbols:
+        value = cache.get(symbol)
+        if value is None:
+            missing.append(symbol)
+        else:
+            result[symbol] = value
+    if missing:
+        session = SessionLocal()
+        try:
+            for fundamental in session.query(Fundamental).filter(Fundamental.symbol.in_(missing)):
+                result[fundamental.symbol] = _as_dict(fundamental)
+                cache.set(fundamental.symbol, result[fundamental.symbol])
+        finally:
+            session.close()
+    return result
+
+def stale_symbols(session, now=None):
+    """Tracked symbols without fundamentals or with ones older than the max age."""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=FUNDAMENTALS_MAX_AGE_HOURS)
+    rows = (
+        session.query(Stock.symbol)
+        .outerjoin(Fundamental, Fundamental.symbol == Stock.symbol)
+        .filter(or_(Fundamental.updated_at.is_(None), Fundamental.updated_at < cutoff))
+        .all()
+    )
+    return [symbol for (symbol,) in rows]
+
+def refresh(symbols=None, source=None):
+    """Fetches ticker.info for `symbols` (default: the stale ones) and stores it."""
+    if source is None:
+        from fetcher import provider as source
+    session = SessionLocal()
+    try:
+        symbols = stale_symbols(session) if symbols is None else list(symbols)
+        if not symbols:
+            return {"refreshed": 0, "failed": []}
+
+        print(f"Refreshing fundamentals for {len(symbols)} symbols...")
+        pool = ThreadPoolExecutor(max_workers=FUNDAMENTALS_WORKERS)
+        try:
+            futures = {pool.submit(source.info, symbol): symbol for symbol in symbols}
+            done, _ = wait(futures, timeout=FUNDAMENTALS_TIMEOUT)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        now = datetime.utcnow()
+        rows = []
+        for future in done:
+            try:
+                info = future.result()
+            except Exception as e:
+                print(f"Info fetch failed for {futures[future]}: {e}")
+                continue
+            if info:
+                rows.append(from_info(futures[future], info, now))
+        upsert(session, rows)
+    finally:
+        session.close()
+
+    for row in rows:
+        cache.set(row["symbol"], {field: row[field] for field in FIELDS + ("updated_at",)})
+    failed = sorted(set(symbols) - {row["symbol"] for row in rows})
+    if failed:
+        print(f"No fundamentals for: {', '.join(failed)}")
+    return {"refreshed": len(rows), "failed": failed}
+
+if __name__ == "__main__":
+    refresh()
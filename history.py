@@ -0,0 +1,102 @@
+"""Intraday chart history from local storage.
+
+Recent minutes come from the raw stock_prices rows, older ones from the
+price_rollups buckets. The resolution is picked from the requested period:
+the finest rollup whose retention still covers the start of the period.
+"""
+from datetime import timedelta
+
+import pandas as pd
+
+from compaction import ROLLUPS, bucket_offset, raw_cutoff, rollup_cutoff
+from database import StockPrice, PriceRollup
+from market_calendar import utc_now
+from providers import INTERVAL_FREQS, PERIOD_OFFSETS
+
+def period_start(period, now=None):
+    return pd.Timestamp(now or utc_now()) - PERIOD_OFFSETS[period]
+
+def pick_resolution(start, now=None):
+    """Returns "raw" or the finest rollup resolution that still reaches back to `start`."""
+    if start >= pd.Timestamp(raw_cutoff(now)):
+        return "raw"
+    for resolution in ROLLUPS:
+        expires = rollup_cutoff(resolution, now)
+        if expires is None or start >= pd.Timestamp(expires):
+            return resolution
+    return "1d"
+
+def _series(rows):
+    """{symbol: close Series} from (symbol, timestamp, close) rows ordered by symbol and time."""
+    if not rows:
+        return {}
+    df = pd.DataFrame(rows, columns=["symbol", "timestamp", "close"])
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return {
+        symbol: group.set_index("timestamp")["close"].astype(float)
+        for symbol, group in df.groupby("symbol", sort=False)
+    }
+
+def load_intraday_many(session, symbols, period, interval, now=None):
+    """Close series for several symbols with one query per table.
+
+    Returns {symbol: DataFrame with a "Close" column indexed by IST time}.
+    Symbols are left out when the period or interval is unsupported or local
+    storage does not reach back far enough, so the caller can go upstream.
+    """
+    symbols = list(symbols)
+    if not symbols or period not in PERIOD_OFFSETS or interval not in INTERVAL_FREQS:
+        return {}
+    now = now or utc_now()
+    start = period_start(period, now)
+    resolution = pick_resolution(start, now)
+
+    raw = _series(
+        session.query(StockPrice.symbol, StockPrice.timestamp, StockPrice.price)
+        .filter(StockPrice.symbol.in_(symbols), StockPrice.timestamp >= start.to_pydatetime())
+        .order_by(StockPrice.symbol, StockPrice.timestamp)
+        .all()
+    )
+
+    rolled = {}
+    if resolution != "raw":
+        rolled = _series(
+            session.query(PriceRollup.symbol, PriceRollup.bucket, PriceRollup.close)
+            .filter(
+                PriceRollup.symbol.in_(symbols),
+                PriceRollup.resolution == resolution,
+                PriceRollup.bucket >= start.to_pydatetime(),
+            )
+            .order_by(PriceRollup.symbol, PriceRollup.bucket)
+            .all()
+        )
+
+    freq = INTERVAL_FREQS[interval]
+    frames = {}
+    for symbol in symbols:
+        closes = raw.get(symbol)
+        if resolution != "raw":
+            # Raw rows that are not compacted yet are brought down to the same resolution
+            rollup_freq = ROLLUPS[resolution][0]
+            parts = [rolled[symbol]] if symbol in rolled else []
+            if closes is not None:
+                parts.append(closes.resample(rollup_freq, offset=bucket_offset(rollup_freq)).last().dropna())
+            if not parts:
+                continue
+            closes = pd.concat(parts)
+            closes = closes[~closes.index.duplicated(keep="last")].sort_index()
+
+        if closes is None or closes.empty or closes.index[0] > start + timedelta(days=1):
+            # Local data starts too late to cover this period
+            continue
+
+        if resolution == "raw" or pd.Timedelta(freq) > pd.Timedelta(ROLLUPS[resolution][0]):
+            closes = closes.resample(freq, offset=bucket_offset(freq)).last().dropna()
+
+        closes.index = closes.index.tz_localize("UTC").tz_convert("Asia/Kolkata")
+        frames[symbol] = closes.to_frame("Close")
+    return frames
+
+def load_intraday(session, symbol, period, interval, now=None):
+    """Single-symbol load_intraday_many(). Returns None when it isn't stored locally."""
+    return load_intraday_many(session, [symbol], period, interval, now).get(symbol)
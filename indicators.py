@@ -0,0 +1,169 @@
+"""Incremental rolling indicators for the low-price analysis.
+
+Every window keeps a running sum plus monotonic deques for its min and max,
+so a new price updates all indicators of a symbol in constant time.
+
+Windows only hold *committed* bars (finished trading days). The bar for the
+current day keeps changing while the market is open, so it is held apart and
+folded in when the stats are read. It is committed once a newer date arrives.
+"""
+from collections import deque
+
+from dateutil.relativedelta import relativedelta
+
+from providers import PERIOD_OFFSETS
+
+class RollingWindow:
+    """Sliding window over (date, value) pairs with O(1) sum, min and max.
+
+    `size` bounds the number of values, `span` (a period string such as
+    "1mo") bounds their age relative to the newest date.
+    """
+
+    def __init__(self, size=None, span=None):
+        self.size = size
+        self.offset = relativedelta(**PERIOD_OFFSETS[span].kwds) if span else None
+        self.values = deque()
+        self.total = 0.0
+        self._min = deque()
+        self._max = deque()
+
+    def __len__(self):
+        return len(self.values)
+
+    def push(self, date, value):
+        self.values.append((date, value))
+        self.total += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((date, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((date, value))
+        if self.size is not None:
+            while len(self.values) > self.size:
+                self._popleft()
+
+    def evict(self, newest):
+        """Drops values that fell out of the span ending at `newest`."""
+        if self.offset is None:
+            return
+        start = newest - self.offset
+        while self.values and self.values[0][0] <= start:
+            self._popleft()
+
+    def _popleft(self):
+        date, value = self.values.popleft()
+        self.total -= value
+        if self._min and self._min[0][0] == date:
+            self._min.popleft()
+        if self._max and self._max[0][0] == date:
+            self._max.popleft()
+
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+class SymbolIndicators:
+    """Rolling state for one symbol.
+
+    The windows mirror the original pandas code: a 20-bar MA and 7-bar stats
+    taken from the last month of bars, the 30-day range over that month and
+    the 250-day stats over one year. The count windows hold one bar less than
+    their length because the current bar is added on read.
+    """
+
+    def __init__(self):
+        self.ma_20 = RollingWindow(size=19)
+        self.seven = RollingWindow(size=6)
+        self.month = RollingWindow(span="1mo")
+        self.year = RollingWindow(span="1y")
+        self.current_date = None
+        self.current_price = None
+
+    def update(self, date, price):
+        """Feeds the latest close for `date`. Returns False for out-of-order dates."""
+        if self.current_date is not None:
+            if date < self.current_date:
+                return False
+            if date > self.current_date:
+                self._commit()
+        self.current_date = date
+        self.current_price = float(price)
+        self.month.evict(date)
+        self.year.evict(date)
+        return True
+
+    def _commit(self):
+        for window in (self.ma_20, self.seven, self.month, self.year):
+            window.push(self.current_date, self.current_price)
+
+    def stats(self):
+        """Returns the indicators including the current bar, or None before the first update."""
+        if self.current_price is None:
+            return None
+        price = self.current_price
+        month_count = len(self.month) + 1
+
+        if month_count >= 20:
+            ma_20 = (self.ma_20.total + price) / 20
+        else:
+            ma_20 = (self.month.total + price) / month_count
+
+        seven = self.seven if month_count >= 7 else self.month
+        seven_count = len(seven) + 1
+
+        if month_count >= 2:
+            prev_close = self.month.values[-1][1]
+            change_percent = ((price - prev_close) / prev_close) * 100
+        else:
+            change_percent = 0.0
+
+        return {
+            "price": price,
+            "change_percent": change_percent,
+            "ma_20": ma_20,
+            "seven_day_avg": (seven.total + price) / seven_count,
+            "seven_day_low": _min(seven.min(), price),
+            "min_30": _min(self.month.min(), price),
+            "max_30": _max(self.month.max(), price),
+            "two_fifty_day_low": _min(self.year.min(), price),
+            "two_fifty_day_avg": (self.year.total + price) / (len(self.year) + 1),
+        }
+
+def _min(window_min, price):
+    return price if window_min is None else min(window_min, price)
+
+def _max(window_max, price):
+    return price if window_max is None else max(window_max, price)
+
+class IndicatorEngine:
+    """Indicator state for every tracked symbol."""
+
+    def __init__(self):
+        self.symbols = {}
+
+    def __contains__(self, symbol):
+        return symbol in self.symbols
+
+    def restore(self, symbol, bars):
+        """Rebuilds a symbol's state from stored daily bars (oldest first)."""
+        state = SymbolIndicators()
+        for ts, close in zip(bars.index, bars["Close"]):
+            state.update(ts.date(), close)
+        self.symbols[symbol] = state
+        return state
+
+    def update(self, symbol, date, price):
+        state = self.symbols.setdefault(symbol, SymbolIndicators())
+        return state.update(date, price)
+
+    def current_date(self, symbol):
+        state = self.symbols.get(symbol)
+        return state.current_date if state else None
+
+    def stats(self, symbol):
+        state = self.symbols.get(symbol)
+        return state.stats() if state else None
@@ -0,0 +1,75 @@
+"""Background jobs for slow operations triggered over the API.
+
+A job runs on a small dedicated thread pool and is tracked by id, so an
+endpoint can return immediately and the client polls /api/jobs/{job_id}.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import threading
+import uuid
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+MAX_JOBS = 200  # finished jobs kept for status lookups
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_jobs = OrderedDict()
+_lock = threading.Lock()
+
+def submit(kind, func, *args, **kwargs):
+    """Queues `func(*args, **kwargs)`. Returns the job dict.
+
+    While a job of the same kind is queued or running, that job is returned
+    instead of starting a second one.
+    """
+    with _lock:
+        for job in reversed(_jobs.values()):
+            if job["kind"] == kind and job["status"] in ("queued", "running"):
+                return dict(job)
+
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "kind": kind,
+            "status": "queued",
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "progress": None,
+        }
+        _jobs[job["id"]] = job
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+
+    _executor.submit(_run, job, func, args, kwargs)
+    return dict(job)
+
+_current = threading.local()
+
+def set_progress(**progress):
+    """Shown as "progress" of the job running on this thread; does nothing outside a job."""
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job["progress"] = progress
+
+def _run(job, func, args, kwargs):
+    job["status"] = "running"
+    job["started_at"] = datetime.utcnow()
+    _current.job = job
+    try:
+        job["result"] = func(*args, **kwargs)
+        job["status"] = "done"
+    except Exception as e:
+        print(f"Job {job['kind']} {job['id']} failed: {e}")
+        job["error"] = str(e)
+        job["status"] = "failed"
+    finally:
+        _current.job = None
+        job["finished_at"] = datetime.utcnow()
+
+def get(job_id):
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
@@ -0,0 +1,124 @@
+"""Server push of live quotes over Server-Sent Events.
+
+update_all_stocks() publishes every tick here once it is written. The hub
+keeps the last quote per symbol and sends subscribers only the fields that
+changed, so API load follows the tick rate instead of the number of open tabs.
+A slow client never queues up more than one pending delta per symbol: new
+deltas are merged into the ones it hasn't read yet.
+"""
+from datetime import datetime
+import asyncio
+import json
+import math
+import os
+import threading
+
+STREAM_KEEPALIVE = int(os.getenv("STREAM_KEEPALIVE", "15"))
+
+# latest_prices column -> field name used by /api/stocks
+API_NAMES = {"change_percent": "change"}
+
+def api_quote(row):
+    quote = {}
+    for field, value in row.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, float) and math.isnan(value):
+            value = None
+        quote[API_NAMES.get(field, field)] = value
+    return quote
+
+class Subscription:
+    def __init__(self, symbols=None):
+        self.symbols = symbols  # None means every symbol
+        self.pending = {}  # symbol -> merged delta not sent yet
+        self.event = asyncio.Event()
+
+    def offer(self, deltas):
+        for delta in deltas:
+            if self.symbols is None or delta["symbol"] in self.symbols:
+                self.pending.setdefault(delta["symbol"], {}).update(delta)
+                self.event.set()
+
+    async def next(self, timeout):
+        """Waits up to `timeout` seconds and returns the pending deltas ([] on timeout)."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.event.clear()
+        batch = list(self.pending.values())
+        self.pending = {}
+        return batch
+
+class QuoteHub:
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+        self._last = {}  # symbol -> last published quote
+        self._subscribers = set()
+
+    def attach(self, loop):
+        """Registers the event loop the subscribers live on. Called at app startup."""
+        self._loop = loop
+
+    def publish(self, rows):
+        """Publishes a tick of save_prices() rows. Safe to call from any thread."""
+        deltas = []
+        with self._lock:
+            for row in rows:
+                quote = api_quote(row)
+                symbol = quote["symbol"]
+                previous = self._last.get(symbol, {})
+                delta = {key: value for key, value in quote.items() if previous.get(key) != value}
+                self._last[symbol] = quote
+                if delta:
+                    delta["symbol"] = symbol
+                    deltas.append(delta)
+
+        loop = self._loop
+        if deltas and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._broadcast, deltas)
+        return deltas
+
+    def _broadcast(self, deltas):
+        with self._lock:
+            subscriptions = list(self._subscribers)
+        for subscription in subscriptions:
+            subscription.offer(deltas)
+
+    def subscribe(self, symbols=None):
+        """Must be called on the event loop. Starts with the last known quotes."""
+        subscription = Subscription(set(symbols) if symbols else None)
+        with self._lock:
+            snapshot = list(self._last.values())
+            self._subscribers.add(subscription)
+        subscription.offer(snapshot)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def watched(self):
+        """Symbols someone subscribed to by name, e.g. from an open details page."""
+        with self._lock:
+            return set().union(*(s.symbols for s in self._subscribers if s.symbols is not None))
+
+    def stats(self):
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "symbols": len(self._last)}
+
+async def sse_events(subscription, request, keepalive=STREAM_KEEPALIVE):
+    """text/event-stream body: a "quotes" event per batch of deltas, comments as keepalive."""
+    try:
+        while not await request.is_disconnected():
+            batch = await subscription.next(keepalive)
+            if batch:
+                yield f"event: quotes\ndata: {json.dumps(batch)}\n\n"
+            else:
+                yield ": keepalive\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+hub = QuoteHub()
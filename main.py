@@ -1,13 +1,45 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from database import SessionLocal, Stock, StockPrice, engine, Base
-from scheduler import start_scheduler
-import fetcher
+from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+from database import SessionLocal, latest_quotes
+import jobs
+import live
+import metrics
+import quote_snapshot
+from cache import TTLCache
+from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
+import os
+import time
 
-app = FastAPI(title="Stock Price Tracker")
+# fetcher, bar_store, history and downsample pull in pandas/numpy; they are
+# imported where they are used so the app can bind its port right away.
+
+# "all": serves the API and competes for the tick lease (the default).
+# "api": read-only worker, no scheduler and no database writes; quotes come
+# from the snapshot the fetching process shares (see quote_snapshot.py).
+APP_ROLE = os.getenv("APP_ROLE", "all")
+if APP_ROLE not in ("all", "api"):
+    raise ValueError(f"APP_ROLE must be 'all' or 'api', not {APP_ROLE!r}")
+
+@asynccontextmanager
+async def lifespan(app):
+    """Binds the port right away; the slow startup runs in the background (see initialize)."""
+    loop = asyncio.get_running_loop()
+    STARTUP_TIMINGS["app_s"] = round(time.perf_counter() - startup_state["started_at"], 3)
+    loop.run_in_executor(db_executor, initialize)
+    # Ticks are published from scheduler threads onto this loop
+    live.hub.attach(loop)
+    watcher = loop.create_task(watch_quote_snapshot()) if APP_ROLE == "api" else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+
+app = FastAPI(title="Stock Price Tracker", lifespan=lifespan)
 
 # CORS (Allow local dev)
 app.add_middleware(
@@ -18,160 +50,547 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+HTTP_REQUEST = metrics.timer("http_request", "API requests by route template")
+HTTP_RESPONSES = metrics.counter("http_responses_total", "API responses by route template and status code")
+API_DB = metrics.timer("api_db", "Database work done for API requests")
+
+async def record_request_metrics(request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the path: one series per endpoint, not per symbol
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST.observe(time.perf_counter() - started, method=request.method, route=path)
+        HTTP_RESPONSES.inc(method=request.method, route=path, status=str(status))
+        if status >= 500:
+            HTTP_REQUEST.errors.inc(method=request.method, route=path)
+
+if metrics.METRICS_ENABLED:
+    app.middleware("http")(record_request_metrics)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Dependency
-def get_db():
+# Blocking work runs on dedicated pools so a slow upstream can never starve
+# the threads that serve the database-only endpoints
+UPSTREAM_WORKERS = int(os.getenv("UPSTREAM_WORKERS", "8"))
+DB_WORKERS = int(os.getenv("DB_WORKERS", "8"))
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream")
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+def timed_db(func, *args):
+    with API_DB.time(call=func.__name__):
+        return func(*args)
+
+async def run_db(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(db_executor, timed_db, func, *args)
+
+async def run_upstream(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(upstream_executor, func, *args)
+
+# Chart history cache, keyed by (symbol, period, interval)
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "512"))
+HISTORY_TTL_OPEN = int(os.getenv("HISTORY_TTL_OPEN", "60"))
+HISTORY_TTL_CLOSED = int(os.getenv("HISTORY_TTL_CLOSED", "3600"))
+
+def history_ttl(key):
+    from market_calendar import is_market_open
+    # Bars only move while the market is open
+    return HISTORY_TTL_OPEN if is_market_open() else HISTORY_TTL_CLOSED
+
+history_cache = TTLCache(maxsize=HISTORY_CACHE_SIZE, ttl=history_ttl)
+
+def load_local_history(symbol, period, interval):
+    """Daily bars come from the bar store, intraday series from stock_prices and its rollups."""
+    import bar_store
+    import history
     db = SessionLocal()
     try:
-        yield db
+        if interval == "1d" and period in bar_store.LOCAL_PERIODS:
+            return bar_store.load_bars(db, [symbol], period).get(symbol)
+        return history.load_intraday(db, symbol, period, interval)
     finally:
         db.close()
 
-# Start Scheduler
-@app.on_event("startup")
-def startup_event():
-    # Ensure DB is init and seeded
-    from database import create_tables_and_seed
-    create_tables_and_seed()
-    
-    # Send Startup Message to Telegram
+def load_local_history_many(symbols, period, interval):
+    import bar_store
+    import history
+    db = SessionLocal()
+    try:
+        if interval == "1d" and period in bar_store.LOCAL_PERIODS:
+            return bar_store.load_bars(db, symbols, period)
+        return history.load_intraday_many(db, symbols, period, interval)
+    finally:
+        db.close()
+
+def load_upstream_history(symbol, period, interval):
+    from fetcher import provider
+    return provider.history([symbol], period, interval).get(symbol)
+
+async def load_history(symbol, period, interval):
+    """Chart bars for a symbol from local storage, or the market data provider when it isn't stored. Cached."""
+    key = (symbol, period, interval)
+    upstream_key = ("upstream",) + key
+    hist = history_cache.get_any([key, upstream_key])
+    if hist is not None:
+        return hist
+    hist = await run_db(history_cache.load, key, lambda: load_local_history(symbol, period, interval))
+    if hist is not None:
+        return hist
+    # Not stored locally (yet), go upstream
+    return await run_upstream(history_cache.load, upstream_key, lambda: load_upstream_history(symbol, period, interval))
+
+async def load_history_many(symbols, period, interval):
+    """load_history() for several symbols: cache first, then one local read and one
+    batched upstream download for whatever is still missing."""
+    result = {}
+    missing = []
+    for symbol in symbols:
+        hist = history_cache.get_any([(symbol, period, interval), ("upstream", symbol, period, interval)])
+        if hist is not None:
+            result[symbol] = hist
+        else:
+            missing.append(symbol)
+
+    if missing:
+        local = await run_db(load_local_history_many, missing, period, interval)
+        for symbol, hist in local.items():
+            history_cache.set((symbol, period, interval), hist)
+            result[symbol] = hist
+        missing = [symbol for symbol in missing if symbol not in local]
+
+    if missing:
+        from fetcher import provider
+        upstream = await run_upstream(provider.history, missing, period, interval)
+        for symbol, hist in upstream.items():
+            history_cache.set(("upstream", symbol, period, interval), hist)
+            result[symbol] = hist
+    return result
+
+# Startup: the port is bound right away, everything slow runs in the background.
+# /api/ready answers 503 until the database and scheduler are up.
+STARTUP_TIMINGS = {}
+startup_state = {"ready": False, "error": None, "started_at": time.perf_counter()}
+
+def timed(step, func, *args):
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        STARTUP_TIMINGS[step] = round(time.perf_counter() - started, 3)
+
+def send_startup_report():
+    from notifier import notify
+    db = SessionLocal()
     try:
-        from notifier import send_telegram_message
-        from database import SessionLocal, Stock, StockPrice
-        db = SessionLocal()
-        stocks = db.query(Stock).all()
-        
         message_lines = ["\ud83d\ude80 <b>Server Started! Initial Stock Report:</b>\n"]
-        for stock in stocks:
-            latest = db.query(StockPrice).filter(StockPrice.symbol == stock.symbol).order_by(StockPrice.timestamp.desc()).first()
+        for stock, latest in latest_quotes(db):
             if latest:
                 message_lines.append(f"\u2022 {stock.name}: \u20b9{latest.price:.2f} ({latest.change_percent:+.2f}%)")
-        
+    finally:
         db.close()
-        send_telegram_message("\n".join(message_lines))
+    # Queued, delivered by the notifier's worker
+    notify("\n".join(message_lines))
+
+def initialize():
+    if APP_ROLE == "api":
+        # The fetching process owns the schema and the ticks
+        startup_state["ready"] = True
+        STARTUP_TIMINGS["ready_s"] = round(time.perf_counter() - startup_state["started_at"], 3)
+        print(f"Startup finished (read-only API worker): {STARTUP_TIMINGS}")
+        return
+
+    from ticks import coordinator
+    try:
+        # Ensure DB is init and seeded
+        from database import create_tables_and_seed
+        timed("database_s", create_tables_and_seed)
+
+        # Load the fetch pipeline (pandas, numpy, ...) before the first tick needs it
+        def start():
+            import fetcher
+            from scheduler import start_scheduler
+            start_scheduler()
+        timed("scheduler_s", start)
+        startup_state["ready"] = True
+        STARTUP_TIMINGS["ready_s"] = round(time.perf_counter() - startup_state["started_at"], 3)
+        print(f"Startup finished: {STARTUP_TIMINGS}")
+    except Exception as e:
+        startup_state["error"] = str(e)
+        print(f"Startup failed: {e}")
+        return
+
+    # One report per deployment, not one per worker
+    if not coordinator.is_leader():
+        return
+    try:
+        quote_snapshot.write()
+    except OSError as e:
+        print(f"Quote snapshot not written: {e}")
+    try:
+        timed("report_s", send_startup_report)
     except Exception as e:
         print(f"Error sending startup notification: {e}")
 
-    start_scheduler()
+@app.get("/api/ready")
+async def readiness():
+    """Readiness probe: 200 once the database and the scheduler are up, 503 before."""
+    body = {"ready": startup_state["ready"], "error": startup_state["error"], "timings": STARTUP_TIMINGS}
+    if not startup_state["ready"]:
+        return JSONResponse(body, status_code=503)
+    return body
+
+async def watch_quote_snapshot():
+    """Publishes the quotes of the fetching process's ticks to this read-only worker's subscribers."""
+    loop = asyncio.get_running_loop()
+    last = None
+    while True:
+        await asyncio.sleep(quote_snapshot.QUOTE_SNAPSHOT_POLL_S)
+        try:
+            entries = await loop.run_in_executor(db_executor, quote_snapshot.read)
+        except Exception as e:
+            print(f"Error reading the quote snapshot: {e}")
+            continue
+        if entries is None or entries is last:
+            continue
+        last = entries
+        # Only the changes reach the subscribers
+        live.hub.publish([entry["quote"] for entry in entries if entry["quote"]])
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Stock Tracker API Running. Go to /static/index.html"}
 
+def query_latest(symbol=None):
+    db = SessionLocal()
+    try:
+        return latest_quotes(db, symbol)
+    finally:
+        db.close()
+
+def load_latest(symbol=None):
+    """[{"symbol", "name", "quote"}]: from the shared quote snapshot on read-only workers, else the database."""
+    entries = quote_snapshot.read() if APP_ROLE == "api" else None
+    if entries is not None:
+        if symbol is None:
+            return entries
+        entries = [entry for entry in entries if entry["symbol"] == symbol]
+        if entries:
+            return entries
+    # Not a read-only worker, no snapshot yet, or a stock added since the last tick
+    db = SessionLocal()
+    try:
+        return quote_snapshot.build(db, symbol)
+    finally:
+        db.close()
+
 @app.get("/api/stocks")
-def get_stocks(db: Session = Depends(get_db)):
-    # Get list of tracked stocks
-    stocks = db.query(Stock).all()
+async def get_stocks():
+    # Tracked stocks with their latest quote, without a query when the snapshot is there
     results = []
     
-    for stock in stocks:
-        # Get latest price entry
-        latest = db.query(StockPrice).filter(StockPrice.symbol == stock.symbol).order_by(StockPrice.timestamp.desc()).first()
-        
+    for entry in await run_db(load_latest):
+        latest = entry["quote"] or {}
         stock_data = {
-            "symbol": stock.symbol,
-            "name": stock.name,
-            "price": latest.price if latest else 0.0,
-            "change": latest.change_percent if latest else 0.0,
-            "status": latest.status if latest else "PENDING",
-            "is_low": latest.is_low if latest else False,
-            "details": latest.details if latest else "No data yet",
-            "timestamp": latest.timestamp if latest else None,
-            "seven_day_avg": latest.seven_day_avg if latest else 0.0,
-            "two_fifty_day_low": latest.two_fifty_day_low if latest else 0.0,
-            "two_fifty_day_avg": latest.two_fifty_day_avg if latest else 0.0
+            "symbol": entry["symbol"],
+            "name": entry["name"],
+            "price": latest.get("price", 0.0),
+            "change": latest.get("change_percent", 0.0),
+            "status": latest.get("status", "PENDING"),
+            "is_low": latest.get("is_low", False),
+            "details": latest.get("details", "No data yet"),
+            "timestamp": latest.get("timestamp"),
+            "seven_day_avg": latest.get("seven_day_avg", 0.0),
+            "two_fifty_day_low": latest.get("two_fifty_day_low", 0.0),
+            "two_fifty_day_avg": latest.get("two_fifty_day_avg", 0.0)
         }
         results.append(stock_data)
         
     return results
 
 @app.get("/api/stocks/{symbol}")
-def get_stock_detail(symbol: str, db: Session = Depends(get_db)):
-    stock = db.query(Stock).filter(Stock.symbol == symbol).first()
-    if not stock:
+async def get_stock_detail(symbol: str):
+    entries = await run_db(load_latest, symbol)
+    if not entries:
         raise HTTPException(status_code=404, detail="Stock not found")
-        
-    latest = db.query(StockPrice).filter(StockPrice.symbol == stock.symbol).order_by(StockPrice.timestamp.desc()).first()
+    entry = entries[0]
+    latest = entry["quote"] or {}
+    import fundamentals
+    fundamental = await run_db(fundamentals.get, symbol) or {}
+
+    def slow_field(field):
+        # Fundamentals table first; minute rows written before it existed carry them too
+        value = fundamental.get(field)
+        if value is None:
+            value = latest.get(field)
+        return value
     
-    # Calculate 7-Day Stats (On-fly to avoid DB reset)
-    import yfinance as yf
+    # 7-Day Stats from the local bar store
     seven_day_avg = None
     seven_day_min = None
     seven_day_max = None
     try:
-        # Fetch 7 days of daily data
-        t = yf.Ticker(symbol)
-        h7 = t.history(period="7d")
-        if not h7.empty:
-            seven_day_avg = h7['Close'].mean()
-            seven_day_min = h7['Close'].min()
-            seven_day_max = h7['Close'].max()
+        h7 = await load_history(symbol, "7d", "1d")
     except Exception as e:
         print(f"Error 7d stats: {e}")
+        h7 = None
+    if h7 is not None and not h7.empty:
+        seven_day_avg = float(h7['Close'].mean())
+        seven_day_min = float(h7['Close'].min())
+        seven_day_max = float(h7['Close'].max())
 
     return {
-        "symbol": stock.symbol,
-        "name": stock.name,
-        "price": latest.price if latest else 0.0,
-        "change": latest.change_percent if latest else 0.0,
-        "status": latest.status if latest else "PENDING",
-        "is_low": latest.is_low if latest else False,
-        "details": latest.details if latest else "No data yet",
-        "market_cap": latest.market_cap if latest else None,
-        "volume": latest.volume if latest else None,
-        "open_price": latest.open_price if latest else None,
-        "day_high": latest.day_high if latest else None,
-        "day_low": latest.day_low if latest else None,
-        "fifty_two_week_high": latest.fifty_two_week_high if latest else None,
-        "fifty_two_week_low": latest.fifty_two_week_low if latest else None,
-        "pe_ratio": latest.pe_ratio if latest else None,
-        "timestamp": latest.timestamp if latest else None,
+        "symbol": entry["symbol"],
+        "name": entry["name"],
+        "price": latest.get("price", 0.0),
+        "change": latest.get("change_percent", 0.0),
+        "status": latest.get("status", "PENDING"),
+        "is_low": latest.get("is_low", False),
+        "details": latest.get("details", "No data yet"),
+        "market_cap": slow_field("market_cap"),
+        "volume": latest.get("volume"),
+        "open_price": latest.get("open_price"),
+        "day_high": latest.get("day_high"),
+        "day_low": latest.get("day_low"),
+        "fifty_two_week_high": slow_field("fifty_two_week_high"),
+        "fifty_two_week_low": slow_field("fifty_two_week_low"),
+        "pe_ratio": slow_field("pe_ratio"),
+        "timestamp": latest.get("timestamp"),
+        "fundamentals_updated_at": fundamental.get("updated_at"),
         # New Stats
         "seven_day_avg": seven_day_avg,
         "seven_day_min": seven_day_min,
         "seven_day_max": seven_day_max,
         "seven_day_low": seven_day_min, # Unified naming
-        "two_fifty_day_low": latest.two_fifty_day_low if latest else None
+        "two_fifty_day_low": latest.get("two_fifty_day_low")
     }
 
+def series_payload(hist, max_points):
+    """Columnar chart payload: epoch-millisecond times in `t`, closes in `c`."""
+    from downsample import lttb
+    if hist is None or hist.empty:
+        return {"t": [], "c": []}
+    closes = hist["Close"].dropna()
+    index = closes.index
+    if index.tz is None:
+        # Daily bars from the bar store are IST dates
+        index = index.tz_localize("Asia/Kolkata")
+    t = index.as_unit("ms").asi8
+    c = closes.to_numpy(dtype=float)
+    if max_points and len(c) > max_points:
+        keep = lttb(t, c, max_points)
+        t, c = t[keep], c[keep]
+    return {"t": t.tolist(), "c": c.round(4).tolist()}
+
+@app.get("/api/history")
+async def get_history_batch(symbols: str, period: str = "5d", interval: str = "60m", max_points: int = 500):
+    """History for a comma separated list of symbols in one response:
+    {"series": {symbol: {"t": [...], "c": [...]}}}. Used for the dashboard sparklines."""
+    wanted = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    try:
+        frames = await load_history_many(wanted, period, interval)
+    except Exception as e:
+        print(f"Error fetching batch history: {e}")
+        frames = {}
+    series = {symbol: series_payload(frames.get(symbol), max_points) for symbol in wanted}
+    return {"period": period, "interval": interval, "series": series}
+
 @app.get("/api/history/{symbol}")
-def get_stock_history(symbol: str, period: str = "5d", interval: str = "60m"):
-    """Fetch recent history for charting. Defaults to 5 days hourly."""
-    import yfinance as yf
-    try:
-        ticker = yf.Ticker(symbol)
-        # Fetch history
-        hist = ticker.history(period=period, interval=interval)
-        data = []
-        for date, row in hist.iterrows():
-            data.append({
-                "date": date.strftime("%Y-%m-%d %H:%M"),
-                "close": row['Close']
-            })
-        return data
+async def get_stock_history(symbol: str, period: str = "5d", interval: str = "60m", max_points: int = 500):
+    """Fetch recent history for charting. Defaults to 5 days hourly.
+
+    Longer series are downsampled with LTTB to at most `max_points` points (0 disables it).
+    """
+    try:
+        hist = await load_history(symbol, period, interval)
+        payload = series_payload(hist, max_points)
     except Exception as e:
         print(f"Error fetching history: {e}")
-        return []
+        payload = {"t": [], "c": []}
+    return {"symbol": symbol, "period": period, "interval": interval, **payload}
+
+@app.get("/api/screener")
+async def get_screener(
+    filters: list[str] = Query([], alias="filter"),
+    period: str = "5d",
+    as_of: str = None,
+    symbols: str = "",
+    sort: str = None,
+    limit: int = 100,
+):
+    """Screens every symbol over the columnar snapshot of the daily bars.
+
+    `filter` is repeatable and uses the alert rule syntax, e.g.
+    ?filter=hit_year_low == 1&period=5d or ?filter=drawdown_pct <= -15&sort=drawdown_pct
+    """
+    import screener
+    wanted = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    try:
+        return await run_db(screener.screen, filters, period, as_of, wanted, sort, limit)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/stream")
+async def stream_quotes(request: Request, symbols: str = ""):
+    """Server-Sent Events with per-symbol quote deltas, pushed after every tick.
+
+    `symbols` is an optional comma separated filter. The first event carries the
+    last known quote of every subscribed symbol, later ones only changed fields.
+    """
+    wanted = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    subscription = live.hub.subscribe(wanted)
+    return StreamingResponse(
+        live.sse_events(subscription, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/stream/stats")
+async def get_stream_stats():
+    return live.hub.stats()
+
+@app.get("/api/notifications/stats")
+async def get_notification_stats():
+    """Telegram delivery counters and queue-to-delivery latency"""
+    import notifier
+    return notifier.stats()
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters of the chart history cache"""
+    return history_cache.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format: tick stages, upstream calls per symbol, API, DB and Telegram timings"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    import notifier
+    cache_stats = history_cache.stats()
+    gauges = {f"history_cache_{key}_total": cache_stats[key] for key in ("hits", "misses", "coalesced", "evictions")}
+    gauges["history_cache_size"] = cache_stats["size"]
+    telegram = notifier.stats()
+    gauges.update({f"telegram_{key}_total": telegram[key] for key in notifier.metrics})
+    gauges["telegram_queue_pending"] = telegram["pending"]
+    stream = live.hub.stats()
+    gauges["stream_subscribers"] = stream["subscribers"]
+    gauges["stream_symbols"] = stream["symbols"]
+    gauges["app_ready"] = int(startup_state["ready"])
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
 
-@app.post("/api/refresh")
-def refresh_data():
-    """Manually trigger a data refresh"""
-    fetcher.update_all_stocks()
-    return {"message": "Update triggered"}
+def require_writer():
+    if APP_ROLE == "api":
+        raise HTTPException(status_code=409, detail="Read-only API worker: changes go to a process with APP_ROLE=all")
+
+@app.post("/api/refresh", status_code=202)
+async def refresh_data():
+    """Queue a data refresh. Poll /api/jobs/{job_id} for its progress."""
+    from ticks import coordinator
+    require_writer()
+    # Goes through the tick coordinator, so it never overlaps a scheduled tick
+    job = jobs.submit("refresh", coordinator.request, None, "api", wait=True)
+    return {"message": "Update queued", "job_id": job["id"], "status": job["status"]}
+
+@app.get("/api/ticks")
+async def get_ticks():
+    """Recent ticks (duration, lag, skipped symbols) and the coordinator state"""
+    from ticks import coordinator
+    return coordinator.stats()
+
+class UniverseAddition(BaseModel):
+    symbols: list  # "RELIANCE", "TCS.NS" or {"symbol", "name"}
+    watchlist: str = None
+    backfill: bool = True
+
+def onboard(entries, watchlist, backfill):
+    import universe
+    db = SessionLocal()
+    try:
+        result = universe.add(db, entries, watchlist)
+    finally:
+        db.close()
+    if result["added"] and backfill:
+        job = universe.submit_backfill()
+        result["job_id"] = job["id"]
+    return result
+
+@app.post("/api/universe", status_code=202)
+async def add_symbols(body: UniverseAddition):
+    """Track symbols, optionally in a watchlist.
+
+    New symbols are backfilled in the background; poll /api/jobs/{job_id} for the progress.
+    """
+    require_writer()
+    return await run_db(onboard, body.symbols, body.watchlist, body.backfill)
+
+@app.post("/api/universe/import", status_code=202)
+async def import_constituents(request: Request, watchlist: str = None, backfill: bool = True):
+    """Track the constituents of an index CSV sent as the request body (NSE format, e.g. ind_nifty500list.csv)."""
+    import universe
+    require_writer()
+    text = (await request.body()).decode("utf-8-sig")
+    try:
+        entries = universe.read_constituents(text)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await run_db(onboard, entries, watchlist, backfill)
+
+def with_session(func, *args):
+    """Runs func(session, *args) on a session of its own, on the calling (executor) thread."""
+    db = SessionLocal()
+    try:
+        return func(db, *args)
+    finally:
+        db.close()
+
+@app.delete("/api/universe/{symbol}")
+async def remove_symbol(symbol: str):
+    """Stop tracking a symbol; its stored history is kept"""
+    import universe
+    require_writer()
+    removed = await run_db(with_session, universe.remove, [symbol])
+    if not removed:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    return {"removed": removed}
+
+@app.get("/api/watchlists")
+async def get_watchlists():
+    import universe
+    return await run_db(with_session, universe.watchlists)
+
+@app.delete("/api/watchlists/{name}")
+async def delete_watchlist(name: str, prune: bool = False):
+    """Delete a watchlist; with prune=true its symbols that are in no other watchlist stop being tracked"""
+    import universe
+    require_writer()
+    removed = await run_db(with_session, universe.drop_watchlist, name, prune)
+    if removed is None:
+        raise HTTPException(status_code=404, detail="Watchlist not found")
+    return {"watchlist": name, "removed": removed}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @app.post("/api/notify/{symbol}")
-def manual_notify(symbol: str, db: Session = Depends(get_db)):
+async def manual_notify(symbol: str):
     """Manually send a status alert to Telegram"""
     from notifier import send_telegram_message
-    import os
     
-    stock = db.query(Stock).filter(Stock.symbol == symbol).first()
-    if not stock:
+    rows = await run_db(query_latest, symbol)
+    if not rows:
         raise HTTPException(status_code=404, detail="Stock not found")
-        
-    latest = db.query(StockPrice).filter(StockPrice.symbol == stock.symbol).order_by(StockPrice.timestamp.desc()).first()
+    stock, latest = rows[0]
     
     if not latest:
         raise HTTPException(status_code=400, detail="No data available for this stock")
@@ -189,7 +608,7 @@ def manual_notify(symbol: str, db: Session = Depends(get_db)):
         f"<a href='{base_url}/static/details.html?symbol={stock.symbol}'>Open Dashboard</a>"
     )
     
-    success = send_telegram_message(msg)
+    success = await run_upstream(send_telegram_message, msg)
     if success:
         return {"message": "Notification sent successfully"}
     else:
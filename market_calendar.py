@@ -0,0 +1,105 @@
+"""NSE trading calendar.
+
+Regular sessions run Monday to Friday; exchange holidays are closed and
+special sessions (Muhurat trading, weekend sessions) open for their own
+window, even on a holiday or a weekend. The dates live in NSE_CALENDAR_FILE.
+Years without any holiday in the file are warned about: every weekday of
+them counts as a trading day until the exchange's list is added.
+"""
+from datetime import datetime, timedelta, timezone
+import json
+import os
+
+NSE_CALENDAR_FILE = os.getenv(
+    "NSE_CALENDAR_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "nse_calendar.json")
+)
+
+IST_OFFSET = timedelta(hours=5, minutes=30)
+
+_clock = None
+
+def set_clock(clock):
+    """Replaces the wall clock with `clock()` -> naive IST datetime, e.g. a replay's; None resets."""
+    global _clock
+    _clock = clock
+
+def ist_now():
+    if _clock is not None:
+        return _clock()
+    # Servers (Render etc.) run in UTC
+    return datetime.utcnow() + IST_OFFSET
+
+def utc_now():
+    return ist_now() - IST_OFFSET
+
+def epoch_now():
+    """Seconds since the epoch on the same clock as ist_now()."""
+    return utc_now().replace(tzinfo=timezone.utc).timestamp()
+
+def _time(value):
+    return datetime.strptime(value, "%H:%M").time()
+
+class MarketCalendar:
+    def __init__(self, path=NSE_CALENDAR_FILE):
+        self.path = path
+        spec = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                spec = json.load(f)
+        else:
+            print(f"Market calendar {path} not found, assuming no holidays.")
+        regular = spec.get("regular_session", {"open": "09:00", "close": "15:30"})
+        self.open_time = _time(regular["open"])
+        self.close_time = _time(regular["close"])
+        self.holidays = {datetime.strptime(day, "%Y-%m-%d").date(): name for day, name in spec.get("holidays", {}).items()}
+        self.special_sessions = {
+            datetime.strptime(day, "%Y-%m-%d").date(): (_time(session["open"]), _time(session["close"]), session.get("name", "Special session"))
+            for day, session in spec.get("special_sessions", {}).items()
+        }
+        self.years = {day.year for day in self.holidays}
+        self._warned = set()
+
+    def _check_year(self, year):
+        if year in self.years or year in self._warned or not self.years:
+            return
+        self._warned.add(year)
+        print(
+            f"WARNING: market calendar {self.path} has no holidays for {year} "
+            f"(covers {min(self.years)}-{max(self.years)}); every weekday counts as a trading day."
+        )
+
+    def session(self, day):
+        """(open, close) IST datetimes of the session on `day`, or None when closed."""
+        self._check_year(day.year)
+        if day in self.special_sessions:
+            open_time, close_time, _ = self.special_sessions[day]
+        elif day.weekday() >= 5 or day in self.holidays:
+            return None
+        else:
+            open_time, close_time = self.open_time, self.close_time
+        return datetime.combine(day, open_time), datetime.combine(day, close_time)
+
+    def is_trading_day(self, day):
+        return self.session(day) is not None
+
+    def is_open(self, now=None):
+        """`now` is a naive IST datetime, the current time by default."""
+        now = now or ist_now()
+        session = self.session(now.date())
+        return session is not None and session[0] <= now <= session[1]
+
+    def next_open(self, now=None):
+        """Start of the next session that hasn't ended yet (the current one while open)."""
+        now = now or ist_now()
+        day = now.date()
+        for _ in range(30):
+            session = self.session(day)
+            if session is not None and now <= session[1]:
+                return max(session[0], now)
+            day += timedelta(days=1)
+        return None
+
+calendar = MarketCalendar()
+
+def is_market_open(now=None):
+    return calendar.is_open(now)
@@ -0,0 +1,205 @@
+"""Counters and timing histograms, exported in the Prometheus text format on /metrics.
+
+Modules declare their metrics once at import time and record into them on
+the hot path:
+
+    TICK_STAGE = metrics.timer("tick_stage", "Time spent in each stage of a tick")
+    with TICK_STAGE.time(stage="db"):
+        save_prices(session, rows)
+
+A timer is a <name>_seconds histogram plus a <name>_errors_total counter
+that counts the blocks left with an exception. With METRICS_ENABLED=0
+nothing is recorded: time() hands out one shared no-op context manager and
+observe()/inc() return right away.
+"""
+import bisect
+import contextlib
+import math
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Seconds; from a cached DB read up to a slow batched download
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_NOOP = contextlib.nullcontext()
+_registry = {}
+_registry_lock = threading.Lock()
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self._values = {}  # label key -> value
+        self._lock = threading.Lock()
+
+    def samples(self):
+        """(name, label key, extra labels, value) of every series."""
+        raise NotImplementedError
+
+    def render(self):
+        lines = []
+        if self.help:
+            lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, key, (), value
+
+class Summary(Metric):
+    """Only _sum and _count: cheap enough for one series per symbol."""
+    kind = "summary"
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _key(labels)
+        with self._lock:
+            total, count = self._values.get(key, (0.0, 0))
+            self._values[key] = (total + value, count + 1)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, (total, count) in items:
+            yield f"{self.name}_sum", key, (), total
+            yield f"{self.name}_count", key, (), count
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield f"{self.name}_bucket", key, (("le", _format_value(float(bound))),), cumulative
+            yield f"{self.name}_bucket", key, (("le", "+Inf"),), count
+            yield f"{self.name}_sum", key, (), total
+            yield f"{self.name}_count", key, (), count
+
+class _Span:
+    __slots__ = ("timer", "labels", "started")
+
+    def __init__(self, timer, labels):
+        self.timer = timer
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.seconds.observe(time.perf_counter() - self.started, **self.labels)
+        if exc_type is not None:
+            self.timer.errors.inc(**self.labels)
+        return False
+
+class Timer:
+    def __init__(self, name, help=""):
+        self.seconds = _register(Histogram, f"{name}_seconds", help)
+        self.errors = _register(Counter, f"{name}_errors_total", f"Exceptions raised inside {name}_seconds")
+
+    def time(self, **labels):
+        """Context manager timing its block; exceptions also count as errors."""
+        if not METRICS_ENABLED:
+            return _NOOP
+        return _Span(self, labels)
+
+    def observe(self, seconds, **labels):
+        self.seconds.observe(seconds, **labels)
+
+def _register(cls, name, help=""):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, help)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name!r} is already registered as a {metric.kind}")
+        return metric
+
+def counter(name, help=""):
+    return _register(Counter, name, help)
+
+def summary(name, help=""):
+    return _register(Summary, name, help)
+
+def histogram(name, help=""):
+    return _register(Histogram, name, help)
+
+def timer(name, help=""):
+    return Timer(name, help)
+
+def render(gauges=None):
+    """Every registered metric in the text format, plus `gauges` ({name: value}) read at scrape time."""
+    lines = []
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        lines.extend(metric.render())
+    for name, value in sorted((gauges or {}).items()):
+        if value is None:
+            continue
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -1,28 +1,209 @@
-import requests
+"""Telegram notifications.
+
+`send_telegram_message` delivers right away and returns whether it worked.
+`notify` and `send_digest` hand messages to a background worker instead, so
+a slow or rate limited Telegram API never stalls the caller. Both paths share
+one pooled HTTP session, use timeouts and retry with exponential backoff,
+waiting out Telegram's 429 `retry_after` when it asks for it.
+"""
+from collections import deque
 import os
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import timer
 
 # Credentials (Loaded from Env vars for security on Render)
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8524623570:AAEEpmyVbTCu7z2aC56Ek-pLayoV3Er_uBA") 
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "5344147903") 
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8524623570:AAEEpmyVbTCu7z2aC56Ek-pLayoV3Er_uBA")
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "5344147903")
+
+# Point this at a local mock server in tests
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", "10"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "4"))
+TELEGRAM_BACKOFF = float(os.getenv("TELEGRAM_BACKOFF", "1"))
+# Spacing between queued messages; Telegram allows about one per second per chat
+TELEGRAM_MIN_INTERVAL = float(os.getenv("TELEGRAM_MIN_INTERVAL", "1"))
+TELEGRAM_QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", "1000"))
+
+MAX_MESSAGE_LENGTH = 4096
+
+_session = None
+_session_lock = threading.Lock()
+
+_queue = queue.Queue(maxsize=TELEGRAM_QUEUE_SIZE)
+_worker = None
+_worker_lock = threading.Lock()
+_paused_until = 0.0  # set by a 429, honoured by every sender
+
+metrics = {"queued": 0, "sent": 0, "failed": 0, "dropped": 0, "retries": 0, "rate_limited": 0}
+_latencies = deque(maxlen=500)  # seconds from notify() to delivery
+_metrics_lock = threading.Lock()
+
+TELEGRAM_SEND = timer("telegram_send", "send_telegram_message calls, retries and backoff included")
+TELEGRAM_REQUEST = timer("telegram_request", "Single Telegram API requests")
+
+def _count(key, n=1):
+    with _metrics_lock:
+        metrics[key] += n
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def _backoff(attempt):
+    return min(TELEGRAM_BACKOFF * 2 ** attempt, 60)
+
+def _wait_for_rate_limit():
+    delay = _paused_until - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
 
 def send_telegram_message(message):
     """Sends a message to the specified Telegram chat."""
+    with TELEGRAM_SEND.time():
+        return _send(message)
+
+def _send(message):
+    global _paused_until
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         print("Telegram Token or Chat ID not set. Skipping notification.")
         return False
-        
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+
+    url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": TELEGRAM_CHAT_ID,
         "text": message,
         "parse_mode": "HTML"
     }
-    
-    try:
-        response = requests.post(url, json=payload)
-        if response.status_code != 200:
-            print(f"Telegram API Error: {response.status_code} - {response.text}")
-        return response.status_code == 200
-    except Exception as e:
-        print(f"Error sending Telegram notification: {e}")
-        return False
+
+    for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+        _wait_for_rate_limit()
+        if attempt:
+            _count("retries")
+        try:
+            with TELEGRAM_REQUEST.time():
+                response = get_session().post(url, json=payload, timeout=TELEGRAM_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"Error sending Telegram notification: {e}")
+            if attempt < TELEGRAM_MAX_RETRIES:
+                time.sleep(_backoff(attempt))
+            continue
+
+        if response.status_code == 200:
+            return True
+        print(f"Telegram API Error: {response.status_code} - {response.text}")
+        if response.status_code == 429:
+            _count("rate_limited")
+            try:
+                retry_after = response.json()["parameters"]["retry_after"]
+            except (ValueError, KeyError, TypeError):
+                retry_after = _backoff(attempt)
+            _paused_until = time.monotonic() + float(retry_after)
+        elif response.status_code >= 500:
+            if attempt < TELEGRAM_MAX_RETRIES:
+                time.sleep(_backoff(attempt))
+        else:
+            # Bad request, wrong token, ...: retrying won't help
+            return False
+    return False
+
+def split_message(text, limit=MAX_MESSAGE_LENGTH):
+    """Splits at line breaks so every chunk fits into one Telegram message."""
+    chunks, current = [], ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            candidate = line
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+def notify(message):
+    """Queues a message for background delivery. Returns False if the queue is full."""
+    _ensure_worker()
+    for chunk in split_message(message):
+        try:
+            _queue.put_nowait((time.monotonic(), chunk))
+        except queue.Full:
+            print("Telegram queue is full. Dropping notification.")
+            _count("dropped")
+            return False
+        _count("queued")
+    return True
+
+def send_digest(messages, title=None):
+    """Queues the messages of one tick as a single digest (split only past 4096 chars)."""
+    messages = [message for message in messages if message]
+    if not messages:
+        return True
+    if len(messages) == 1 and title is None:
+        return notify(messages[0])
+    header = title or f"\U0001f514 <b>{len(messages)} alerts</b>"
+    return notify("\n\n".join([header] + messages))
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_deliver, name="telegram", daemon=True)
+            _worker.start()
+
+def _deliver():
+    last_sent = 0.0
+    while True:
+        queued_at, message = _queue.get()
+        try:
+            spacing = last_sent + TELEGRAM_MIN_INTERVAL - time.monotonic()
+            if spacing > 0:
+                time.sleep(spacing)
+            ok = send_telegram_message(message)
+            last_sent = time.monotonic()
+            if ok:
+                _count("sent")
+                with _metrics_lock:
+                    _latencies.append(last_sent - queued_at)
+            else:
+                _count("failed")
+        except Exception as e:
+            print(f"Telegram delivery failed: {e}")
+            _count("failed")
+        finally:
+            _queue.task_done()
+
+def flush(timeout=None):
+    """Waits until every queued message was delivered or given up. Returns True if drained."""
+    with _queue.all_tasks_done:
+        return _queue.all_tasks_done.wait_for(lambda: _queue.unfinished_tasks == 0, timeout)
+
+def stats():
+    with _metrics_lock:
+        latencies = sorted(_latencies)
+        result = dict(metrics)
+    result["pending"] = _queue.qsize()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
+
+    result["latency_p50_s"] = percentile(0.50)
+    result["latency_p95_s"] = percentile(0.95)
+    result["latency_max_s"] = round(latencies[-1], 3) if latencies else None
+    return result
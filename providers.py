@@ -0,0 +1,347 @@
+"""Market data providers.
+
+A provider has two methods:
+
+    history(symbols, period, interval) -> {symbol: OHLCV DataFrame}
+    info(symbol) -> dict of ticker.info style fields
+
+and `now()`, the IST time it serves data for (None for live sources).
+MARKET_DATA_PROVIDER picks the implementation: "yfinance" (default) or
+"replay", which serves recorded CSVs from REPLAY_DIR on a simulated clock.
+New sources subclass MarketDataProvider and are added to PROVIDERS.
+get_provider() wraps them so every call shows up on /metrics, with latency
+and error counts per symbol.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+import pandas as pd
+
+import metrics
+
+# Calendar offsets matching yfinance "period" strings
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1),
+    "5d": pd.DateOffset(days=5),
+    "7d": pd.DateOffset(days=7),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+# yfinance interval -> pandas frequency
+INTERVAL_FREQS = {
+    "1m": "1min",
+    "2m": "2min",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "60m": "1h",
+    "90m": "90min",
+    "1h": "1h",
+    "1d": "1D",
+}
+
+def slice_period(hist, period, end=None):
+    """Returns the rows of `hist` that fall inside `period` counted back from `end` (default: last row)."""
+    if hist.empty or period not in PERIOD_OFFSETS:
+        return hist
+    if end is None:
+        end = hist.index[-1]
+    start = end - PERIOD_OFFSETS[period]
+    return hist[hist.index > start]
+
+def split_download(data, symbols):
+    """Splits a multi-ticker yf.download frame into {symbol: DataFrame}."""
+    frames = {}
+    if data is None or data.empty:
+        return frames
+
+    if isinstance(data.columns, pd.MultiIndex):
+        available = set(data.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol in available:
+                # Multi-ticker frames are aligned on a shared index, drop the padding rows
+                df = data[symbol].dropna(subset=["Close"])
+                if not df.empty:
+                    frames[symbol] = df
+    elif len(symbols) == 1:
+        df = data.dropna(subset=["Close"])
+        if not df.empty:
+            frames[symbols[0]] = df
+    return frames
+
+class MarketDataProvider:
+    name = None
+
+    def history(self, symbols, period="1mo", interval="1d"):
+        raise NotImplementedError
+
+    def info(self, symbol):
+        raise NotImplementedError
+
+    def now(self):
+        return None
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance through yfinance. Bars for the whole watchlist come from one yf.download call."""
+    name = "yfinance"
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def history(self, symbols, period="1mo", interval="1d"):
+        import yfinance as yf
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        data = yf.download(
+            symbols,
+            period=period,
+            interval=interval,
+            group_by="ticker",
+            threads=True,
+            progress=False,
+            timeout=self.timeout,
+        )
+        return split_download(data, symbols)
+
+    def info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+class StaticProvider(MarketDataProvider):
+    """Serves pre-built DataFrames from memory.
+
+    Used to run the fetch pipeline offline. `latency` simulates one upstream
+    round-trip (in seconds) per call.
+    """
+    name = "static"
+
+    def __init__(self, frames, infos=None, latency=0.0):
+        self.frames = frames
+        self.infos = infos or {}
+        self.latency = latency
+        self.calls = 0
+
+    def history(self, symbols, period="1mo", interval="1d"):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        result = {}
+        for symbol in symbols:
+            df = self.frames.get(symbol)
+            if df is not None and not df.empty:
+                result[symbol] = slice_period(df, period)
+        return result
+
+    def info(self, symbol):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return dict(self.infos.get(symbol, {}))
+
+REPLAY_DIR = os.getenv("REPLAY_DIR", "replay")
+REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", "1"))
+REPLAY_START = os.getenv("REPLAY_START")  # IST, e.g. 2025-06-02T09:15
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+def load_recording(path):
+    """Reads a recorded OHLCV CSV into a frame indexed by naive IST time."""
+    df = pd.read_csv(path, index_col=0)
+    raw = pd.Index(df.index).astype(str)
+    if raw.str.contains(r"[+-]\d\d:\d\d$").any():
+        # yfinance writes intraday bars with their UTC offset
+        index = pd.to_datetime(raw, utc=True).tz_convert("Asia/Kolkata").tz_localize(None)
+    else:
+        index = pd.DatetimeIndex(pd.to_datetime(raw))
+    df.index = index.rename("Date")
+    return df[[column for column in OHLCV if column in df]].sort_index()
+
+def resample_bars(df, freq):
+    # Hourly IST buckets start at the 09:15 open
+    step = pd.Timedelta(freq)
+    offset = pd.Timedelta("15min") if pd.Timedelta("1h") <= step < pd.Timedelta("1D") else None
+    agg = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    bars = df.resample(freq, offset=offset).agg({column: agg[column] for column in df.columns})
+    return bars.dropna(subset=["Close"])
+
+class ReplayProvider(MarketDataProvider):
+    """Serves recorded bars from `directory`/<SYMBOL>.csv on a simulated clock.
+
+    The clock starts at `start` (default: one year into the recordings, so the
+    250-day stats are complete) and runs `speed` times faster than real time.
+    With speed 0 it stands still and only moves with advance()/seek(), which
+    makes runs deterministic. Bars finer than the requested interval are
+    aggregated, so minute recordings give a daily bar that grows during the
+    day. Info dicts come from info.json in the same directory.
+    """
+    name = "replay"
+
+    def __init__(self, directory=REPLAY_DIR, speed=REPLAY_SPEED, start=REPLAY_START, latency=0.0):
+        self.frames = {}
+        self.steps = {}
+        for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+            symbol = os.path.splitext(os.path.basename(path))[0]
+            df = load_recording(path)
+            if not df.empty:
+                self.frames[symbol] = df
+                # The finest step: recordings may hold daily bars followed by minutes
+                self.steps[symbol] = pd.Series(df.index).diff().min() if len(df) > 1 else pd.Timedelta("1D")
+        if not self.frames:
+            raise ValueError(f"No recordings (*.csv) found in {directory!r}")
+
+        info_path = os.path.join(directory, "info.json")
+        self.infos = {}
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                self.infos = json.load(f)
+
+        first = min(df.index[0] for df in self.frames.values())
+        last = max(df.index[-1] for df in self.frames.values())
+        self.speed = speed
+        self.latency = latency
+        self.calls = 0
+        self.seek(start or min(first + pd.DateOffset(years=1), last))
+
+    def seek(self, when):
+        """Moves the clock to `when` (naive IST)."""
+        self._start = pd.Timestamp(when)
+        self._started = time.monotonic()
+
+    def advance(self, seconds):
+        self._start += pd.Timedelta(seconds=seconds)
+
+    def now(self):
+        elapsed = (time.monotonic() - self._started) * self.speed
+        return (self._start + pd.Timedelta(seconds=elapsed)).to_pydatetime()
+
+    def history(self, symbols, period="1mo", interval="1d"):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        now = pd.Timestamp(self.now())
+        start = now - PERIOD_OFFSETS.get(period, PERIOD_OFFSETS["10y"])
+        freq = INTERVAL_FREQS.get(interval, "1D")
+        result = {}
+        for symbol in symbols:
+            df = self.frames.get(symbol)
+            if df is None:
+                continue
+            index = df.index
+            df = df.iloc[index.searchsorted(start, side="right"):index.searchsorted(now, side="right")]
+            if df.empty:
+                continue
+            if self.steps[symbol] < pd.Timedelta(freq):
+                df = resample_bars(df, freq)
+            result[symbol] = df
+        return result
+
+    def info(self, symbol):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return dict(self.infos.get(symbol, {}))
+
+UPSTREAM_REQUEST = metrics.timer("upstream_request", "Market data provider calls")
+UPSTREAM_SYMBOL = metrics.summary("upstream_symbol_seconds", "Upstream latency per symbol (time of the call that served it)")
+UPSTREAM_SYMBOL_ERRORS = metrics.counter("upstream_symbol_errors_total", "Symbols an upstream call failed or returned no data for")
+
+class InstrumentedProvider(MarketDataProvider):
+    """Records the latency and the per-symbol failures of another provider."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.name = inner.name
+
+    def __getattr__(self, attr):
+        # seek(), advance(), calls, ... of the wrapped provider
+        return getattr(self.inner, attr)
+
+    def _record(self, symbols, served, elapsed):
+        for symbol in symbols:
+            if symbol in served:
+                UPSTREAM_SYMBOL.observe(elapsed, symbol=symbol)
+            else:
+                UPSTREAM_SYMBOL_ERRORS.inc(symbol=symbol)
+
+    def history(self, symbols, period="1mo", interval="1d"):
+        symbols = list(symbols)
+        started = time.perf_counter()
+        try:
+            with UPSTREAM_REQUEST.time(provider=self.name, call="history"):
+                frames = self.inner.history(symbols, period, interval)
+        except Exception:
+            self._record(symbols, (), 0.0)
+            raise
+        served = {symbol for symbol, df in frames.items() if df is not None and not df.empty}
+        self._record(symbols, served, time.perf_counter() - started)
+        return frames
+
+    def info(self, symbol):
+        started = time.perf_counter()
+        try:
+            with UPSTREAM_REQUEST.time(provider=self.name, call="info"):
+                info = self.inner.info(symbol)
+        except Exception:
+            self._record([symbol], (), 0.0)
+            raise
+        self._record([symbol], [symbol] if info else (), time.perf_counter() - started)
+        return info
+
+    def now(self):
+        return self.inner.now()
+
+# Provider name -> factory(timeout)
+PROVIDERS = {
+    "yfinance": lambda timeout: YFinanceProvider(timeout=timeout),
+    "replay": lambda timeout: ReplayProvider(),
+}
+
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+
+def get_provider(name=None, timeout=10):
+    name = name or MARKET_DATA_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown market data provider {name!r}, expected one of: {', '.join(PROVIDERS)}")
+    provider = PROVIDERS[name](timeout)
+    return InstrumentedProvider(provider) if metrics.METRICS_ENABLED else provider
+
+def record(symbols, directory, period="2y", interval="1d", source=None):
+    """Saves bars and ticker.info of `symbols` in the layout ReplayProvider reads."""
+    source = source or YFinanceProvider()
+    os.makedirs(directory, exist_ok=True)
+    frames = source.history(symbols, period, interval)
+    for symbol, df in frames.items():
+        df[[column for column in OHLCV if column in df]].to_csv(os.path.join(directory, f"{symbol}.csv"))
+
+    infos = {}
+    for symbol in frames:
+        try:
+            info = source.info(symbol)
+        except Exception as e:
+            print(f"Info fetch failed for {symbol}: {e}")
+            continue
+        # Only plain values, ticker.info carries some nested structures
+        infos[symbol] = {k: v for k, v in info.items() if isinstance(v, (int, float, str, bool, type(None)))}
+    with open(os.path.join(directory, "info.json"), "w") as f:
+        json.dump(infos, f, indent=1)
+    print(f"Recorded {len(frames)} of {len(symbols)} symbols ({period} of {interval} bars) into {directory}")
+    return frames
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record market data for the replay provider.")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--out", default=REPLAY_DIR)
+    parser.add_argument("--period", default="2y")
+    parser.add_argument("--interval", default="1d")
+    args = parser.parse_args()
+    record(args.symbols, args.out, args.period, args.interval)
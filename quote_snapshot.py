@@ -0,0 +1,101 @@
+"""Latest quotes shared between processes through one file.
+
+The process that runs the ticks rewrites QUOTE_SNAPSHOT_FILE after every
+tick: every tracked stock with its latest_prices row, as JSON. It writes a
+temp file and renames it over the old one, so readers see either the old or
+the new snapshot, never a partial one. API workers answer /api/stocks from
+it without touching the database and re-read it only when its mtime changes.
+Only APP_ROLE=api workers read it; every other process reads latest_prices.
+
+The snapshot records which database it was built from (DATABASE_ID) and
+read() ignores one that belongs to another database, e.g. left behind by
+another checkout. The default path is derived from that id, in /dev/shm
+(memory backed) where it exists. Several hosts need QUOTE_SNAPSHOT_FILE on
+a shared volume; QUOTE_SNAPSHOT_FILE="" turns the snapshot off.
+"""
+from datetime import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from database import DATABASE_URL, SessionLocal, QUOTE_FIELDS, engine, latest_quotes
+
+def database_id():
+    """Stable id of the configured database: the absolute file for SQLite, the URL without password otherwise."""
+    url = engine.url
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        name = f"sqlite:{os.path.abspath(url.database)}"
+    else:
+        name = url.render_as_string(hide_password=True) if url.database != ":memory:" else DATABASE_URL
+    return hashlib.sha1(name.encode()).hexdigest()[:16]
+
+DATABASE_ID = database_id()
+_default_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+QUOTE_SNAPSHOT_FILE = os.getenv(
+    "QUOTE_SNAPSHOT_FILE", os.path.join(_default_dir, f"stocks_tracker_quotes_{DATABASE_ID}.json"),
+)
+QUOTE_SNAPSHOT_POLL_S = float(os.getenv("QUOTE_SNAPSHOT_POLL_S", "1"))
+
+_cache = {"mtime": None, "entries": None}
+_lock = threading.Lock()
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def build(session, symbol=None):
+    """[{"symbol", "name", "quote"}] of every tracked stock (or `symbol`); quote is None before its first tick."""
+    return [
+        {
+            "symbol": stock.symbol,
+            "name": stock.name,
+            "quote": None if latest is None else {field: _json_value(getattr(latest, field)) for field in QUOTE_FIELDS},
+        }
+        for stock, latest in latest_quotes(session, symbol)
+    ]
+
+def write(session=None, path=None):
+    """Rewrites the snapshot from the database. Returns the number of stocks, None when disabled."""
+    path = QUOTE_SNAPSHOT_FILE if path is None else path
+    if not path:
+        return None
+    own_session = session is None
+    session = session or SessionLocal()
+    try:
+        entries = build(session)
+    finally:
+        if own_session:
+            session.close()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".quotes-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"database": DATABASE_ID, "updated_at": datetime.utcnow().isoformat(), "stocks": entries}, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(entries)
+
+def read(path=None):
+    """The snapshot entries, or None without a snapshot of this database. Parsed again only after a rewrite."""
+    path = QUOTE_SNAPSHOT_FILE if path is None else path
+    if not path:
+        return None
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _lock:
+        if _cache["mtime"] == (path, mtime):
+            return _cache["entries"]
+    with open(path) as f:
+        snapshot = json.load(f)
+    entries = snapshot["stocks"] if snapshot.get("database") == DATABASE_ID else None
+    if entries is None and _cache["mtime"] is None:
+        print(f"Ignoring quote snapshot {path}: written for another database")
+    with _lock:
+        _cache["mtime"], _cache["entries"] = (path, mtime), entries
+    return entries
@@ -0,0 +1,62 @@
+"""Per-symbol refresh intervals.
+
+Symbols that move, sit close to an alert threshold or are open in a details
+page are refreshed every REFRESH_FAST_S seconds, flat ones every
+REFRESH_SLOW_S, the rest every REFRESH_NORMAL_S. Each symbol has a fixed
+phase inside its interval, so the fetches of one interval are spread over
+the dispatcher's slots instead of all starting at :00.
+"""
+import os
+import zlib
+
+REFRESH_FAST_S = int(os.getenv("REFRESH_FAST_S", "60"))
+REFRESH_NORMAL_S = int(os.getenv("REFRESH_NORMAL_S", "180"))
+REFRESH_SLOW_S = int(os.getenv("REFRESH_SLOW_S", "300"))
+
+VOLATILE_CHANGE = float(os.getenv("REFRESH_VOLATILE_CHANGE", "2.0"))  # abs % change of the day
+QUIET_CHANGE = float(os.getenv("REFRESH_QUIET_CHANGE", "0.5"))
+ALERT_PROXIMITY = float(os.getenv("REFRESH_ALERT_PROXIMITY", "0.02"))  # relative distance to a rule threshold
+
+def phase(symbol, interval):
+    # crc32 rather than hash(): stable across processes and restarts
+    return zlib.crc32(symbol.encode()) % interval
+
+def refresh_interval(row, proximity=float("inf"), watched=False):
+    """Seconds between refreshes of one symbol, from its last quote row (None if unknown)."""
+    if row is None or watched or proximity <= ALERT_PROXIMITY:
+        return REFRESH_FAST_S
+    change = abs(row.get("change_percent") or 0.0)
+    if change >= VOLATILE_CHANGE:
+        return REFRESH_FAST_S
+    if change < QUIET_CHANGE:
+        return REFRESH_SLOW_S
+    return REFRESH_NORMAL_S
+
+class RefreshPlanner:
+    def __init__(self):
+        self.intervals = {}
+        self._last_check = None
+
+    def plan(self, symbols, rows, proximity, watched):
+        """Updates the interval of every symbol. `rows` and `proximity` are keyed by symbol."""
+        self.intervals = {
+            symbol: refresh_interval(rows.get(symbol), proximity.get(symbol, float("inf")), symbol in watched)
+            for symbol in symbols
+        }
+        return self.intervals
+
+    def due(self, now, window):
+        """Symbols whose next refresh time falls into (previous check, now].
+
+        `now` is epoch seconds. The look-back is at most `window`: after the
+        market was closed for hours the previous check is stale, and every
+        symbol would be due at the open at once.
+        """
+        since = now - window if self._last_check is None else max(self._last_check, now - window)
+        self._last_check = now
+        due = []
+        for symbol, interval in self.intervals.items():
+            offset = phase(symbol, interval)
+            if (now - offset) // interval > (since - offset) // interval:
+                due.append(symbol)
+        return due
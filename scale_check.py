@@ -0,0 +1,217 @@
+"""Runs the app as several processes on one database and checks the scale-out setup.
+
+Starts --fetchers uvicorn processes with APP_ROLE=all (they elect the tick
+leader through the lease) and --api processes with APP_ROLE=api, all on a
+throwaway SQLite database fed by the replay provider on synthetic data.
+It then checks that:
+
+- exactly one process runs ticks
+- no (symbol, timestamp) row was written twice
+- the read-only workers serve the same quotes as the database
+- Server-Sent Events reach subscribers of a read-only worker
+- another process takes over the ticks after the leader is killed
+
+    python scale_check.py --fetchers 3 --api 2 --symbols 20
+
+Exits with status 1 if a check fails. Set DATABASE_URL to a PostgreSQL URL
+to run the same checks against a server instead of SQLite.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import requests
+
+from bench_pipeline import HERE, free_port, generate_universe
+
+TICK_LEASE_TTL = 5
+REPLAY_SPEED = 30  # a replayed minute every 2 seconds
+
+def start_process(role, port, env, log_dir):
+    log = open(os.path.join(log_dir, f"{role}-{port}.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE, env={**env, "APP_ROLE": role}, stdout=log, stderr=subprocess.STDOUT,
+    )
+    process.role, process.port, process.log = role, port, log
+    return process
+
+def url(process, path):
+    return f"http://127.0.0.1:{process.port}{path}"
+
+def wait_until(condition, timeout, interval=0.5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            result = condition()
+        except requests.RequestException:
+            result = None
+        if result:
+            return result
+        time.sleep(interval)
+    return None
+
+def ticking(processes, since=None):
+    """{owner: ticks} of the processes that ran (not skipped) a tick started after `since`."""
+    owners = {}
+    for process in processes:
+        stats = requests.get(url(process, "/api/ticks"), timeout=5).json()
+        done = [
+            tick for tick in stats["ticks"]
+            if tick["status"] == "done" and (since is None or pd.Timestamp(tick["started_at"]) > since)
+        ]
+        if done:
+            owners[stats["owner"]] = len(done)
+    return owners
+
+def prices(process):
+    return {stock["symbol"]: stock["price"] for stock in requests.get(url(process, "/api/stocks"), timeout=5).json()}
+
+def stream_events(process, count, timeout):
+    """Reads `count` quote events from /api/stream. Returns the batches."""
+    batches = []
+    deadline = time.monotonic() + timeout
+    with requests.get(url(process, "/api/stream"), stream=True, timeout=timeout) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("data: "):
+                batches.append(json.loads(line[len("data: "):]))
+                if len(batches) >= count:
+                    break
+            if time.monotonic() > deadline:
+                break
+    return batches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetchers", type=int, default=3, help="APP_ROLE=all processes")
+    parser.add_argument("--api", type=int, default=2, help="APP_ROLE=api processes")
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the work directory with the logs")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="scale_check_")
+    replay_dir = os.path.join(workdir, "replay")
+    symbols = [f"SYN{i:04d}.NS" for i in range(args.symbols)]
+    first_minute = generate_universe(replay_dir, symbols, days=1)
+    env = {
+        **os.environ,
+        "DATABASE_URL": os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'stocks.db')}"),
+        "QUOTE_SNAPSHOT_FILE": os.path.join(workdir, "quotes.json"),
+        "QUOTE_SNAPSHOT_POLL_S": "0.5",
+        "MARKET_DATA_PROVIDER": "replay",
+        "REPLAY_DIR": replay_dir,
+        "REPLAY_SPEED": str(REPLAY_SPEED),
+        "REPLAY_START": (first_minute + pd.Timedelta(minutes=5)).isoformat(),
+        "REFRESH_SLOT_S": "1",
+        "REFRESH_FAST_S": "2",
+        "REFRESH_NORMAL_S": "2",
+        "REFRESH_SLOW_S": "2",
+        "TICK_LEASE_TTL": str(TICK_LEASE_TTL),
+        "TELEGRAM_BOT_TOKEN": "",
+    }
+
+    # Schema and watchlist up front, so the processes don't race to seed it
+    os.environ.update({"DATABASE_URL": env["DATABASE_URL"]})
+    from sqlalchemy import func, insert
+    from database import Base, SessionLocal, Stock, StockPrice, engine
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    session.execute(insert(Stock), [{"symbol": s, "name": f"Synthetic {s}"} for s in symbols])
+    session.commit()
+    session.close()
+
+    processes = [start_process("all", free_port(), env, workdir) for _ in range(args.fetchers)]
+    processes += [start_process("api", free_port(), env, workdir) for _ in range(args.api)]
+    fetchers = [p for p in processes if p.role == "all"]
+    readers = [p for p in processes if p.role == "api"]
+    failures = []
+
+    def check(name, ok, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}{': ' + str(detail) if detail else ''}")
+        if not ok:
+            failures.append(name)
+
+    try:
+        ready = wait_until(lambda: all(requests.get(url(p, "/api/ready"), timeout=5).ok for p in processes), 120)
+        check("all processes ready", ready)
+        if not ready:
+            return 1
+
+        owners = wait_until(lambda: ticking(fetchers), 60)
+        time.sleep(8)  # a few more ticks, so a second leader would show up
+        owners = ticking(fetchers)
+        check("exactly one process runs ticks", len(owners) == 1, owners)
+
+        session = SessionLocal()
+        try:
+            duplicates = (
+                session.query(StockPrice.symbol, StockPrice.timestamp)
+                .group_by(StockPrice.symbol, StockPrice.timestamp)
+                .having(func.count() > 1)
+                .count()
+            )
+            written = session.query(func.count(StockPrice.id)).scalar()
+        finally:
+            session.close()
+        check("no duplicate rows", written > 0 and duplicates == 0, f"{written} rows, {duplicates} duplicated")
+
+        def same_prices():
+            # Compared right after each other; a tick in between just means another round
+            from database import latest_quotes
+            session = SessionLocal()
+            try:
+                stored = {stock.symbol: latest.price for stock, latest in latest_quotes(session) if latest}
+            finally:
+                session.close()
+            return len(stored) == len(symbols) and all(prices(p) == stored for p in readers)
+        check("read-only workers serve the stored quotes", wait_until(same_prices, 30, 0.1))
+
+        check(
+            "refresh is refused by read-only workers",
+            all(requests.post(url(p, "/api/refresh"), timeout=5).status_code == 409 for p in readers),
+        )
+
+        if readers:
+            batches = stream_events(readers[0], 2, 30)
+            check("live quotes stream from a read-only worker", len(batches) >= 2, f"{len(batches)} events")
+
+        if len(fetchers) > 1:
+            owner = next(iter(owners))
+            leader = next(p for p in fetchers if requests.get(url(p, "/api/ticks"), timeout=5).json()["owner"] == owner)
+            leader.terminate()
+            leader.wait(timeout=30)
+            killed_at = pd.Timestamp.now("UTC").tz_localize(None)
+            survivors = [p for p in fetchers if p is not leader]
+            started = time.monotonic()
+            new_owners = wait_until(lambda: ticking(survivors, killed_at), TICK_LEASE_TTL + 60)
+            check(
+                "another process takes over after the leader is killed",
+                new_owners and len(new_owners) == 1,
+                f"{new_owners} after {time.monotonic() - started:.1f}s",
+            )
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            process.log.close()
+        if args.keep or failures:
+            print(f"Logs in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print("All checks passed" if not failures else f"{len(failures)} check(s) failed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
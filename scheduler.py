@@ -1,15 +1,89 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from fetcher import update_all_stocks
 import atexit
+from datetime import datetime
+import os
+import time
+
+import market_calendar
+from refresh_plan import RefreshPlanner
+from ticks import coordinator
+
+# The dispatcher wakes up every slot and refreshes the symbols that are due
+REFRESH_SLOT_S = int(os.getenv("REFRESH_SLOT_S", "10"))
+
+planner = RefreshPlanner()
+
+def dispatch():
+    """Refreshes the symbols due in this slot. Does nothing outside NSE sessions."""
+    import fetcher
+    import live
+    from database import SessionLocal, Stock
+
+    if not fetcher.is_market_open():
+        return
+    # Followers don't plan ticks they would only skip; this also renews the lease
+    if not coordinator.is_leader():
+        return
+    session = SessionLocal()
+    try:
+        symbols = [symbol for (symbol,) in session.query(Stock.symbol).all()]
+    finally:
+        session.close()
+
+    rows = fetcher.alert_engine.previous_rows()
+    proximity = fetcher.alert_engine.proximity(list(rows.values()))
+    planner.plan(symbols, rows, proximity, live.hub.watched())
+    # The market clock, so replays plan their slots on replayed time
+    due = planner.due(market_calendar.epoch_now(), REFRESH_SLOT_S)
+    if due:
+        # Merged into a running tick instead of overlapping it
+        coordinator.request(due, "schedule")
+
+def refresh_fundamentals():
+    import fundamentals
+    # Only the process that runs the ticks talks to upstream
+    if coordinator.is_leader():
+        fundamentals.refresh()
+
+def compact_history():
+    from compaction import compact
+    if coordinator.is_leader():
+        compact()
+
+def export_columnar():
+    import columnar
+    if coordinator.is_leader():
+        columnar.export()
 
 def start_scheduler():
     scheduler = BackgroundScheduler()
-    # Run every 1 minute for real-time tracking
-    scheduler.add_job(func=update_all_stocks, trigger="interval", minutes=1)
+    # Per-symbol refreshes, spread over 10 second slots while the market is open
+    scheduler.add_job(func=dispatch, trigger="interval", seconds=REFRESH_SLOT_S, max_instances=1, coalesce=True)
+    # Market cap, PE and 52-week range change slowly; refresh the stale ones hourly, starting now
+    scheduler.add_job(func=refresh_fundamentals, trigger="interval", hours=1, next_run_time=datetime.now(), max_instances=1, coalesce=True)
+    # Roll up and prune old minute rows once a day after the close
+    scheduler.add_job(func=compact_history, trigger="cron", hour=16, minute=30, timezone="Asia/Kolkata", max_instances=1, coalesce=True)
+    # Columnar snapshot of the day's final bars for the screener
+    scheduler.add_job(func=export_columnar, trigger="cron", hour=16, minute=45, timezone="Asia/Kolkata", max_instances=1, coalesce=True)
     scheduler.start()
-    
+
     # Run once immediately on startup
     # update_all_stocks() # Commented out to avoid blocking startup, handled by manual trigger or first tick
-    
+
     # Shut down the scheduler when exiting the app
     atexit.register(lambda: scheduler.shutdown())
+
+if __name__ == "__main__":
+    # Headless fetcher for APP_ROLE=api deployments: ticks and daily jobs, no HTTP
+    from database import create_tables_and_seed
+    import quote_snapshot
+    create_tables_and_seed()
+    start_scheduler()
+    if coordinator.is_leader():
+        quote_snapshot.write()
+    print("Fetcher running, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
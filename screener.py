@@ -0,0 +1,152 @@
+"""Screens the whole universe over the columnar snapshot (see columnar.py).
+
+    screen(["hit_year_low == 1"], period="5d")
+        symbols whose 1-year low was set in the last 5 days
+    screen(["drawdown_pct <= -15", "status == LOW"], period="3mo", sort="drawdown_pct")
+
+Filters use the alert rule syntax (`field op number`, `field op other_field
+* k`, `status == LOW`) over FIELDS. The indicator and status fields are
+computed with classifier.window_stats/classify as of `as_of` (default: the
+newest bar), the window fields aggregate the `period` up to it. Each field
+and filter is one numpy operation over all symbols.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import classifier
+import columnar
+from alerts import COMPARISONS, parse
+from providers import PERIOD_OFFSETS
+
+INDICATOR_FIELDS = (
+    "price", "change_percent", "ma_20", "seven_day_avg", "seven_day_low",
+    "min_30", "max_30", "two_fifty_day_low", "two_fifty_day_avg",
+)
+WINDOW_FIELDS = (
+    "window_min", "window_max", "window_avg", "return_pct",
+    "drawdown_pct", "max_drawdown_pct", "volume_avg", "hit_year_low",
+)
+FIELDS = INDICATOR_FIELDS + ("status", "is_low") + WINDOW_FIELDS
+TEXT_FIELDS = ("status",)
+
+def _edge(values, last):
+    """First (or last) non-NaN value of every row."""
+    present = ~np.isnan(values)
+    if last:
+        position = values.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+    else:
+        position = np.argmax(present, axis=1)
+    return np.where(present.any(axis=1), values[np.arange(len(values)), position], np.nan)
+
+def window_fields(close, volume):
+    """Aggregates over a symbols x days window. NaN rows stay NaN."""
+    close = np.asarray(close, dtype=float)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows
+        window_min = np.nanmin(close, axis=1)
+        window_max = np.nanmax(close, axis=1)
+        first, last = _edge(close, False), _edge(close, True)
+        # Peak so far at every day; fmax skips the NaN gaps
+        peaks = np.fmax.accumulate(close, axis=1)
+        return {
+            "window_min": window_min,
+            "window_max": window_max,
+            "window_avg": np.nanmean(close, axis=1),
+            "return_pct": (last / first - 1) * 100,
+            "drawdown_pct": (last / window_max - 1) * 100,
+            "max_drawdown_pct": np.nanmin(close / peaks - 1, axis=1) * 100,
+            "volume_avg": np.nanmean(np.asarray(volume, dtype=float), axis=1),
+        }
+
+def compute(snapshot, period="5d", as_of=None, rows=None):
+    """Every field of FIELDS for the snapshot rows `rows` (default: all). Returns (columns, as_of date)."""
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unknown period {period!r}, expected one of: {', '.join(PERIOD_OFFSETS)}")
+    end = snapshot.index(as_of) if as_of is not None else len(snapshot.dates)
+    if end == 0:
+        raise ValueError(f"The snapshot has no bars up to {as_of}")
+    newest = pd.Timestamp(snapshot.dates[end - 1])
+    rows = slice(None) if rows is None else np.asarray(rows, dtype=int)
+
+    # A year of bars (and some slack) covers every indicator window
+    start = snapshot.index(newest - PERIOD_OFFSETS["1y"] - pd.DateOffset(days=7))
+    closes = snapshot.column("close", start, end)[rows]
+    stats = classifier.window_stats(closes, snapshot.dates[start:end])
+    flags = classifier.classify(
+        stats["price"], stats["ma_20"], stats["min_30"], stats["max_30"], stats["two_fifty_day_low"],
+    )
+    columns = {field: stats[field] for field in INDICATOR_FIELDS}
+    columns["status"] = flags["status"].astype(object)
+    columns["is_low"] = flags["is_low"].astype(float)
+
+    # Same cut as slice_period: bars strictly after newest - period
+    window_start = snapshot.index(newest - PERIOD_OFFSETS[period])
+    columns.update(window_fields(
+        snapshot.column("close", window_start, end)[rows],
+        snapshot.column("volume", window_start, end)[rows],
+    ))
+    with np.errstate(invalid="ignore"):
+        columns["hit_year_low"] = (columns["window_min"] <= columns["two_fifty_day_low"]).astype(float)
+    columns["valid"] = stats["valid"]
+    return columns, newest.date()
+
+def matches(columns, filters):
+    """Boolean mask of the rows passing every filter expression."""
+    mask = np.array(columns["valid"], dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for expression in filters:
+            # Rejects text vs number comparisons such as "price == status"
+            field, op, operand_field, value = parse(expression, FIELDS, TEXT_FIELDS)
+            if op not in COMPARISONS:
+                raise ValueError(f"Only comparisons can be screened: {expression!r}")
+            rhs = columns[operand_field] * value if operand_field else value
+            mask &= np.asarray(COMPARISONS[op](columns[field], rhs), dtype=bool)
+    return mask
+
+def _plain(value):
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else round(float(value), 4)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+def screen(filters=(), period="5d", as_of=None, symbols=None, sort=None, limit=100, snapshot=None):
+    """Symbols passing every filter, with all FIELDS. `sort` is a field, "-field" for descending."""
+    snapshot = snapshot or columnar.load()
+    if snapshot is None:
+        raise FileNotFoundError("No columnar snapshot yet, run: python columnar.py")
+
+    names = snapshot.symbols
+    rows = None
+    if symbols:
+        position = {symbol: i for i, symbol in enumerate(snapshot.symbols)}
+        rows = [position[symbol] for symbol in symbols if symbol in position]
+        names = [snapshot.symbols[i] for i in rows]
+
+    columns, newest = compute(snapshot, period, as_of, rows)
+    selected = np.nonzero(matches(columns, filters))[0]
+
+    if sort:
+        field = sort.lstrip("-")
+        if field not in FIELDS:
+            raise ValueError(f"Unknown sort field {field!r}")
+        keys = columns[field][selected]
+        if field in TEXT_FIELDS:
+            order = np.argsort(keys.astype(str), kind="stable")
+        else:
+            # NaN sorts last either way
+            order = np.argsort(-keys if sort.startswith("-") else keys, kind="stable")
+        if sort.startswith("-") and field in TEXT_FIELDS:
+            order = order[::-1]
+        selected = selected[order]
+
+    total = len(selected)
+    if limit:
+        selected = selected[:limit]
+    results = [
+        {"symbol": names[i], **{field: _plain(columns[field][i]) for field in FIELDS}}
+        for i in selected
+    ]
+    return {"as_of": str(newest), "period": period, "matched": total, "results": results}
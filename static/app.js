@@ -1,28 +1,24 @@
-let refreshTimer = 60;
-let timerId = null;
+let quoteStream = null;
+const stocksBySymbol = {};
 
 document.addEventListener('DOMContentLoaded', () => {
-    fetchStocks();
-    startCountdown();
+    fetchStocks().then(subscribeQuotes);
 
     document.getElementById('refresh-btn').addEventListener('click', () => {
         manualRefresh();
     });
 });
 
-function startCountdown() {
-    if (timerId) clearInterval(timerId);
-    refreshTimer = 60;
-    updateLastUpdated();
-
-    timerId = setInterval(() => {
-        refreshTimer--;
-        updateLastUpdated();
-        if (refreshTimer <= 0) {
-            fetchStocks();
-            refreshTimer = 60;
-        }
-    }, 1000);
+function subscribeQuotes() {
+    // Quotes are pushed by the server after every tick instead of polled
+    if (quoteStream) quoteStream.close();
+    quoteStream = new EventSource('/api/stream');
+    quoteStream.addEventListener('quotes', event => {
+        JSON.parse(event.data).forEach(updateCard);
+        updateLastUpdated(true);
+    });
+    quoteStream.onopen = () => updateLastUpdated(true);
+    quoteStream.onerror = () => updateLastUpdated(false);
 }
 
 async function manualRefresh() {
@@ -31,22 +27,32 @@ async function manualRefresh() {
     btn.innerHTML = 'Refreshing...';
 
     try {
-        await fetch('/api/refresh', { method: 'POST' });
-        setTimeout(() => {
-            fetchStocks();
-            startCountdown();
-        }, 1500);
+        const res = await fetch('/api/refresh', { method: 'POST' });
+        const job = await res.json();
+        await waitForJob(job.job_id);
+        fetchStocks();
     } catch (err) {
         console.error("Refresh failed", err);
         btn.classList.remove('loading');
     }
 }
 
+async function waitForJob(jobId) {
+    // The refresh runs in the background, poll until it finishes
+    while (true) {
+        const res = await fetch(`/api/jobs/${jobId}`);
+        const job = await res.json();
+        if (!res.ok || job.status === 'done' || job.status === 'failed') return job;
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 async function fetchStocks() {
     try {
         const response = await fetch('/api/stocks');
         const stocks = await response.json();
         renderStocks(stocks);
+        updateLastUpdated(true);
     } catch (error) {
         console.error('Error fetching stocks:', error);
     }
@@ -59,12 +65,14 @@ function renderStocks(stocks) {
 
     list.innerHTML = '';
     totalEl.textContent = stocks.length;
+    stocks.forEach(stock => { stocksBySymbol[stock.symbol] = stock; });
 
     const lowCount = stocks.filter(s => s.is_low).length;
     lowEl.textContent = lowCount;
 
     stocks.forEach(stock => {
         const card = document.createElement('div');
+        card.id = cardId(stock.symbol);
         card.className = 'card stock-card';
         card.setAttribute('data-symbol', stock.symbol);
 
@@ -97,7 +105,7 @@ function renderStocks(stocks) {
             </div>
             
             <div class="details" style="margin-top: 0.5rem; font-size: 0.7rem; color: #64748b; border-top: 1px solid rgba(255,255,255,0.05); padding-top: 0.5rem; display: flex; justify-content: space-between;">
-                <span>250D Low: ₹${(stock.two_fifty_day_low || 0).toFixed(2)}</span>
+                <span class="two-fifty-low">250D Low: ₹${(stock.two_fifty_day_low || 0).toFixed(2)}</span>
                 <span class="text-secondary">View Details →</span>
             </div>
         `;
@@ -108,11 +116,10 @@ function renderStocks(stocks) {
         };
 
         list.appendChild(card);
-
-        // Render sparkline
-        renderSparkline(stock.symbol);
     });
 
+    renderSparklines(stocks.map(stock => stock.symbol));
+
     const btn = document.getElementById('refresh-btn');
     btn.innerHTML = `
         <svg width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
@@ -125,18 +132,29 @@ function renderStocks(stocks) {
     btn.classList.remove('loading');
 }
 
-async function renderSparkline(symbol) {
+async function renderSparklines(symbols) {
+    if (symbols.length === 0) return;
     try {
-        const res = await fetch(`/api/history/${symbol}?period=5d&interval=60m`);
+        // One request for every card instead of one per symbol
+        const query = encodeURIComponent(symbols.join(','));
+        const res = await fetch(`/api/history?symbols=${query}&period=5d&interval=60m&max_points=60`);
         const history = await res.json();
-        if (history.length === 0) return;
+        symbols.forEach(symbol => renderSparkline(symbol, history.series[symbol]));
+    } catch (e) {
+        console.error("Sparkline error", e);
+    }
+}
+
+function renderSparkline(symbol, history) {
+    try {
+        if (!history || history.c.length === 0) return;
 
         const canvasId = `spark-${symbol.replace('.', '-')}`;
         const canvas = document.getElementById(canvasId);
         if (!canvas) return;
 
         const ctx = canvas.getContext('2d');
-        const prices = history.map(h => h.close);
+        const prices = history.c;
         const isUp = prices[prices.length - 1] >= prices[0];
 
         new Chart(ctx, {
@@ -164,7 +182,36 @@ async function renderSparkline(symbol) {
     }
 }
 
-function updateLastUpdated() {
+function cardId(symbol) {
+    return `card-${symbol.replace('.', '-')}`;
+}
+
+function updateCard(delta) {
+    // Merge a pushed delta into the card in place, keeping its sparkline
+    const stock = stocksBySymbol[delta.symbol];
+    const card = document.getElementById(cardId(delta.symbol));
+    if (!stock || !card) return;
+    Object.assign(stock, delta);
+
+    const isUp = stock.change >= 0;
+    card.querySelector('.current-price').textContent = `₹${stock.price.toFixed(2)}`;
+    const changeEl = card.querySelector('.change-percent');
+    changeEl.textContent = `${isUp ? '+' : ''}${stock.change.toFixed(2)}%`;
+    changeEl.className = `change-percent ${isUp ? 'text-green' : 'text-red'}`;
+
+    const badge = card.querySelector('.badge');
+    badge.textContent = stock.status;
+    badge.className = `badge ${stock.status.toLowerCase().replace(' ', '-')}`;
+    card.querySelector('.two-fifty-low').textContent = `250D Low: ₹${(stock.two_fifty_day_low || 0).toFixed(2)}`;
+
+    document.getElementById('low-stocks').textContent = Object.values(stocksBySymbol).filter(s => s.is_low).length;
+}
+
+function updateLastUpdated(connected) {
     const el = document.getElementById('last-updated');
-    el.innerHTML = `Next update in <span style="color: var(--accent-green); font-weight: 700;">${refreshTimer}s</span>`;
+    if (connected) {
+        el.innerHTML = `Live <span style="color: var(--accent-green); font-weight: 700;">●</span> ${new Date().toLocaleTimeString()}`;
+    } else {
+        el.innerHTML = `<span style="color: #ef4444; font-weight: 700;">Reconnecting...</span>`;
+    }
 }
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+import alerts
+from alerts import AlertEngine, Rule, load_rules, parse
+
+@pytest.mark.parametrize("when, parsed", [
+    ("price <= two_fifty_day_low * 1.02", ("price", "<=", "two_fifty_day_low", 1.02)),
+    ("change_percent crosses_below -3", ("change_percent", "crosses_below", None, -3.0)),
+    ("status -> CRITICAL DIP", ("status", "->", None, "CRITICAL DIP")),
+    ("status == LOW", ("status", "==", None, "LOW")),
+    ("is_low == 1", ("is_low", "==", None, 1.0)),
+])
+def test_parse(when, parsed):
+    assert parse(when) == parsed
+
+@pytest.mark.parametrize("when", [
+    "status > 1",
+    "status == 1",
+    "status < LOW",
+    "price == status",
+    "status == price",
+    "price == LOW",
+    "change_percent -> 3",
+    "timestamp > 0",
+    "volume crosses_above details",
+])
+def test_parse_rejects_mismatched_kinds(when):
+    with pytest.raises(ValueError):
+        parse(when)
+
+def test_load_rules_skips_invalid_rules(tmp_path, capsys):
+    path = tmp_path / "rules.json"
+    path.write_text('[{"name": "bad", "when": "status > 1"}, {"name": "dip", "when": "change_percent < -3"}]')
+    rules = load_rules(str(path))
+    assert [rule.name for rule in rules] == ["dip"]
+    assert "Rejected alert rule 'bad'" in capsys.readouterr().out
+
+def test_threshold_fires_on_edges_only():
+    engine = AlertEngine([Rule("dip", "change_percent < -3", cooldown=0)])
+    now = datetime(2026, 3, 13, 10, 0)
+    assert len(engine.evaluate([{"symbol": "A", "change_percent": -4.0}], now)) == 1
+    assert engine.evaluate([{"symbol": "A", "change_percent": -5.0}], now) == []
+    assert engine.evaluate([{"symbol": "A", "change_percent": -1.0}], now) == []
+    assert len(engine.evaluate([{"symbol": "A", "change_percent": -3.5}], now)) == 1
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+import classifier
+
+DATES = pd.bdate_range(end="2026-03-13", periods=320)
+
+def closes():
+    d = np.arange(len(DATES), dtype=float)
+    # A drifts up, crashes to a new 1-year low on day 300 and recovers; B only drifts up
+    a = np.where(d < 300, 100 + 0.1 * d, 50 + 5 * (d - 300))
+    b = 200 + 0.1 * d
+    b[:10] = np.nan  # listed later
+    return np.vstack([a, b])
+
+@pytest.fixture(scope="module")
+def stats():
+    return classifier.rolling_stats(closes(), DATES)
+
+def test_forward_returns():
+    forward = backtest.forward_returns(np.array([[100.0, 110.0, 121.0, np.nan]]), [1, 2])
+    np.testing.assert_allclose(forward[1], [[10.0, 10.0, np.nan, np.nan]])
+    np.testing.assert_allclose(forward[2], [[21.0, np.nan, np.nan, np.nan]])
+
+def test_entries_are_the_first_day_of_a_state():
+    state = np.array([[True, True, False, True, True]])
+    assert backtest.entries(state).tolist() == [[True, False, False, True, False]]
+
+def test_golden_entry_and_its_forward_return(stats):
+    forward = backtest.forward_returns(closes(), [5])
+    report = backtest.evaluate(stats, forward)
+    golden = report["signals"][backtest.GOLDEN]
+    assert golden["entries"] == 1
+    assert golden["forward"]["5"] == {"samples": 1, "mean_pct": 50.0, "median_pct": 50.0, "hit_rate": 1.0}
+    # A from its 250th bar, B from its 250th bar (it has ten fewer)
+    assert report["evaluated_days"] == (320 - 249) + (310 - 249)
+
+def test_sweep_matches_single_evaluations(stats):
+    forward = backtest.forward_returns(closes(), [5, 20])
+    grid = {"low_band": [0.01, 0.05], "critical_band": [0.05]}
+    serial = backtest.sweep(stats, forward, grid, workers=1)
+    assert [report["thresholds"]["low_band"] for report in serial] == [0.01, 0.05]
+    assert serial[1] == backtest.evaluate(stats, forward, {"low_band": 0.05, "critical_band": 0.05})
+    assert backtest.sweep(stats, forward, grid, workers=2) == serial
+    assert backtest.objective_value(serial[0], f"{backtest.GOLDEN}:5") == pytest.approx(
+        50.0 - serial[0]["baseline"]["5"]
+    )
+
+def test_alert_replay_fires_the_golden_rule_once(stats):
+    assert backtest.alert_counts(stats, DATES, ["BT_A.NS", "BT_B.NS"]) == {"Golden Opportunity": 1}
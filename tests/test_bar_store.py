@@ -0,0 +1,50 @@
+from datetime import date
+
+import pandas as pd
+
+import bar_store
+from database import Base, SessionLocal, engine
+
+Base.metadata.create_all(bind=engine)
+
+class CountingProvider:
+    def __init__(self, frames):
+        self.frames = frames
+        self.requests = []
+
+    def history(self, symbols, period="1mo", interval="1d"):
+        self.requests.append((sorted(symbols), period))
+        return {s: self.frames[s] for s in symbols if s in self.frames}
+
+def bars(days):
+    index = pd.bdate_range(end="2026-03-13", periods=days)
+    return pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": 10}, index=index)
+
+def test_refresh_period():
+    today = date(2026, 3, 13)
+    assert bar_store.refresh_period(None, today) == bar_store.BACKFILL_PERIOD
+    assert bar_store.refresh_period(today, today) == "1d"
+    assert bar_store.refresh_period(date(2026, 3, 11), today) == "5d"
+    assert bar_store.refresh_period(date(2026, 2, 20), today) == "1mo"
+
+def test_failed_backfill_backs_off(monkeypatch):
+    source = CountingProvider({"BARS_OK.NS": bars(30)})
+    session = SessionLocal()
+    try:
+        bar_store.sync_bars(session, ["BARS_OK.NS", "BARS_GONE.NS"], source, today=date(2026, 3, 13))
+        assert source.requests == [(["BARS_GONE.NS", "BARS_OK.NS"], bar_store.BACKFILL_PERIOD)]
+
+        # The symbol without bars stays out of the next ticks' downloads
+        bar_store.sync_bars(session, ["BARS_OK.NS", "BARS_GONE.NS"], source, today=date(2026, 3, 13))
+        assert source.requests[-1] == (["BARS_OK.NS"], "1d")
+
+        # ...until its retry is due
+        failures, retry_at = bar_store._backfill_failures["BARS_GONE.NS"]
+        assert failures == 1
+        monkeypatch.setattr(bar_store.time, "monotonic", lambda: retry_at + 1)
+        bar_store.sync_bars(session, ["BARS_GONE.NS"], source, today=date(2026, 3, 13))
+        assert source.requests[-1] == (["BARS_GONE.NS"], bar_store.BACKFILL_PERIOD)
+        failures, next_retry_at = bar_store._backfill_failures["BARS_GONE.NS"]
+        assert failures == 2 and next_retry_at - retry_at > bar_store.BACKFILL_RETRY_S
+    finally:
+        session.close()
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import threading
+import time
+
+from cache import TTLCache
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    calls = []
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return "bars"
+
+    threads_n = 8
+    barrier = threading.Barrier(threads_n)
+    results = []
+    def lookup():
+        barrier.wait()
+        results.append(cache.get_or_load("key", loader))
+    threads = [threading.Thread(target=lookup) for _ in range(threads_n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ["bars"] * threads_n
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == threads_n
+    assert stats["coalesced"] + stats["hits"] == threads_n - 1
+    assert cache.get_or_load("key", loader) == "bars" and len(calls) == 1
+
+def test_errors_reach_waiters_and_are_not_cached():
+    cache = TTLCache(ttl=60)
+    def broken():
+        raise ConnectionError("upstream down")
+    for _ in range(2):
+        try:
+            cache.get_or_load("key", broken)
+        except ConnectionError:
+            pass
+        else:
+            raise AssertionError("expected the loader's error")
+    assert cache.get("key") is None
+
+def test_none_is_not_cached():
+    cache = TTLCache(ttl=60)
+    calls = []
+    def loader():
+        calls.append(1)
+        return None if len(calls) == 1 else "bars"
+    assert cache.get_or_load("key", loader) is None
+    assert cache.get_or_load("key", loader) == "bars"
+    assert len(calls) == 2
+
+def test_expiry_and_eviction():
+    cache = TTLCache(maxsize=2, ttl=lambda key: 0 if key == "stale" else 60)
+    cache.set("stale", 1)
+    assert cache.get("stale") is None
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") is None and cache.get("a") == 1
+    assert cache.stats()["evictions"] == 2
+
+def test_one_lookup_counts_once_across_keys():
+    cache = TTLCache(ttl=60)
+    cache.set(("upstream", "X.NS"), "bars")
+    assert cache.get_any([("X.NS",), ("upstream", "X.NS")]) == "bars"
+    assert cache.get_any([("Y.NS",), ("upstream", "Y.NS")]) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+def test_history_served_from_the_upstream_entry_is_one_hit(monkeypatch):
+    monkeypatch.chdir(REPO)
+    import main
+    cache = TTLCache(ttl=60)
+    cache.set(("upstream", "HC.NS", "5d", "60m"), "bars")
+    monkeypatch.setattr(main, "history_cache", cache)
+    assert asyncio.run(main.load_history_many(["HC.NS"], "5d", "60m")) == {"HC.NS": "bars"}
+    assert asyncio.run(main.load_history("HC.NS", "5d", "60m")) == "bars"
+    assert (cache.hits, cache.misses) == (2, 0)
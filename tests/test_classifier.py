@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import classifier
+import fetcher
+
+DATES = pd.bdate_range(end="2026-03-13", periods=300)
+
+def closes(seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = 100 * np.cumprod(1 + rng.normal(0, 0.02, (12, len(DATES))), axis=1)
+    matrix[1, :200] = np.nan     # listed late
+    matrix[2, -5:] = np.nan      # suspended, evaluated at its own newest bar
+    matrix[3, 100:120] = np.nan  # gap inside the year
+    matrix[4, :-3] = np.nan      # three bars only
+    matrix[5, -1] = np.nanmin(matrix[5])  # at the 250-day low
+    matrix[6, -1] = np.nanmax(matrix[6, -20:]) * 1.01  # at the 30-day high
+    return matrix
+
+def test_matrix_matches_the_per_symbol_analysis():
+    matrix = closes()
+    result = classifier.classify_matrix(matrix, DATES)
+    assert result["valid"].all()
+    for i, row in enumerate(matrix):
+        present = ~np.isnan(row)
+        hist = pd.DataFrame({"Close": row[present]}, index=DATES[present])
+        expected = fetcher.analyze_history(f"CLS{i}.NS", hist)
+        assert result["status"][i] == expected["status"], i
+        assert result["is_low"][i] == expected["is_low"]
+        assert result["details"][i] == expected["details"]
+        for key in ("price", "change_percent", "seven_day_avg", "seven_day_low", "two_fifty_day_low", "two_fifty_day_avg"):
+            assert result[key][i] == pytest.approx(expected[key]), (i, key)
+    assert {"CRITICAL DIP", "HIGH"} <= set(result["status"])
+
+def test_rolling_stats_match_the_snapshot_of_each_day():
+    matrix = closes(1)[:4]
+    rolling = classifier.rolling_stats(matrix, DATES)
+    for day in (0, 19, 150, 250, len(DATES) - 1):
+        snapshot = classifier.window_stats(matrix[:, :day + 1], DATES[:day + 1])
+        present = ~np.isnan(matrix[:, day])
+        for key in ("ma_20", "min_30", "max_30", "two_fifty_day_low"):
+            np.testing.assert_allclose(rolling[key][present, day], snapshot[key][present], err_msg=f"{key} on day {day}")
+        assert np.isnan(rolling["ma_20"][~present, day]).all()
+
+def test_flat_range_and_thresholds():
+    flags = classifier.classify(
+        price=[100.0, 100.0, 104.0], ma_20=[90.0, 90.0, 90.0], min_30=[100.0, 90.0, 90.0],
+        max_30=[100.0, 105.0, 105.0], two_fifty_day_low=[80.0, 98.0, 80.0],
+    )
+    # Flat 30-day range: at its minimum counts as the bottom of it
+    assert flags["in_bottom_range"].tolist() == [True, False, False]
+    assert flags["status"].tolist() == ["LOW", "CRITICAL DIP", "HIGH"]
+    widened = classifier.classify(
+        price=[104.0], ma_20=[90.0], min_30=[90.0], max_30=[105.0], two_fifty_day_low=[80.0], range_band=0.95,
+    )
+    assert widened["status"].tolist() == ["LOW"]
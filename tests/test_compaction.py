@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, insert
+
+import compaction
+from database import Base, PriceRollup, SessionLocal, StockPrice, engine
+
+Base.metadata.create_all(bind=engine)
+
+SYMBOL = "CMP.NS"
+
+def write_minutes(start, count, first_price):
+    rows = [
+        {"symbol": SYMBOL, "timestamp": start + timedelta(minutes=i), "price": first_price + i}
+        for i in range(count)
+    ]
+    session = SessionLocal()
+    try:
+        session.execute(insert(StockPrice), rows)
+        session.commit()
+    finally:
+        session.close()
+
+def stored(resolution=None):
+    session = SessionLocal()
+    try:
+        if resolution is None:
+            return sorted(t for (t,) in session.query(StockPrice.timestamp).filter(StockPrice.symbol == SYMBOL))
+        return {
+            r.bucket: (r.open, r.high, r.low, r.close, r.samples)
+            for r in session.query(PriceRollup).filter(PriceRollup.symbol == SYMBOL, PriceRollup.resolution == resolution)
+        }
+    finally:
+        session.close()
+
+@pytest.fixture
+def clean(monkeypatch):
+    monkeypatch.setattr(compaction, "COMPACT_VACUUM", False)
+    monkeypatch.setattr(compaction, "RAW_RETENTION_DAYS", 7)
+    yield
+    session = SessionLocal()
+    try:
+        for model in (StockPrice, PriceRollup):
+            session.execute(delete(model).where(model.symbol == SYMBOL))
+        session.commit()
+    finally:
+        session.close()
+
+def test_raw_window_boundary(clean):
+    # 23:40 to 00:19 UTC around the cutoff at midnight of 2026-03-13
+    write_minutes(datetime(2026, 3, 12, 23, 40), 40, 100.0)
+    summary = compaction.compact(now=datetime(2026, 3, 20, 12, 0))
+    assert summary["cutoff"] == datetime(2026, 3, 13)
+    assert summary["raw_rows"] == 20
+
+    # Raw rows from the cutoff on stay, the older ones are only in the rollups
+    assert stored()[0] == datetime(2026, 3, 13)
+    five = stored("5m")
+    assert max(five) == datetime(2026, 3, 12, 23, 55)
+    assert five[datetime(2026, 3, 12, 23, 55)] == (115.0, 119.0, 115.0, 119.0, 5)
+    assert stored("1d") == {datetime(2026, 3, 12): (100.0, 119.0, 100.0, 119.0, 20)}
+
+def test_bucket_straddling_the_cutoff_is_completed_next_time(clean):
+    write_minutes(datetime(2026, 3, 12, 23, 40), 40, 100.0)
+    compaction.compact(now=datetime(2026, 3, 20, 12, 0))
+    # The hourly bucket from 23:45 holds 23:45-23:59 so far
+    assert stored("1h")[datetime(2026, 3, 12, 23, 45)] == (105.0, 119.0, 105.0, 119.0, 15)
+
+    compaction.compact(now=datetime(2026, 3, 21, 12, 0))
+    hourly = stored("1h")
+    assert hourly[datetime(2026, 3, 12, 23, 45)] == (105.0, 139.0, 105.0, 139.0, 35)
+    assert hourly[datetime(2026, 3, 12, 22, 45)] == (100.0, 104.0, 100.0, 104.0, 5)
+    assert stored("1d")[datetime(2026, 3, 13)] == (120.0, 139.0, 120.0, 139.0, 20)
+    assert stored() == []
+
+def test_expired_rollups_are_deleted(clean):
+    write_minutes(datetime(2026, 1, 5, 4, 0), 10, 50.0)
+    compaction.compact(now=datetime(2026, 1, 20))
+    assert stored("5m") and stored("1d")
+    summary = compaction.compact(now=datetime(2026, 1, 5) + timedelta(days=compaction.ROLLUPS["5m"][1] + 1))
+    assert summary["expired_rollups"] >= 2
+    assert stored("5m") == {} and stored("1h") and stored("1d")
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import database
+from database import Base, LatestPrice, Stock, StockPrice, make_engine
+
+@pytest.fixture
+def session():
+    engine = make_engine("sqlite://", wal=False)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+T0 = datetime(2026, 3, 2, 4, 0)
+
+def quote(symbol, minutes, price):
+    return {"symbol": symbol, "timestamp": T0 + timedelta(minutes=minutes), "price": price, "status": "NORMAL"}
+
+def test_backfill_takes_the_newest_row_of_every_symbol(session):
+    session.add_all([Stock(symbol=s, name=s) for s in ("A.NS", "B.NS", "C.NS")])
+    # Inserted out of time order on purpose
+    session.add_all([StockPrice(**row) for row in (
+        quote("A.NS", 2, 12.0), quote("A.NS", 0, 10.0), quote("A.NS", 1, 11.0),
+        quote("B.NS", 0, 20.0), quote("B.NS", 5, 25.0),
+    )])
+    session.commit()
+
+    database.backfill_latest_prices(session)
+    session.commit()
+    latest = {row.symbol: (row.price, row.timestamp) for row in session.query(LatestPrice)}
+    assert latest == {"A.NS": (12.0, T0 + timedelta(minutes=2)), "B.NS": (25.0, T0 + timedelta(minutes=5))}
+
+    quotes = {stock.symbol: latest_row for stock, latest_row in database.latest_quotes(session)}
+    assert quotes["C.NS"] is None and quotes["A.NS"].price == 12.0
+    [(stock, only)] = database.latest_quotes(session, "B.NS")
+    assert (stock.symbol, only.price) == ("B.NS", 25.0)
+
+def test_save_prices_writes_a_tick_with_two_statements(session):
+    from sqlalchemy import event
+    statements = []
+    engine = session.get_bind()
+    listener = lambda conn, cursor, statement, params, context, executemany: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        rows = [quote(f"S{i}.NS", 0, float(i)) for i in range(50)]
+        assert database.save_prices(session, rows) == 50
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+    # One executemany INSERT for the history, one upsert for the snapshot
+    assert len(inserts) == 2
+    assert session.query(StockPrice).count() == 50 and session.query(LatestPrice).count() == 50
+
+    assert database.save_prices(session, [quote("S1.NS", 1, 101.0)]) == 1
+    assert session.get(LatestPrice, "S1.NS").price == 101.0
+    assert session.query(LatestPrice).count() == 50
+    assert session.query(StockPrice).filter(StockPrice.symbol == "S1.NS").count() == 2
+    assert database.save_prices(session, []) == 0
+
+def test_upsert_overwrites_only_the_given_fields(session):
+    from datetime import date
+    from database import DailyBar
+    bar = {"symbol": "U.NS", "date": date(2026, 3, 2), "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10}
+    database.upsert(session, DailyBar, [bar], ["symbol", "date"], ["close", "volume"])
+    database.upsert(session, DailyBar, [{**bar, "open": 9.0, "close": 1.8, "volume": 20}], ["symbol", "date"], ["close", "volume"])
+    session.commit()
+    [stored] = session.query(DailyBar).all()
+    assert (stored.open, stored.close, stored.volume) == (1.0, 1.8, 20)
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from downsample import lttb
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=float), np.cumsum(rng.normal(0, 1, n))
+
+@pytest.mark.parametrize("n", [1, 2, 3, 10, 1000])
+@pytest.mark.parametrize("threshold", [0, 1, 2, 3, 7, 500, 2000])
+def test_at_most_threshold_points(n, threshold):
+    x, y = series(n)
+    keep = lttb(x, y, threshold)
+    assert len(keep) == min(n, threshold)
+    assert np.all(np.diff(keep) > 0)
+
+@pytest.mark.parametrize("threshold", [2, 3, 50])
+def test_endpoints_are_kept(threshold):
+    x, y = series(1000)
+    keep = lttb(x, y, threshold)
+    assert keep[0] == 0 and keep[-1] == 999
+
+def test_extremes_survive():
+    x, y = series(1000)
+    y[400], y[700] = 100.0, -100.0
+    keep = lttb(x, y, 50)
+    assert 400 in keep and 700 in keep
+
+@pytest.mark.parametrize("max_points, expected", [(1, 1), (2, 2), (20, 20), (0, 300)])
+def test_history_endpoint_respects_max_points(monkeypatch, max_points, expected):
+    monkeypatch.chdir(REPO)
+    import main
+    index = pd.date_range("2026-03-02 09:15", periods=300, freq="min", tz="Asia/Kolkata")
+    hist = pd.DataFrame({"Close": series(300)[1] + 100}, index=index)
+
+    async def load_history(symbol, period, interval):
+        return hist
+    monkeypatch.setattr(main, "load_history", load_history)
+    payload = TestClient(main.app).get("/api/history/DS.NS", params={"max_points": max_points}).json()
+    assert len(payload["t"]) == len(payload["c"]) == expected
+    assert payload["t"][0] == index[0].value // 10**6
+    if expected > 1:
+        assert payload["t"][-1] == index[-1].value // 10**6
@@ -0,0 +1,191 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fetcher
+from bar_store import ist_today
+from database import Base, SessionLocal, Stock, StockPrice, engine
+from providers import StaticProvider
+
+Base.metadata.create_all(bind=engine)
+
+def daily_frame(start_price, days=300, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp(ist_today()), periods=days)
+    closes = start_price * np.cumprod(1 + rng.normal(0, 0.01, days))
+    return pd.DataFrame({
+        "Open": closes, "High": closes * 1.01, "Low": closes * 0.99, "Close": closes,
+        "Volume": np.full(days, 1000),
+    }, index=index)
+
+class FailingProvider(StaticProvider):
+    def history(self, symbols, period="1mo", interval="1d"):
+        self.calls += 1
+        raise ConnectionError("upstream down")
+
+@pytest.fixture
+def tracked():
+    def track(*symbols):
+        session = SessionLocal()
+        session.add_all([Stock(symbol=symbol, name=symbol) for symbol in symbols])
+        session.commit()
+        session.close()
+    return track
+
+def test_fetch_all_with_and_without_data():
+    source = StaticProvider({"FETCH_A.NS": daily_frame(100.0)})
+    results = fetcher.fetch_all(["FETCH_A.NS", "FETCH_NONE.NS"], source=source)
+    assert set(results) == {"FETCH_A.NS"}
+    result = results["FETCH_A.NS"]
+    assert result["price"] == pytest.approx(source.frames["FETCH_A.NS"]["Close"].iloc[-1])
+    assert result["status"] in ("LOW", "CRITICAL DIP", "NORMAL", "HIGH")
+    assert result["two_fifty_day_low"] <= result["price"]
+
+def test_fetch_all_survives_a_failing_provider():
+    source = FailingProvider({})
+    assert fetcher.fetch_all(["FETCH_FAIL.NS"], source=source) == {}
+    assert source.calls == 1
+
+def test_update_all_stocks_writes_fetched_and_reports_missing(monkeypatch, tracked):
+    tracked("TICK_A.NS", "TICK_NONE.NS")
+    monkeypatch.setattr(fetcher, "provider", StaticProvider({"TICK_A.NS": daily_frame(250.0, seed=1)}))
+    monkeypatch.setattr(fetcher, "is_market_open", lambda: True)
+
+    result = fetcher.update_all_stocks(["TICK_A.NS", "TICK_NONE.NS"])
+    assert result["fetched"] == 1
+    assert result["missing"] == ["TICK_NONE.NS"]
+    session = SessionLocal()
+    try:
+        written = {symbol for (symbol,) in session.query(StockPrice.symbol)}
+    finally:
+        session.close()
+    assert "TICK_A.NS" in written and "TICK_NONE.NS" not in written
+
+def test_update_all_stocks_with_a_failing_provider(monkeypatch, tracked):
+    tracked("TICK_FAIL.NS")
+    monkeypatch.setattr(fetcher, "provider", FailingProvider({}))
+    monkeypatch.setattr(fetcher, "is_market_open", lambda: True)
+
+    result = fetcher.update_all_stocks(["TICK_FAIL.NS"])
+    assert result["fetched"] == 0
+    assert result["missing"] == ["TICK_FAIL.NS"]
+
+def test_update_all_stocks_skips_when_closed(monkeypatch):
+    monkeypatch.setattr(fetcher, "is_market_open", lambda: False)
+    assert fetcher.update_all_stocks() == {"skipped": "Market is closed"}
+
+def test_failing_alerts_do_not_block_the_write(monkeypatch, tracked):
+    tracked("TICK_ALERT.NS")
+    monkeypatch.setattr(fetcher, "provider", StaticProvider({"TICK_ALERT.NS": daily_frame(80.0, seed=2)}))
+    monkeypatch.setattr(fetcher, "is_market_open", lambda: True)
+
+    def broken(rows, now):
+        raise ValueError("bad rule")
+    monkeypatch.setattr(fetcher.alert_engine, "evaluate", broken)
+
+    assert fetcher.update_all_stocks(["TICK_ALERT.NS"])["fetched"] == 1
+    session = SessionLocal()
+    try:
+        assert session.query(StockPrice).filter(StockPrice.symbol == "TICK_ALERT.NS").count() == 1
+    finally:
+        session.close()
+
+def test_stale_symbols_do_not_widen_the_reload(monkeypatch):
+    import bar_store
+    from indicators import IndicatorEngine
+    fresh = daily_frame(50.0, days=120, seed=3)
+    stale = daily_frame(60.0, days=120, seed=4).shift(-90, freq="B")
+    session = SessionLocal()
+    try:
+        bar_store.upsert_bars(session, {"IND_FRESH.NS": fresh, "IND_STALE.NS": stale})
+        session.commit()
+    finally:
+        session.close()
+    monkeypatch.setattr(fetcher, "indicator_engine", IndicatorEngine())
+    symbols = ["IND_FRESH.NS", "IND_STALE.NS"]
+    assert set(fetcher._update_indicators(symbols)) == set(symbols)
+
+    loads = []
+    load_bars = bar_store.load_bars
+    def recording(session, symbols, period="1y", since=None):
+        loads.append((sorted(symbols), period, since))
+        return load_bars(session, symbols, period, since)
+    monkeypatch.setattr(bar_store, "load_bars", recording)
+
+    assert set(fetcher._update_indicators(symbols)) == {"IND_FRESH.NS"}
+    assert loads == [(["IND_FRESH.NS"], "1y", fresh.index[-1].date())]
+
+    # New bars for the stale symbol bring it back with a fresh restore
+    session = SessionLocal()
+    try:
+        bar_store.upsert_bars(session, {"IND_STALE.NS": fresh.tail(1)})
+        session.commit()
+    finally:
+        session.close()
+    loads.clear()
+    assert set(fetcher._update_indicators(symbols)) == set(symbols)
+    assert (["IND_STALE.NS"], "1y", None) in loads
+    assert fetcher.indicator_engine.current_date("IND_STALE.NS") == fresh.index[-1].date()
+
+class BlockingProvider(StaticProvider):
+    def __init__(self, frames):
+        super().__init__(frames)
+        self.release = threading.Event()
+        self.downloads = 0
+
+    def history(self, symbols, period="1mo", interval="1d"):
+        self.downloads += 1
+        self.release.wait(5)
+        return super().history(symbols, period, interval)
+
+def test_a_timed_out_sync_is_not_overlapped(monkeypatch):
+    monkeypatch.setattr(fetcher, "FETCH_TIMEOUT", 0.1)
+    source = BlockingProvider({"SYNC_A.NS": daily_frame(30.0, seed=5)})
+    try:
+        assert fetcher.fetch_all(["SYNC_A.NS"], source=source) == {}
+        # The first download is still running: the next tick waits for it instead of starting another
+        assert fetcher.fetch_all(["SYNC_A.NS"], source=source) == {}
+        assert source.downloads == 1
+    finally:
+        source.release.set()
+    fetcher._sync_future.result(timeout=5)
+    assert set(fetcher.fetch_all(["SYNC_A.NS"], source=source)) == {"SYNC_A.NS"}
+    assert source.downloads == 2
+
+def test_a_slow_download_falls_back_to_the_stored_bars(monkeypatch):
+    frame = daily_frame(45.0, seed=6)
+    stored = fetcher.fetch_all(["SLOW_A.NS"], source=StaticProvider({"SLOW_A.NS": frame}))
+    monkeypatch.setattr(fetcher, "FETCH_TIMEOUT", 0.2)
+    source = BlockingProvider({"SLOW_A.NS": frame})
+    try:
+        results = fetcher.fetch_all(["SLOW_A.NS"], source=source)
+        # Given up after FETCH_TIMEOUT, analyzed from what the store already had
+        assert 0.2 <= fetcher.last_tick["download_s"] < 1
+        assert results["SLOW_A.NS"]["price"] == pytest.approx(stored["SLOW_A.NS"]["price"])
+    finally:
+        source.release.set()
+    fetcher._sync_future.result(timeout=5)
+
+def test_tick_session_is_closed_when_the_fetch_fails(monkeypatch, tracked):
+    tracked("TICK_RAISE.NS")
+    opened, closed = [], []
+    def session_factory():
+        session = SessionLocal()
+        close = session.close
+        def closing():
+            closed.append(session)
+            close()
+        session.close = closing
+        opened.append(session)
+        return session
+    def broken(symbols, source=None):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(fetcher, "SessionLocal", session_factory)
+    monkeypatch.setattr(fetcher, "fetch_all", broken)
+    monkeypatch.setattr(fetcher, "is_market_open", lambda: True)
+
+    with pytest.raises(RuntimeError):
+        fetcher.update_all_stocks(["TICK_RAISE.NS"])
+    assert opened and closed == opened
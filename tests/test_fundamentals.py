@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import fundamentals
+from database import Base, Fundamental, SessionLocal, Stock, engine
+from providers import StaticProvider
+
+Base.metadata.create_all(bind=engine)
+
+class InfoProvider(StaticProvider):
+    def __init__(self, infos):
+        super().__init__({})
+        self.infos = infos
+        self.requested = []
+
+    def info(self, symbol):
+        self.requested.append(symbol)
+        return self.infos.get(symbol)
+
+def test_only_stale_fundamentals_are_refreshed(monkeypatch):
+    monkeypatch.setattr(fundamentals, "cache", fundamentals.TTLCache(ttl=3600))
+    now = datetime.utcnow()
+    session = SessionLocal()
+    try:
+        session.add_all([Stock(symbol=s, name=s) for s in ("FUND_NEW.NS", "FUND_OLD.NS", "FUND_FRESH.NS")])
+        session.add_all([
+            Fundamental(symbol="FUND_OLD.NS", market_cap=1.0, updated_at=now - timedelta(hours=fundamentals.FUNDAMENTALS_MAX_AGE_HOURS + 1)),
+            Fundamental(symbol="FUND_FRESH.NS", market_cap=2.0, updated_at=now - timedelta(hours=1)),
+        ])
+        session.commit()
+        stale = [s for s in fundamentals.stale_symbols(session) if s.startswith("FUND_")]
+    finally:
+        session.close()
+    assert sorted(stale) == ["FUND_NEW.NS", "FUND_OLD.NS"]
+
+    # Served from the cache until a refresh replaces it
+    assert fundamentals.get("FUND_OLD.NS")["market_cap"] == 1.0
+    source = InfoProvider({
+        "FUND_NEW.NS": {"marketCap": 5.0, "trailingPE": 12.5},
+        "FUND_OLD.NS": {"marketCap": 7.0, "fiftyTwoWeekHigh": 90.0},
+    })
+    result = fundamentals.refresh(stale + ["FUND_GONE.NS"], source=source)
+    assert result == {"refreshed": 2, "failed": ["FUND_GONE.NS"]}
+    assert fundamentals.get("FUND_OLD.NS")["market_cap"] == 7.0
+    assert fundamentals.get_many(["FUND_NEW.NS", "FUND_FRESH.NS"])["FUND_NEW.NS"]["pe_ratio"] == 12.5
+
+    session = SessionLocal()
+    try:
+        assert not [s for s in fundamentals.stale_symbols(session) if s.startswith("FUND_")]
+        assert session.get(Fundamental, "FUND_OLD.NS").fifty_two_week_high == 90.0
+    finally:
+        session.close()
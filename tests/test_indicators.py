@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import IndicatorEngine
+from providers import slice_period
+
+def closes(days=400, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2026-03-13", periods=days)
+    series = pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.02, days)), index=index)
+    # Three weeks without bars, e.g. a suspension
+    return series.drop(series.index[330:345])
+
+def expected(series):
+    """The stats as the pandas analysis computed them from scratch."""
+    hist = slice_period(series.to_frame("Close"), "1y")["Close"]
+    month = slice_period(hist.to_frame("Close"), "1mo")["Close"]
+    price = month.iloc[-1]
+    return {
+        "price": price,
+        "change_percent": (price - month.iloc[-2]) / month.iloc[-2] * 100 if len(month) >= 2 else 0.0,
+        "ma_20": month.rolling(20).mean().iloc[-1] if len(month) >= 20 else month.mean(),
+        "seven_day_avg": month.tail(7).mean(),
+        "seven_day_low": month.tail(7).min(),
+        "min_30": month.tail(30).min(),
+        "max_30": month.tail(30).max(),
+        "two_fifty_day_low": hist.min(),
+        "two_fifty_day_avg": hist.mean(),
+    }
+
+def test_incremental_updates_match_a_rolling_recomputation():
+    series = closes()
+    engine = IndicatorEngine()
+    engine.restore("IND.NS", series.iloc[:300].to_frame("Close"))
+    for i in range(300, len(series)):
+        ts, close = series.index[i], series.iloc[i]
+        # The current day's bar is revised a few times before it is final
+        assert engine.update("IND.NS", ts.date(), close * 0.9)
+        assert engine.update("IND.NS", ts.date(), close)
+        assert engine.stats("IND.NS") == pytest.approx(expected(series.iloc[:i + 1]))
+
+def test_out_of_order_dates_are_ignored():
+    series = closes(60)
+    engine = IndicatorEngine()
+    engine.restore("IND.NS", series.to_frame("Close"))
+    before = engine.stats("IND.NS")
+    assert not engine.update("IND.NS", series.index[-2].date(), 1.0)
+    assert engine.stats("IND.NS") == before
+
+def test_short_history():
+    series = closes(3)
+    engine = IndicatorEngine()
+    engine.restore("IND.NS", series.to_frame("Close"))
+    assert engine.stats("IND.NS") == pytest.approx(expected(series))
+    assert engine.stats("OTHER.NS") is None
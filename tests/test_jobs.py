@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import jobs
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def poll(get, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def test_job_reports_progress_and_result():
+    release = threading.Event()
+    def work():
+        jobs.set_progress(done=1, total=2)
+        release.wait(5)
+        return {"written": 2}
+
+    job = jobs.submit("test-progress", work)
+    assert job["status"] in ("queued", "running")
+    # Same kind while it runs: the running job is handed back
+    assert jobs.submit("test-progress", work)["id"] == job["id"]
+    deadline = time.monotonic() + 5
+    while jobs.get(job["id"])["progress"] is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert jobs.get(job["id"])["progress"] == {"done": 1, "total": 2}
+    release.set()
+
+    finished = poll(jobs.get, job["id"])
+    assert finished["status"] == "done" and finished["result"] == {"written": 2}
+    assert finished["started_at"] <= finished["finished_at"]
+    assert jobs.submit("test-progress", work)["id"] != job["id"]
+    release.set()
+
+def test_failed_job_keeps_the_error():
+    def broken():
+        raise RuntimeError("upstream down")
+    finished = poll(jobs.get, jobs.submit("test-failure", broken)["id"])
+    assert finished["status"] == "failed" and finished["error"] == "upstream down"
+
+def test_refresh_is_polled_through_the_jobs_endpoint(monkeypatch):
+    monkeypatch.chdir(REPO)
+    import main
+    from ticks import coordinator
+    monkeypatch.setattr(coordinator, "request", lambda symbols, reason, wait=False: {"tick": 1, "status": "done"})
+    client = TestClient(main.app)
+
+    response = client.post("/api/refresh")
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    job = poll(lambda job_id: client.get(f"/api/jobs/{job_id}").json(), job_id)
+    assert job["kind"] == "refresh" and job["result"] == {"tick": 1, "status": "done"}
+    assert client.get("/api/jobs/unknown").status_code == 404
@@ -0,0 +1,31 @@
+import asyncio
+from datetime import datetime
+
+from live import QuoteHub
+
+def tick(price, status="NORMAL", symbol="LIVE.NS"):
+    return {"symbol": symbol, "price": price, "change_percent": 1.0, "status": status,
+            "timestamp": datetime(2026, 3, 13, 9, 15)}
+
+def test_slow_client_gets_one_merged_delta_per_symbol():
+    async def scenario():
+        hub = QuoteHub()
+        hub.attach(asyncio.get_running_loop())
+        hub.publish([tick(100.0)])
+        subscription = hub.subscribe(["LIVE.NS"])
+        assert await subscription.next(1) == [
+            {"symbol": "LIVE.NS", "price": 100.0, "change": 1.0, "status": "NORMAL", "timestamp": "2026-03-13T09:15:00"},
+        ]
+
+        # Three ticks arrive before the client reads again
+        hub.publish([tick(101.0), tick(50.0, symbol="OTHER.NS")])
+        hub.publish([tick(102.0, status="HIGH")])
+        hub.publish([tick(102.0, status="HIGH")])  # unchanged, no delta
+        await asyncio.sleep(0)
+        assert await subscription.next(1) == [{"symbol": "LIVE.NS", "price": 102.0, "status": "HIGH"}]
+        assert await subscription.next(0.01) == []
+
+        hub.unsubscribe(subscription)
+        assert hub.stats() == {"subscribers": 0, "symbols": 2}
+
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+from datetime import date, datetime, timezone
+import json
+
+import market_calendar
+import scheduler
+from database import Base, engine
+
+Base.metadata.create_all(bind=engine)
+
+def write_calendar(tmp_path):
+    path = tmp_path / "calendar.json"
+    path.write_text(json.dumps({
+        "regular_session": {"open": "09:15", "close": "15:30"},
+        "holidays": {"2026-01-26": "Republic Day"},
+        "special_sessions": {"2026-11-08": {"open": "18:00", "close": "19:00", "name": "Muhurat Trading"}},
+    }))
+    return str(path)
+
+def test_sessions(tmp_path):
+    calendar = market_calendar.MarketCalendar(write_calendar(tmp_path))
+    assert calendar.is_open(datetime(2026, 1, 27, 10, 0))
+    assert not calendar.is_open(datetime(2026, 1, 26, 10, 0))  # holiday
+    assert not calendar.is_open(datetime(2026, 1, 31, 10, 0))  # Saturday
+    assert calendar.is_open(datetime(2026, 11, 8, 18, 30))  # Sunday, special session
+    assert calendar.next_open(datetime(2026, 1, 25, 12, 0)) == datetime(2026, 1, 27, 9, 15)
+
+def test_years_outside_the_calendar_are_warned_about_once(tmp_path, capsys):
+    calendar = market_calendar.MarketCalendar(write_calendar(tmp_path))
+    calendar.is_open(datetime(2026, 3, 2, 10, 0))
+    assert "WARNING" not in capsys.readouterr().out
+
+    assert calendar.is_trading_day(date(2027, 1, 26))
+    calendar.is_open(datetime(2027, 3, 2, 10, 0))
+    out = capsys.readouterr().out
+    assert out.count("WARNING") == 1 and "no holidays for 2027" in out
+
+def test_dispatch_plans_on_the_market_clock(monkeypatch):
+    import fetcher
+    replayed = datetime(2026, 3, 2, 11, 0)  # naive IST, as a replay clock returns it
+    monkeypatch.setattr(market_calendar, "_clock", lambda: replayed)
+    monkeypatch.setattr(fetcher, "is_market_open", lambda: True)
+    monkeypatch.setattr(scheduler.coordinator, "is_leader", lambda: True)
+    monkeypatch.setattr(scheduler.coordinator, "request", lambda symbols, reason: None)
+    seen = []
+    monkeypatch.setattr(scheduler.planner, "due", lambda now, window: seen.append(now) or [])
+
+    scheduler.dispatch()
+    assert seen == [datetime(2026, 3, 2, 5, 30, tzinfo=timezone.utc).timestamp()]
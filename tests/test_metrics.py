@@ -0,0 +1,46 @@
+import pytest
+
+import metrics
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    monkeypatch.setattr(metrics, "_registry", {})
+
+def test_render_text_format(enabled):
+    calls = metrics.timer("test_call", "Test calls")
+    with calls.time(route="/api/x"):
+        pass
+    calls.observe(0.3, route="/api/x")
+    with pytest.raises(RuntimeError):
+        with calls.time(route="/api/x"):
+            raise RuntimeError("boom")
+    metrics.counter("test_events_total", "Events").inc(2, name='a"b\nc')
+    size = metrics.summary("test_size", "Sizes")
+    size.observe(2.0, symbol="A.NS")
+    size.observe(3.0, symbol="A.NS")
+
+    lines = metrics.render({"test_up": 1, "test_skipped": None, "test_restarts_total": 4}).splitlines()
+    assert lines[:3] == ["# HELP test_call_errors_total Exceptions raised inside test_call_seconds",
+                         "# TYPE test_call_errors_total counter", 'test_call_errors_total{route="/api/x"} 1']
+    assert "# TYPE test_call_seconds histogram" in lines
+    # Cumulative buckets: two fast calls, then the 0.3 s one
+    assert 'test_call_seconds_bucket{route="/api/x",le="0.25"} 2' in lines
+    assert 'test_call_seconds_bucket{route="/api/x",le="0.5"} 3' in lines
+    assert 'test_call_seconds_bucket{route="/api/x",le="+Inf"} 3' in lines
+    assert 'test_call_seconds_count{route="/api/x"} 3' in lines
+    assert 'test_events_total{name="a\\"b\\nc"} 2' in lines
+    assert 'test_size_sum{symbol="A.NS"} 5.0' in lines and 'test_size_count{symbol="A.NS"} 2' in lines
+    assert lines[-4:] == ["# TYPE test_restarts_total counter", "test_restarts_total 4", "# TYPE test_up gauge", "test_up 1"]
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", {})
+    calls = metrics.timer("test_off", "Off")
+    with calls.time():
+        pass
+    assert metrics.render() == "# HELP test_off_errors_total Exceptions raised inside test_off_seconds\n# TYPE test_off_errors_total counter\n# HELP test_off_seconds Off\n# TYPE test_off_seconds histogram\n"
+
+def test_a_name_keeps_its_kind(enabled):
+    metrics.counter("test_kind")
+    with pytest.raises(ValueError):
+        metrics.histogram("test_kind")
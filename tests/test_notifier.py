@@ -0,0 +1,80 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+import pytest
+
+import notifier
+
+class TelegramStub(BaseHTTPRequestHandler):
+    """Answers sendMessage with the next scripted (status, body), then 200."""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        server.requests.append((time.monotonic(), payload["text"]))
+        status, body = server.script.pop(0) if server.script else (200, {"ok": True})
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def telegram(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TelegramStub)
+    server.requests, server.script = [], []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(notifier, "TELEGRAM_API_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(notifier, "TELEGRAM_BOT_TOKEN", "test-token")
+    monkeypatch.setattr(notifier, "TELEGRAM_CHAT_ID", "1")
+    monkeypatch.setattr(notifier, "TELEGRAM_MIN_INTERVAL", 0)
+    monkeypatch.setattr(notifier, "TELEGRAM_BACKOFF", 0.05)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_queue_waits_out_429_and_retries_5xx(telegram):
+    telegram.script = [(429, {"ok": False, "parameters": {"retry_after": 1}}), (500, {"ok": False})]
+    before = notifier.stats()
+    messages = [f"alert {i}: " + "x" * 1500 for i in range(4)]
+    digest = "\n\n".join([f"\U0001f514 <b>{len(messages)} alerts</b>"] + messages)
+    chunks = notifier.split_message(digest)
+    assert len(chunks) == 2 and all(len(chunk) <= notifier.MAX_MESSAGE_LENGTH for chunk in chunks)
+
+    assert notifier.send_digest(messages)
+    assert notifier.flush(timeout=10)
+
+    times = [at for at, _ in telegram.requests]
+    texts = [text for _, text in telegram.requests]
+    # 429, then 500, then 200 for the first chunk; 200 for the second
+    assert texts == [chunks[0]] * 3 + [chunks[1]]
+    assert times[1] - times[0] >= 1.0  # retry_after
+    after = notifier.stats()
+    assert after["queued"] - before["queued"] == 2
+    assert after["sent"] - before["sent"] == 2
+    assert after["retries"] - before["retries"] == 2
+    assert after["rate_limited"] - before["rate_limited"] == 1
+    assert after["failed"] == before["failed"]
+    assert after["pending"] == 0
+
+def test_gives_up_without_sleeping_after_the_last_attempt(telegram, monkeypatch):
+    monkeypatch.setattr(notifier, "TELEGRAM_MAX_RETRIES", 1)
+    monkeypatch.setattr(notifier, "TELEGRAM_BACKOFF", 0.3)
+    telegram.script = [(500, {"ok": False})] * 2
+    started = time.monotonic()
+    assert not notifier.send_telegram_message("down")
+    # One backoff (0.3s) between the two attempts, none after the last (0.6s)
+    assert time.monotonic() - started < 0.6
+    assert len(telegram.requests) == 2
+
+def test_client_errors_are_not_retried(telegram):
+    telegram.script = [(400, {"ok": False, "description": "Bad Request"})]
+    assert not notifier.send_telegram_message("<b>unclosed")
+    assert len(telegram.requests) == 1
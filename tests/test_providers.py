@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from providers import ReplayProvider, load_recording
+
+START = pd.Timestamp("2026-03-02 09:20")
+
+@pytest.fixture
+def recordings(tmp_path):
+    days = pd.bdate_range(end="2026-02-27", periods=300)
+    daily = pd.DataFrame({
+        "Open": np.arange(300.0), "High": np.arange(300.0) + 1, "Low": np.arange(300.0) - 1,
+        "Close": np.arange(300.0) + 0.5, "Volume": 100,
+    }, index=days)
+    minutes = pd.date_range("2026-03-02 09:15", periods=15, freq="min")
+    closes = 500.0 + np.arange(15)
+    intraday = pd.DataFrame({
+        "Open": closes, "High": closes + 0.25, "Low": closes - 0.25, "Close": closes, "Volume": 10,
+    }, index=minutes)
+    pd.concat([daily, intraday]).to_csv(tmp_path / "REP_A.NS.csv", date_format="%Y-%m-%d %H:%M:%S")
+    daily.to_csv(tmp_path / "REP_B.NS.csv")
+    (tmp_path / "info.json").write_text(json.dumps({"REP_A.NS": {"trailingPE": 12.5}}))
+    return tmp_path
+
+def test_clock_stands_still_at_speed_zero(recordings):
+    replay = ReplayProvider(str(recordings), speed=0, start=START)
+    assert replay.now() == START.to_pydatetime()
+    replay.advance(90)
+    assert replay.now() == (START + pd.Timedelta(seconds=90)).to_pydatetime()
+
+def test_daily_bar_grows_with_the_replayed_minutes(recordings):
+    replay = ReplayProvider(str(recordings), speed=0, start=START)
+    today = replay.history(["REP_A.NS"], "5d", "1d")["REP_A.NS"].iloc[-1]
+    # 09:15 to 09:20 of the minute recording, aggregated
+    assert today.name == pd.Timestamp("2026-03-02")
+    assert (today["Open"], today["Close"], today["High"], today["Volume"]) == (500.0, 505.0, 505.25, 60)
+
+    replay.advance(120)
+    assert replay.history(["REP_A.NS"], "1d", "1d")["REP_A.NS"]["Close"].iloc[-1] == 507.0
+
+def test_history_ends_at_the_clock_and_respects_the_period(recordings):
+    replay = ReplayProvider(str(recordings), speed=0, start="2026-02-20 16:00")
+    frames = replay.history(["REP_A.NS", "REP_B.NS", "MISSING.NS"], "1mo", "1d")
+    assert set(frames) == {"REP_A.NS", "REP_B.NS"}
+    bars = frames["REP_B.NS"]
+    assert bars.index[-1] == pd.Timestamp("2026-02-20")
+    assert bars.index[0] > pd.Timestamp("2026-01-20")
+    assert replay.calls == 1
+
+def test_info_and_default_start(recordings):
+    replay = ReplayProvider(str(recordings), speed=0)
+    assert replay.info("REP_A.NS") == {"trailingPE": 12.5}
+    assert replay.info("REP_B.NS") == {}
+    # One year into the recordings, so the 250-day stats are complete
+    first = pd.bdate_range(end="2026-02-27", periods=300)[0]
+    assert replay.now() == (first + pd.DateOffset(years=1)).to_pydatetime()
+
+def test_no_recordings(tmp_path):
+    with pytest.raises(ValueError):
+        ReplayProvider(str(tmp_path))
+
+def test_recordings_with_utc_offsets_are_read_as_ist(tmp_path):
+    path = tmp_path / "UTC.NS.csv"
+    path.write_text("Datetime,Open,High,Low,Close,Volume\n2026-03-02 03:45:00+00:00,1,1,1,1,5\n")
+    assert load_recording(str(path)).index[0] == pd.Timestamp("2026-03-02 09:15")
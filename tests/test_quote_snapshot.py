@@ -0,0 +1,32 @@
+import json
+
+import quote_snapshot
+from database import Base, LatestPrice, SessionLocal, Stock, engine
+
+Base.metadata.create_all(bind=engine)
+
+def test_round_trip(tmp_path):
+    session = SessionLocal()
+    try:
+        session.add(Stock(symbol="SNAP_A.NS", name="Snap A"))
+        session.add(LatestPrice(symbol="SNAP_A.NS", price=12.5, change_percent=1.0, status="NORMAL"))
+        session.commit()
+        path = str(tmp_path / "quotes.json")
+        assert quote_snapshot.write(session, path) >= 1
+    finally:
+        session.close()
+    entries = {entry["symbol"]: entry for entry in quote_snapshot.read(path)}
+    assert entries["SNAP_A.NS"]["quote"]["price"] == 12.5
+    assert quote_snapshot.read(path) is quote_snapshot.read(path)  # parsed once
+
+def test_snapshot_of_another_database_is_ignored(tmp_path):
+    path = tmp_path / "stale.json"
+    path.write_text(json.dumps({"database": "someone-else", "stocks": [{"symbol": "X", "name": "X", "quote": None}]}))
+    assert quote_snapshot.read(str(path)) is None
+    path.write_text(json.dumps({"stocks": []}))  # written before snapshots carried the id
+    assert quote_snapshot.read(str(path)) is None
+
+def test_default_path_depends_on_the_database(monkeypatch):
+    assert quote_snapshot.DATABASE_ID
+    monkeypatch.setattr(quote_snapshot.engine, "url", quote_snapshot.engine.url.set(database="/elsewhere/stocks.db"))
+    assert quote_snapshot.database_id() != quote_snapshot.DATABASE_ID
@@ -0,0 +1,23 @@
+from refresh_plan import REFRESH_FAST_S, RefreshPlanner
+
+SYMBOLS = [f"SYM{i}.NS" for i in range(600)]
+
+def planner():
+    planner = RefreshPlanner()
+    planner.plan(SYMBOLS, {}, {}, set())  # no quotes yet: all on the fast interval
+    return planner
+
+def test_slots_cover_every_symbol_once_per_interval():
+    p = planner()
+    start = 1_000_000
+    due = []
+    for now in range(start + 10, start + REFRESH_FAST_S + 10, 10):
+        due.extend(p.due(now, 10))
+    assert sorted(due) == sorted(SYMBOLS)
+
+def test_first_slot_after_a_long_pause_is_not_a_burst():
+    p = planner()
+    p.due(1_000_000, 10)
+    # Market closed overnight, the next check comes 17 hours later
+    due = p.due(1_000_000 + 17 * 3600, 10)
+    assert len(due) < len(SYMBOLS) * 10 / REFRESH_FAST_S * 2
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import columnar
+import screener
+from database import Base, DailyBar, SessionLocal, engine
+
+Base.metadata.create_all(bind=engine)
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="module")
+def snapshot(tmp_path_factory):
+    days = pd.bdate_range(end="2026-03-13", periods=300)
+    rising = np.linspace(100, 200, len(days))
+    series = {
+        "SCR_A.NS": rising,
+        "SCR_B.NS": 150 + 10 * np.sin(np.arange(len(days)) / 10),
+        "SCR_C.NS": np.append(rising[:-1], 90.0),  # a fresh 1-year low
+    }
+    rows = []
+    for symbol, closes in series.items():
+        rows += [
+            {"symbol": symbol, "date": day.date(), "open": c, "high": c, "low": c, "close": c, "volume": 1000}
+            for day, c in zip(days, closes)
+        ]
+    session = SessionLocal()
+    session.bulk_insert_mappings(DailyBar, rows)
+    session.commit()
+    session.close()
+    directory = str(tmp_path_factory.mktemp("columnar") / "columnar")
+    columnar.export(directory)
+    return columnar.Snapshot(directory)
+
+def test_screen_year_low(snapshot):
+    result = screener.screen(
+        ["hit_year_low == 1"], period="5d", as_of="2026-03-13", snapshot=snapshot, symbols=["SCR_A.NS", "SCR_C.NS"],
+    )
+    assert [row["symbol"] for row in result["results"]] == ["SCR_C.NS"]
+    assert result["as_of"] == "2026-03-13"
+
+@pytest.mark.parametrize("expression", ["price == status", "status == price", "status > 1", "status crosses_above LOW"])
+def test_mismatched_filters_are_rejected(snapshot, expression):
+    with pytest.raises(ValueError):
+        screener.screen([expression], snapshot=snapshot)
+
+def test_endpoint_returns_400_for_mismatched_filters(snapshot, monkeypatch):
+    monkeypatch.chdir(REPO)
+    import main
+    monkeypatch.setattr(columnar, "load", lambda: snapshot)
+    client = TestClient(main.app)
+    response = client.get("/api/screener", params={"filter": "price == status"})
+    assert response.status_code == 400
+    assert "numeric" in response.json()["detail"]
+    assert client.get("/api/screener", params={"filter": "status == LOW"}).status_code == 200
@@ -0,0 +1,41 @@
+import os
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import database
+import scheduler
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_ready_answers_503_until_background_init_is_done(monkeypatch):
+    monkeypatch.chdir(REPO)
+    import main
+    release = threading.Event()
+    seeded = []
+    def slow_seed():
+        release.wait(5)
+        database.Base.metadata.create_all(bind=database.engine)
+        seeded.append(True)
+    monkeypatch.setattr(database, "create_tables_and_seed", slow_seed)
+    monkeypatch.setattr(scheduler, "start_scheduler", lambda: None)
+    monkeypatch.setattr(main, "send_startup_report", lambda: None)
+    monkeypatch.setitem(main.startup_state, "ready", False)
+    monkeypatch.setitem(main.startup_state, "error", None)
+
+    with TestClient(main.app) as client:
+        # The port answers while the database is still being set up
+        response = client.get("/api/ready")
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
+        assert not seeded
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while client.get("/api/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        response = client.get("/api/ready")
+        assert response.status_code == 200
+        assert seeded and response.json()["error"] is None
+        assert {"app_s", "database_s", "scheduler_s", "ready_s"} <= set(response.json()["timings"])
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+import threading
+
+import pytest
+
+import ticks
+from database import Base, SessionLocal, acquire_lease, engine
+
+Base.metadata.create_all(bind=engine)
+
+class Runner:
+    """Records the symbols of every tick; the first tick blocks until released."""
+
+    def __init__(self, missing=()):
+        self.calls = []
+        self.missing = set(missing)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, symbols):
+        self.calls.append(symbols)
+        if len(self.calls) == 1:
+            self.started.set()
+            self.release.wait(5)
+        return {"fetched": len(symbols or []), "missing": sorted(self.missing & set(symbols or []))}
+
+def test_requests_during_a_tick_merge_into_one_follow_up():
+    runner = Runner()
+    coordinator = ticks.TickCoordinator(run=runner, use_lease=False)
+
+    first = threading.Thread(target=coordinator.request, args=(["A.NS"],))
+    first.start()
+    assert runner.started.wait(5)
+    # Both arrive while the first tick runs: neither starts a fetch of its own
+    assert coordinator.request(["B.NS"], reason="api") is None
+    assert coordinator.request(["C.NS", "B.NS"], reason="schedule") is None
+    runner.release.set()
+    first.join(5)
+
+    assert runner.calls == [["A.NS"], ["B.NS", "C.NS"]]
+    follow_up = coordinator.history[-1]
+    assert follow_up["requests"] == 2
+    assert follow_up["reasons"] == ["api", "schedule"]
+
+def test_wait_returns_the_tick_that_covered_the_request():
+    runner = Runner()
+    runner.release.set()
+    coordinator = ticks.TickCoordinator(run=runner, use_lease=False)
+    record = coordinator.request(["A.NS"], wait=True, timeout=5)
+    assert record["tick"] == 1 and record["status"] == "done"
+
+def test_carry_over_is_capped(monkeypatch):
+    monkeypatch.setattr(ticks, "TICK_MAX_CARRY", 2)
+    runner = Runner(missing=["X.NS"])
+    runner.release.set()
+    coordinator = ticks.TickCoordinator(run=runner, use_lease=False)
+    coordinator.request(["X.NS"])
+    for _ in range(4):
+        coordinator.request(["A.NS"])
+    # X.NS failed in the first tick and rides along twice, then it is dropped
+    assert runner.calls == [["X.NS"], ["A.NS", "X.NS"], ["A.NS", "X.NS"], ["A.NS"], ["A.NS"]]
+    assert coordinator.stats()["carried"] == []
+
+def test_lease_is_refused_until_it_expires():
+    now = datetime.utcnow()
+    session = SessionLocal()
+    try:
+        assert acquire_lease(session, "test-lease", "a", 60, now=now)
+        assert acquire_lease(session, "test-lease", "a", 60, now=now + timedelta(seconds=30))
+        assert not acquire_lease(session, "test-lease", "b", 60, now=now + timedelta(seconds=60))
+        assert acquire_lease(session, "test-lease", "b", 60, now=now + timedelta(seconds=91))
+        assert not acquire_lease(session, "test-lease", "a", 60, now=now + timedelta(seconds=92))
+    finally:
+        session.close()
+
+def test_second_owner_skips_ticks_while_the_lease_is_held(monkeypatch):
+    monkeypatch.setattr(ticks, "TICK_LEASE", "test-ticks")
+    leader_runner, follower_runner = Runner(), Runner()
+    leader_runner.release.set()
+    follower_runner.release.set()
+    leader = ticks.TickCoordinator(run=leader_runner, owner="leader")
+    follower = ticks.TickCoordinator(run=follower_runner, owner="follower")
+
+    assert leader.request(["A.NS"])["status"] == "done"
+    record = follower.request(["A.NS"])
+    assert record["status"] == "skipped: lease held by leader"
+    assert follower_runner.calls == []
+    assert leader.is_leader() and not follower.is_leader()
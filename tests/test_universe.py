@@ -0,0 +1,65 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import universe
+from database import Base, SessionLocal, engine
+
+Base.metadata.create_all(bind=engine)
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.parametrize("symbol, expected", [
+    ("reliance", "RELIANCE.NS"),
+    ("  NiftyBees ", "NIFTYBEES.NS"),
+    ("BAJAJ-AUTO", "BAJAJ-AUTO.NS"),
+    ("TCS.NS", "TCS.NS"),
+    ("tcs.bo", "TCS.BO"),
+    ("^NSEI", "^NSEI"),
+    ("^nsebank", "^NSEBANK"),
+    ("USDINR=X", "USDINR=X"),
+    ("", ""),
+])
+def test_normalize(symbol, expected):
+    assert universe.normalize(symbol) == expected
+
+def test_parse_entries_keeps_exchange_and_index_symbols():
+    entries = universe.parse_entries(["infy", ("TCS.BO", "TCS"), {"symbol": "^NSEI", "name": "Nifty 50"}, "INFY.NS"])
+    assert entries == [("INFY.NS", "INFY.NS"), ("TCS.BO", "TCS"), ("^NSEI", "Nifty 50")]
+
+def test_read_constituents_skips_other_series():
+    text = "Company Name,Industry,Symbol,Series\nInfosys,IT,INFY,EQ\nSome Co,Misc,SOMECO,BE\n"
+    assert universe.read_constituents(text) == [("INFY.NS", "Infosys")]
+
+def test_universe_endpoints(monkeypatch):
+    monkeypatch.chdir(REPO)
+    import main
+    client = TestClient(main.app)
+    response = client.post("/api/universe", json={
+        "symbols": ["UNI_A", "UNI_B.BO", "^UNIIDX"], "watchlist": "uni", "backfill": False,
+    })
+    assert response.status_code == 202
+    assert sorted(response.json()["added"]) == ["UNI_A.NS", "UNI_B.BO", "^UNIIDX"]
+    assert client.get("/api/watchlists").json()["uni"] == ["UNI_A.NS", "UNI_B.BO", "^UNIIDX"]
+
+    assert client.delete("/api/universe/uni_b.bo").json() == {"removed": ["UNI_B.BO"]}
+    assert client.delete("/api/universe/UNI_B.BO").status_code == 404
+
+    response = client.delete("/api/watchlists/uni", params={"prune": True})
+    assert response.json() == {"watchlist": "uni", "removed": ["UNI_A.NS", "^UNIIDX"]}
+    assert "uni" not in client.get("/api/watchlists").json()
+    assert client.delete("/api/watchlists/uni").status_code == 404
+
+def test_add_tolerates_a_concurrent_add(monkeypatch):
+    session = SessionLocal()
+    try:
+        first = universe.add(session, ["RACE_A", "RACE_B"], watchlist="race")
+        assert first == {"added": ["RACE_A.NS", "RACE_B.NS"], "existing": 0}
+        # As if another caller inserted them between our existence check and our insert
+        monkeypatch.setattr(universe, "existing_symbols", lambda session, symbols: set())
+        second = universe.add(session, ["RACE_A", "RACE_B", "RACE_C"], watchlist="race")
+        assert second == {"added": ["RACE_C.NS"], "existing": 2}
+        assert universe.watchlists(session)["race"] == ["RACE_A.NS", "RACE_B.NS", "RACE_C.NS"]
+    finally:
+        session.close()
@@ -0,0 +1,186 @@
+"""Serializes refresh ticks.
+
+Every trigger (the scheduler's dispatcher, /api/refresh) goes through
+`coordinator.request()`. Only one tick runs at a time: symbols requested
+while a tick is running are merged into a single follow-up tick instead of
+starting a second fetch in parallel. Symbols a tick could not fetch are
+carried over into the next one, up to TICK_MAX_CARRY times.
+
+With several processes (e.g. uvicorn --workers) a lease row in the database
+picks the one that fetches; ticks triggered in the others are skipped.
+"""
+from collections import deque
+from datetime import datetime
+import os
+import socket
+import threading
+import time
+
+TICK_LEASE = "ticks"
+TICK_LEASE_TTL = int(os.getenv("TICK_LEASE_TTL", "120"))
+TICK_MAX_CARRY = int(os.getenv("TICK_MAX_CARRY", "3"))
+TICK_HISTORY = 100
+
+ALL = None  # request every tracked symbol
+
+def default_run(symbols):
+    from fetcher import update_all_stocks
+    return update_all_stocks(symbols)
+
+class TickCoordinator:
+    def __init__(self, run=default_run, owner=None, use_lease=True):
+        self.run = run
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.use_lease = use_lease
+        self.history = deque(maxlen=TICK_HISTORY)
+        self._running = threading.Lock()
+        self._cond = threading.Condition()
+        self._pending = set()
+        self._pending_all = False
+        self._pending_since = None
+        self._pending_requests = 0
+        self._reasons = set()
+        self._carry = {}  # symbol -> ticks it was carried over
+        self._started = 0
+        self._finished = 0
+
+    def request(self, symbols=ALL, reason="schedule", wait=False, timeout=None):
+        """Asks for a tick of `symbols` (ALL for every stock).
+
+        Runs it on the calling thread if no tick is running; otherwise the
+        symbols are picked up by the running thread right after its tick.
+        With `wait`, blocks until the tick that covers this request finished.
+        Returns the record of that tick, or None if it was run elsewhere.
+        """
+        with self._cond:
+            if symbols is ALL:
+                self._pending_all = True
+            else:
+                self._pending.update(symbols)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            self._pending_requests += 1
+            self._reasons.add(reason)
+            target = self._started + 1
+
+        record = None
+        while self._running.acquire(blocking=False):
+            try:
+                record = self._drain() or record
+            finally:
+                self._running.release()
+            # A request may have slipped in between the last drain and the release
+            with self._cond:
+                if not self._has_pending():
+                    break
+
+        if wait:
+            with self._cond:
+                self._cond.wait_for(lambda: self._finished >= target, timeout)
+                for past in reversed(self.history):
+                    if past["tick"] >= target:
+                        record = past
+        return record
+
+    def _has_pending(self):
+        return self._pending_all or bool(self._pending)
+
+    def _drain(self):
+        record = None
+        while True:
+            with self._cond:
+                if not self._has_pending():
+                    return record
+                symbols = ALL if self._pending_all else set(self._pending)
+                if symbols is not ALL:
+                    symbols |= set(self._carry)
+                lag = time.monotonic() - self._pending_since
+                requests, reasons = self._pending_requests, sorted(self._reasons)
+                self._pending, self._pending_all, self._pending_since = set(), False, None
+                self._pending_requests, self._reasons = 0, set()
+                self._started += 1
+                tick = self._started
+            try:
+                record = self._tick(tick, symbols, lag, requests, reasons)
+            finally:
+                with self._cond:
+                    self._finished = tick
+                    self._cond.notify_all()
+
+    def is_leader(self):
+        """True if this process holds (or just took) the tick lease."""
+        return self._holds_lease()[0]
+
+    def _holds_lease(self):
+        if not self.use_lease:
+            return True, None
+        from database import SessionLocal, acquire_lease, lease_owner
+        session = SessionLocal()
+        try:
+            if acquire_lease(session, TICK_LEASE, self.owner, TICK_LEASE_TTL):
+                return True, None
+            return False, lease_owner(session, TICK_LEASE)
+        finally:
+            session.close()
+
+    def _tick(self, tick, symbols, lag, requests, reasons):
+        record = {
+            "tick": tick,
+            "started_at": datetime.utcnow(),
+            "reasons": reasons,
+            "requests": requests,
+            "symbols": "all" if symbols is ALL else len(symbols),
+            "lag_s": round(lag, 3),
+            "duration_s": None,
+            "fetched": 0,
+            "skipped": 0,
+            "carried": 0,
+            "status": "done",
+        }
+        started = time.perf_counter()
+        try:
+            holds, owner = self._holds_lease()
+            if not holds:
+                record["status"] = f"skipped: lease held by {owner}"
+                return record
+
+            result = self.run(None if symbols is ALL else sorted(symbols)) or {}
+            if "skipped" in result:
+                record["status"] = f"skipped: {result['skipped']}"
+                return record
+
+            missing = result.get("missing", [])
+            record["fetched"] = result.get("fetched", 0)
+            record["skipped"] = len(missing)
+            with self._cond:
+                # Fetched symbols leave the carry-over, unfinished ones join it
+                self._carry = {
+                    symbol: self._carry.get(symbol, 0) + 1
+                    for symbol in missing
+                    if self._carry.get(symbol, 0) < TICK_MAX_CARRY
+                }
+                record["carried"] = len(self._carry)
+            return record
+        except Exception as e:
+            record["status"] = f"failed: {e}"
+            print(f"Tick {tick} failed: {e}")
+            raise
+        finally:
+            record["duration_s"] = round(time.perf_counter() - started, 3)
+            self.history.append(record)
+            print(
+                f"Tick {tick} ({', '.join(reasons)}): {record['status']}, {record['fetched']} fetched, "
+                f"{record['skipped']} skipped, lag {record['lag_s']:.2f}s, took {record['duration_s']:.2f}s"
+            )
+
+    def stats(self):
+        with self._cond:
+            return {
+                "owner": self.owner,
+                "running": self._running.locked(),
+                "pending": "all" if self._pending_all else len(self._pending),
+                "carried": sorted(self._carry),
+                "ticks": list(self.history)[-20:],
+            }
+
+coordinator = TickCoordinator()
@@ -0,0 +1,277 @@
+"""Manages the tracked symbols: adding, removing, watchlists and bulk imports.
+
+Existence checks and inserts are set-based: one IN query per chunk of
+symbols and one executemany INSERT ... ON CONFLICT DO NOTHING for the new
+ones, so onboarding an index of 500 constituents is a handful of statements
+and concurrent adds of the same symbols don't collide. New symbols are then
+backfilled with BACKFILL_PERIOD of daily bars in the background: chunks of
+BACKFILL_CHUNK symbols are downloaded by BACKFILL_WORKERS threads and
+written by the calling thread as they arrive. Ticks pick the symbols up on
+their next slot; fundamentals come with the hourly refresh.
+
+    python universe.py import ind_nifty500list.csv --watchlist "NIFTY 500"
+    python universe.py add RELIANCE TCS.NS "INFY.NS=Infosys" --watchlist core
+    python universe.py remove TCS.NS
+    python universe.py drop-watchlist "NIFTY 500" --prune
+    python universe.py list
+    python universe.py backfill
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import csv
+import io
+import os
+import time
+
+from sqlalchemy import delete, select
+
+from database import (
+    SessionLocal, Stock, LatestPrice, Watchlist, WatchlistSymbol, DailyBar, create_tables_and_seed, insert_missing,
+)
+import jobs
+
+BACKFILL_CHUNK = int(os.getenv("BACKFILL_CHUNK", "50"))
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+DEFAULT_SUFFIX = os.getenv("SYMBOL_SUFFIX", ".NS")  # for bare NSE symbols, as in the index CSVs
+QUERY_CHUNK = 500  # symbols per IN (...) list
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def normalize(symbol):
+    """Upper case; bare symbols are taken as NSE listings and get DEFAULT_SUFFIX.
+
+    Symbols that already name their market are kept as they are: an
+    exchange suffix (TCS.NS, RELIANCE.BO), an index (^NSEI) or a Yahoo
+    currency/futures ticker (USDINR=X, GC=F).
+    """
+    symbol = symbol.strip().upper()
+    if symbol and DEFAULT_SUFFIX and not symbol.startswith("^") and "." not in symbol and "=" not in symbol:
+        symbol += DEFAULT_SUFFIX
+    return symbol
+
+def parse_entries(entries):
+    """[(symbol, name)] from symbols, (symbol, name) pairs or {"symbol", "name"} dicts, deduplicated."""
+    result = {}
+    for entry in entries:
+        if isinstance(entry, dict):
+            symbol, name = entry.get("symbol", ""), entry.get("name")
+        elif isinstance(entry, (tuple, list)):
+            symbol, name = entry
+        else:
+            symbol, name = entry, None
+        symbol = normalize(symbol)
+        if symbol:
+            result.setdefault(symbol, name or symbol)
+    return list(result.items())
+
+def read_constituents(text):
+    """[(symbol, name)] from an index constituents CSV (NSE format: Company Name, Industry, Symbol, Series, ...)."""
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    columns = {column.strip().lower(): column for column in reader.fieldnames or []}
+    if "symbol" not in columns:
+        raise ValueError(f"No Symbol column in the CSV, found: {', '.join(reader.fieldnames or [])}")
+    name_column = columns.get("company name") or columns.get("name")
+    series_column = columns.get("series")
+    entries = []
+    for row in reader:
+        # Only equities; index files also list e.g. BE (trade-for-trade) series
+        if series_column and (row.get(series_column) or "EQ").strip() not in ("EQ", ""):
+            continue
+        entries.append((row[columns["symbol"]], (row.get(name_column) or "").strip() if name_column else None))
+    return parse_entries(entries)
+
+def existing_symbols(session, symbols):
+    found = set()
+    for chunk in _chunks(list(symbols), QUERY_CHUNK):
+        found.update(session.scalars(select(Stock.symbol).where(Stock.symbol.in_(chunk))))
+    return found
+
+def add(session, entries, watchlist=None):
+    """Tracks the new symbols of `entries` and adds all of them to `watchlist`.
+
+    Returns {"added": [symbols], "existing": count}.
+    """
+    entries = parse_entries(entries)
+    existing = existing_symbols(session, [symbol for symbol, _ in entries])
+    new = [{"symbol": symbol, "name": name} for symbol, name in entries if symbol not in existing]
+    # ON CONFLICT DO NOTHING: a concurrent add of the same symbols is not an error
+    inserted = {symbol for (symbol,) in insert_missing(session, Stock, new, ["symbol"])}
+    added = [row["symbol"] for row in new if row["symbol"] in inserted]
+
+    if watchlist:
+        insert_missing(session, Watchlist, [{"name": watchlist}], ["name"])
+        insert_missing(
+            session, WatchlistSymbol,
+            [{"watchlist": watchlist, "symbol": symbol} for symbol, _ in entries],
+            ["watchlist", "symbol"],
+        )
+    session.commit()
+    _share_quotes(session)
+    return {"added": added, "existing": len(entries) - len(added)}
+
+def remove(session, symbols):
+    """Stops tracking `symbols`. Their stored prices and bars are kept. Returns the removed symbols."""
+    symbols = [normalize(symbol) for symbol in symbols]
+    removed = sorted(existing_symbols(session, symbols))
+    for chunk in _chunks(removed, QUERY_CHUNK):
+        for model in (Stock, LatestPrice, WatchlistSymbol):
+            session.execute(delete(model).where(model.symbol.in_(chunk)))
+    session.commit()
+    if removed:
+        _share_quotes(session)
+    return removed
+
+def drop_watchlist(session, name, prune=False):
+    """Deletes a watchlist. With `prune`, its symbols that are in no other watchlist stop being tracked.
+
+    Returns the removed symbols, None if there is no such watchlist.
+    """
+    if session.get(Watchlist, name) is None:
+        return None
+    members = set(session.scalars(select(WatchlistSymbol.symbol).where(WatchlistSymbol.watchlist == name)))
+    session.execute(delete(WatchlistSymbol).where(WatchlistSymbol.watchlist == name))
+    session.execute(delete(Watchlist).where(Watchlist.name == name))
+    session.commit()
+    if not prune or not members:
+        return []
+    elsewhere = set()
+    for chunk in _chunks(sorted(members), QUERY_CHUNK):
+        elsewhere.update(session.scalars(select(WatchlistSymbol.symbol).where(WatchlistSymbol.symbol.in_(chunk))))
+    return remove(session, members - elsewhere)
+
+def watchlists(session):
+    """{name: [symbols]} of every watchlist."""
+    result = {name: [] for name in session.scalars(select(Watchlist.name).order_by(Watchlist.name))}
+    for name, symbol in session.execute(
+        select(WatchlistSymbol.watchlist, WatchlistSymbol.symbol).order_by(WatchlistSymbol.symbol)
+    ):
+        result.setdefault(name, []).append(symbol)
+    return result
+
+def _share_quotes(session):
+    # Read-only API workers list the stocks from the quote snapshot
+    import quote_snapshot
+    try:
+        quote_snapshot.write(session)
+    except OSError as e:
+        print(f"Quote snapshot not written: {e}")
+
+def missing_bars(session, symbols=None):
+    """Tracked symbols (or `symbols`) without any stored daily bar."""
+    query = select(Stock.symbol).where(~select(DailyBar.symbol).where(DailyBar.symbol == Stock.symbol).exists())
+    if symbols is not None:
+        query = query.where(Stock.symbol.in_(list(symbols)))
+    return sorted(session.scalars(query))
+
+def backfill(symbols=None, source=None, chunk=BACKFILL_CHUNK, workers=BACKFILL_WORKERS):
+    """Downloads BACKFILL_PERIOD of daily bars for the symbols without any, chunk by chunk in parallel.
+
+    Symbols added while it runs are picked up before it returns. Reports
+    {"done", "total", "failed"} as job progress.
+    """
+    import bar_store
+    if source is None:
+        from fetcher import provider as source
+    started = time.perf_counter()
+    session = SessionLocal()
+    done, written, failed = set(), 0, set()
+    try:
+        while True:
+            pending = [symbol for symbol in missing_bars(session, symbols) if symbol not in failed]
+            if not pending:
+                break
+            total = len(done) + len(pending)
+            print(f"Backfilling {bar_store.BACKFILL_PERIOD} of daily bars for {len(pending)} symbols...")
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill")
+            try:
+                futures = {
+                    pool.submit(source.history, group, bar_store.BACKFILL_PERIOD, "1d"): group
+                    for group in _chunks(pending, chunk)
+                }
+                for future in as_completed(futures):
+                    group = futures[future]
+                    try:
+                        frames = future.result()
+                        # Ticks then leave the symbols that got no bars alone for a while
+                        bar_store.record_backfill(group, frames)
+                    except Exception as e:
+                        print(f"Backfill of {len(group)} symbols failed: {e}")
+                        frames = {}
+                    # One writer: the downloads run in parallel, the upserts don't
+                    written += bar_store.upsert_bars(session, frames)
+                    session.commit()
+                    fetched = {symbol for symbol in group if frames.get(symbol) is not None and not frames[symbol].empty}
+                    done.update(fetched)
+                    failed.update(set(group) - fetched)
+                    jobs.set_progress(done=len(done), total=total, failed=len(failed))
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+    finally:
+        session.close()
+    result = {
+        "backfilled": len(done),
+        "bars": written,
+        "failed": sorted(failed),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    print(f"Backfill finished: {result['backfilled']} symbols, {written} bars, {len(failed)} failed in {result['seconds']:.1f}s")
+    return result
+
+def submit_backfill():
+    """Queues a backfill job; a running one picks up the new symbols instead. Returns the job."""
+    return jobs.submit("backfill", backfill)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="track symbols (SYMBOL or SYMBOL=Name)")
+    add_parser.add_argument("symbols", nargs="+")
+    import_parser = commands.add_parser("import", help="track the constituents of an index CSV")
+    import_parser.add_argument("csv")
+    for sub in (add_parser, import_parser):
+        sub.add_argument("--watchlist")
+        sub.add_argument("--no-backfill", action="store_true")
+    remove_parser = commands.add_parser("remove", help="stop tracking symbols")
+    remove_parser.add_argument("symbols", nargs="+")
+    drop_parser = commands.add_parser("drop-watchlist")
+    drop_parser.add_argument("name")
+    drop_parser.add_argument("--prune", action="store_true", help="also stop tracking symbols in no other watchlist")
+    commands.add_parser("list", help="show the watchlists")
+    commands.add_parser("backfill", help="backfill every tracked symbol without bars")
+    args = parser.parse_args()
+
+    create_tables_and_seed()
+    session = SessionLocal()
+    try:
+        if args.command in ("add", "import"):
+            if args.command == "add":
+                entries = [tuple(item.split("=", 1)) if "=" in item else item for item in args.symbols]
+            else:
+                with open(args.csv, newline="") as f:
+                    entries = read_constituents(f.read())
+            started = time.perf_counter()
+            result = add(session, entries, args.watchlist)
+            print(f"Added {len(result['added'])} symbols ({result['existing']} already tracked) in {time.perf_counter() - started:.2f}s")
+            if result["added"] and not args.no_backfill:
+                backfill(result["added"])
+        elif args.command == "remove":
+            print(f"Removed: {', '.join(remove(session, args.symbols)) or 'nothing'}")
+        elif args.command == "drop-watchlist":
+            removed = drop_watchlist(session, args.name, args.prune)
+            if removed is None:
+                print(f"No watchlist named {args.name!r}")
+            else:
+                print(f"Dropped {args.name!r}, {len(removed)} symbols no longer tracked")
+        elif args.command == "list":
+            tracked = session.query(Stock).count()
+            print(f"{tracked} symbols tracked")
+            for name, symbols in watchlists(session).items():
+                print(f"  {name}: {len(symbols)} symbols")
+        elif args.command == "backfill":
+            backfill()
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    main()